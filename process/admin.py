@@ -1,14 +1,46 @@
 from django.contrib import admin
-from .models import Renter, Payment, Floor, Apartment,YearlyRent
+from django.db.models import Count
+from .models import Renter, Payment, Floor, Apartment,YearlyRent, RefreshToken, RentRollSnapshot, Job
+from .search import matching_ids
+
+# Changelists below are driven by annotated querysets so a page costs a fixed
+# number of queries; show_full_result_count=False skips the extra unfiltered
+# COUNT(*) Django otherwise runs on every filtered page.
 
 @admin.register(Renter)
 class RenterAdmin(admin.ModelAdmin):
     list_display = ("name", "apartment", "total_paid", "expected_payments", "balance")
+    list_select_related = ("apartment__floor",)
+    search_fields = ("name", "email", "phone")
+    show_full_result_count = False
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).with_balance()
+
+    def get_search_results(self, request, queryset, search_term):
+        # prefix match through the FTS5 index instead of three LIKE '%...%' scans
+        ids = matching_ids(search_term)
+        if ids is None:
+            return super().get_search_results(request, queryset, search_term)
+        return queryset.filter(pk__in=ids), False
+
+    def expected_payments(self, obj):
+        return obj.expected_to_date
+    expected_payments.short_description = "Expected payments"
+    expected_payments.admin_order_field = "expected_to_date"
+
+    def balance(self, obj):
+        return obj.balance_to_date
+    balance.short_description = "Balance"
+    balance.admin_order_field = "balance_to_date"
 
 @admin.register(Payment)
 class PaymentAdmin(admin.ModelAdmin):
     list_display = ("renter", "amount", "date_paid", "payment_type")
     list_filter = ("payment_type", "date_paid")
+    list_select_related = ("renter",)
+    raw_id_fields = ("renter",)
+    show_full_result_count = False
 
 class ApartmentInline(admin.TabularInline):
     model = Apartment
@@ -20,15 +52,41 @@ class FloorAdmin(admin.ModelAdmin):
     list_filter = ("number",)
     inlines = [ApartmentInline]
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(apartment_total=Count("apartments"))
+
     def apartment_count(self, obj):
-        return obj.apartments.count()
+        return obj.apartment_total
     apartment_count.short_description = "Number of Apartments"
+    apartment_count.admin_order_field = "apartment_total"
 
 @admin.register(Apartment)
 class ApartmentAdmin(admin.ModelAdmin):
     list_display = ("id", "floor")
     list_filter = ("floor",)
+    list_select_related = ("floor",)
 @admin.register(YearlyRent)
 class YearlyRentAdmin(admin.ModelAdmin):
     list_display = ("apartment", "year", "price")
-    list_filter = ("year", "apartment")
\ No newline at end of file
+    list_filter = ("year", "apartment")
+    list_select_related = ("apartment__floor",)
+    show_full_result_count = False
+
+@admin.register(RefreshToken)
+class RefreshTokenAdmin(admin.ModelAdmin):
+    list_display = ("user", "created_at", "expires_at", "revoked_at")
+    list_filter = ("revoked_at",)
+    list_select_related = ("user",)
+    readonly_fields = ("jti",)
+
+@admin.register(RentRollSnapshot)
+class RentRollSnapshotAdmin(admin.ModelAdmin):
+    list_display = ("month", "expected", "collected", "occupied", "apartments", "delinquent", "dirty", "computed_at")
+    list_filter = ("dirty",)
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ("id", "kind", "status", "progress", "worker", "created_by", "created_at", "finished_at")
+    list_filter = ("status", "kind")
+    list_select_related = ("created_by",)
+    readonly_fields = ("params", "result", "error", "worker", "started_at", "updated_at", "finished_at")
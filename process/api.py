@@ -0,0 +1,134 @@
+"""
+Read-only REST endpoints for renters, payments and yearly rents.
+
+Lists use cursor (keyset) pagination on the primary key, so every page is a
+`WHERE id > ? ORDER BY id LIMIT n` no matter how deep the client pages, and
+accept simple filters plus ?fields= to trim the payload:
+
+    /api/v1/payments/?floor=2&date_from=2024-01-01&payment_type=monthly&fields=id,amount
+"""
+from datetime import datetime
+
+from django.contrib.auth.models import User
+from django.utils.functional import SimpleLazyObject
+from rest_framework import authentication, exceptions, permissions, viewsets
+from rest_framework.pagination import CursorPagination
+
+from .models import Renter, Payment, YearlyRent
+from .serializers import RenterSerializer, PaymentSerializer, YearlyRentSerializer, selected_fields
+from .views import verify_access_token
+
+
+class BearerJWTAuthentication(authentication.BaseAuthentication):
+    """The same access tokens as jwt_required; the User row is only loaded if used."""
+
+    def authenticate(self, request):
+        header = authentication.get_authorization_header(request).split()
+        if not header or header[0].lower() != b"bearer":
+            return None
+        if len(header) != 2:
+            raise exceptions.AuthenticationFailed("Invalid Authorization header")
+        payload = verify_access_token(header[1].decode("latin-1"))
+        if payload is None:
+            raise exceptions.AuthenticationFailed("Invalid or expired token")
+        user_id = payload["user_id"]
+        return SimpleLazyObject(lambda: User.objects.get(pk=user_id)), payload
+
+    def authenticate_header(self, request):
+        return "Bearer"
+
+
+class HasAccessToken(permissions.BasePermission):
+    def has_permission(self, request, view):
+        return request.auth is not None
+
+
+class KeysetPagination(CursorPagination):
+    page_size = 50
+    page_size_query_param = "page_size"
+    max_page_size = 500
+    ordering = "id"
+
+
+# ----- Filter helpers -----
+def int_param(request, name):
+    value = request.query_params.get(name)
+    if not value:
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        raise exceptions.ValidationError({name: "Expected an integer"})
+
+
+def date_param(request, name):
+    value = request.query_params.get(name)
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value, "%Y-%m-%d").date()
+    except ValueError:
+        raise exceptions.ValidationError({name: "Expected YYYY-MM-DD"})
+
+
+class ReadOnlyKeysetViewSet(viewsets.ReadOnlyModelViewSet):
+    authentication_classes = [BearerJWTAuthentication]
+    permission_classes = [HasAccessToken]
+    pagination_class = KeysetPagination
+
+    # query param -> ORM lookup, by parser
+    int_filters = {}
+    date_filters = {}
+
+    def get_queryset(self):
+        qs = self.queryset
+        lookups = {}
+        for param, lookup in self.int_filters.items():
+            value = int_param(self.request, param)
+            if value is not None:
+                lookups[lookup] = value
+        for param, lookup in self.date_filters.items():
+            value = date_param(self.request, param)
+            if value is not None:
+                lookups[lookup] = value
+        qs = qs.filter(**lookups)
+
+        # only SELECT the columns that will be serialized (plus the cursor key)
+        fields = selected_fields(self.request, self.serializer_class.Meta.fields)
+        if fields:
+            qs = qs.only(*{"id", *fields})
+        return qs
+
+
+class RenterViewSet(ReadOnlyKeysetViewSet):
+    queryset = Renter.objects.all()
+    serializer_class = RenterSerializer
+    int_filters = {"floor": "floor_id", "apartment": "apartment_id"}
+    date_filters = {"start_from": "start_date__gte", "start_to": "start_date__lte"}
+
+
+class PaymentViewSet(ReadOnlyKeysetViewSet):
+    queryset = Payment.objects.all()
+    serializer_class = PaymentSerializer
+    int_filters = {"renter": "renter_id", "floor": "renter__floor_id", "apartment": "renter__apartment_id"}
+    date_filters = {"date_from": "date_paid__gte", "date_to": "date_paid__lte"}
+
+    def get_queryset(self):
+        qs = super().get_queryset()
+        payment_type = self.request.query_params.get("payment_type")
+        if payment_type:
+            if payment_type not in dict(Payment.PAYMENT_TYPES):
+                raise exceptions.ValidationError({"payment_type": "Expected monthly or yearly"})
+            qs = qs.filter(payment_type=payment_type)
+        return qs
+
+
+class YearlyRentViewSet(ReadOnlyKeysetViewSet):
+    queryset = YearlyRent.objects.all()
+    serializer_class = YearlyRentSerializer
+    int_filters = {
+        "apartment": "apartment_id",
+        "floor": "apartment__floor_id",
+        "year_from": "year__gte",
+        "year_to": "year__lte",
+    }
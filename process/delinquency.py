@@ -0,0 +1,110 @@
+"""
+Portfolio-wide delinquency lookups over the CoverageMask table.
+
+    unpaid_in_month(2024, 3)        renters whose March 2024 is unpaid: one
+                                    indexed query on (year, unpaid) and a
+                                    bitwise test per row
+    consecutive_missed(3)           renters with a run of >= 3 unpaid months,
+                                    from one integer pair per renter-year
+
+Masks are built from RenterMonth rows, which are only written when a renter's
+payments or rents change. Both lookups only read: the months since each
+renter's last write are filled in by the fill_renter_months command (or the
+fill_renter_months / build_rent_roll jobs), scheduled for the 1st of each
+month; until it runs, a renter nobody touched this month is missing from
+"who hasn't paid this month".
+"""
+from datetime import date
+
+from django.db.models import F
+
+from .ledger import index_to_ym, month_index
+from .models import CoverageMask, Renter
+
+RENTER_FIELDS = ("renter_id", "renter__name", "renter__floor_id", "renter__apartment_id")
+
+
+def _renter_row(renter_id, name, floor_id, apartment_id):
+    return {"renter_id": renter_id, "name": name, "floor_id": floor_id, "apartment_id": apartment_id}
+
+
+def unpaid_in_month(year, month, floor=None):
+    """Renters in tenancy during year-month with that month unpaid, by renter id."""
+    masks = (
+        CoverageMask.objects.filter(year=year, unpaid__gt=0)
+        .annotate(missing=F("unpaid").bitand(1 << (month - 1)))
+        .filter(missing__gt=0)
+    )
+    if floor is not None:
+        masks = masks.filter(renter__floor_id=floor)
+    return [_renter_row(*row) for row in masks.order_by("renter_id").values_list(*RENTER_FIELDS)]
+
+
+def missed_runs(masks, today_idx):
+    """
+    Walk (year, paid, unpaid) triples of one renter, oldest first, and return
+    (longest run, its first month index, current run). A paid month or a
+    missing year ends a run; the current run is the one reaching today's month.
+    Months after today's are ignored.
+    """
+    longest, longest_start, run, run_start, last, previous = 0, None, 0, None, None, None
+    for year, paid, unpaid in masks:
+        if previous is not None and year != previous + 1:
+            run = 0
+        previous = year
+        for m in range(min(12, today_idx - year * 12 + 1)):
+            bit = 1 << m
+            if unpaid & bit:
+                if run == 0:
+                    run_start = year * 12 + m
+                run += 1
+                last = year * 12 + m
+                if run > longest:
+                    longest, longest_start = run, run_start
+            elif paid & bit:
+                run = 0
+    return longest, longest_start, run if last == today_idx else 0
+
+
+def consecutive_missed(k, current=False, floor=None, today=None):
+    """
+    Renters with at least `k` consecutive unpaid months anywhere in their
+    tenancy up to `today` (or, with current=True, in the run ending at
+    today's month). Fully paid years are skipped in SQL; they break any run
+    anyway.
+    """
+    today = today or date.today()
+    today_idx = month_index(today)
+    masks = CoverageMask.objects.filter(unpaid__gt=0, year__lte=today.year)
+    if floor is not None:
+        masks = masks.filter(renter__floor_id=floor)
+    rows = masks.order_by("renter_id", "year").values_list("renter_id", "year", "paid", "unpaid")
+
+    matches, renter_id, pending = {}, None, []
+
+    def flush():
+        if pending:
+            longest, start, trailing = missed_runs(pending, today_idx)
+            run = trailing if current else longest
+            if run >= k:
+                matches[renter_id] = (longest, start, trailing)
+
+    for row_renter, year, paid, unpaid in rows.iterator():
+        if row_renter != renter_id:
+            flush()
+            renter_id, pending = row_renter, []
+        pending.append((year, paid, unpaid))
+    flush()
+
+    renters = Renter.objects.filter(pk__in=list(matches)).order_by("pk").values_list("pk", "name", "floor_id", "apartment_id")
+    results = []
+    for row in renters:
+        longest, start, trailing = matches[row[0]]
+        results.append({
+            **_renter_row(*row),
+            "longest_run": longest,
+            "longest_run_from": index_to_ym(start),
+            "longest_run_to": index_to_ym(start + longest - 1),
+            "current_run": trailing,
+        })
+    return results
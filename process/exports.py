@@ -0,0 +1,77 @@
+"""
+Streaming CSV export of the payment ledger.
+
+Payments are read in (renter, date_paid) order and the renter's RenterMonth
+rows in (renter, month) order, both straight off indexes with
+QuerySet.iterator(), and merged as they stream. Each payment row carries the
+renter's running totals at that point:
+
+    paid_to_date     payments so far, including this one
+    charged_to_date  rent expected for every month up to the payment's month
+    balance          paid_to_date - charged_to_date (negative = owes money)
+
+Nothing is held beyond the current chunk, so memory stays flat and the first
+rows go out as soon as the first chunk is read.
+"""
+import csv
+import io
+
+from .ledger import ZERO, as_decimal
+from .models import Payment, RenterMonth
+
+HEADER = [
+    "renter_id", "renter", "floor", "apartment", "payment_id", "date_paid", "payment_type",
+    "month_covered", "amount", "paid_to_date", "charged_to_date", "balance",
+]
+DEFAULT_CHUNK_SIZE = 2000
+
+
+def ledger_rows(floor=None, renters=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Yield one list per payment (see HEADER), grouped by renter."""
+    payments = Payment.objects.order_by("renter_id", "date_paid", "id")
+    months = RenterMonth.objects.order_by("renter_id", "month")
+    if floor is not None:
+        payments = payments.filter(renter__floor_id=floor)
+        months = months.filter(renter__floor_id=floor)
+    if renters:
+        payments = payments.filter(renter_id__in=renters)
+        months = months.filter(renter_id__in=renters)
+
+    payments = payments.values_list(
+        "renter_id", "renter__name", "renter__floor__number", "renter__apartment_id",
+        "id", "date_paid", "payment_type", "month_covered", "amount",
+    ).iterator(chunk_size=chunk_size)
+    months = months.values_list("renter_id", "month", "expected").iterator(chunk_size=chunk_size)
+
+    current, paid, charged = None, ZERO, ZERO
+    pending = next(months, None)
+    for renter_id, name, floor_number, apartment_id, payment_id, date_paid, payment_type, month_covered, amount in payments:
+        if renter_id != current:
+            current, paid, charged = renter_id, ZERO, ZERO
+        # pull in this renter's charges up to the month of the payment
+        while pending and (pending[0] < renter_id or (pending[0] == renter_id and pending[1] <= date_paid)):
+            if pending[0] == renter_id:
+                charged += pending[2]
+            pending = next(months, None)
+        paid += as_decimal(amount)
+        yield [
+            renter_id, name, floor_number if floor_number is not None else "", apartment_id or "",
+            payment_id, date_paid.isoformat(), payment_type, month_covered.strftime("%Y-%m") if month_covered else "",
+            amount, paid, charged, paid - charged,
+        ]
+
+
+def csv_chunks(rows, rows_per_chunk=500):
+    """Encode rows as CSV text, one string per batch of `rows_per_chunk` rows."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(HEADER)
+    for count, row in enumerate(rows, 1):
+        writer.writerow(row)
+        # the first row goes out with the header so the client sees bytes at once
+        if count == 1 or count % rows_per_chunk == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
@@ -1,7 +1,13 @@
 
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
+
 from .models import Floor
 from .models import Apartment, Renter, Payment
+from .rates import load_rates
 from django import forms
+from django.core.validators import DecimalValidator
+from django.utils import timezone
 from django.forms import ModelForm
 
 class RenterForm(ModelForm):
@@ -37,4 +43,71 @@ class ApartmentForm(ModelForm):
         widgets = {
             'floor': forms.Select(attrs={'class': 'form-select'}),
         }
-        
\ No newline at end of file
+        
+
+_amount_field = Payment._meta.get_field("amount")
+AMOUNT_VALIDATOR = DecimalValidator(_amount_field.max_digits, _amount_field.decimal_places)
+
+
+def clean_payment_data(data, apartment_id=None, rates=None):
+    """
+    Validate one add_payment-style payload and return the Payment field values
+    (amount, payment_type, month_covered, date_paid). Shared by add_payment and
+    the bulk importer so both apply the same monthly/yearly rules.
+
+    Monthly payments need `amount` and `year_month_covered` (YYYY-MM); yearly
+    payments need `year_covered` and default the amount to 12 x that year's rent,
+    taken from `rates` ({year: monthly price}) when the caller preloaded them.
+    Raises forms.ValidationError with the message add_payment returns.
+    """
+    amount = data.get("amount")
+    payment_type = data.get("payment_type") or 'monthly'
+
+    if payment_type == 'monthly':
+        year_month_covered = data.get("year_month_covered")
+        if not amount or not year_month_covered:
+            raise forms.ValidationError("Missing amount or month")
+        if not isinstance(year_month_covered, str):
+            raise forms.ValidationError("Invalid date format: expected YYYY-MM")
+        try:
+            month_date = datetime.strptime(year_month_covered, "%Y-%m").date().replace(day=1)
+        except ValueError as e:
+            raise forms.ValidationError(f"Invalid date format: {e}")
+    elif payment_type == 'yearly':
+        year_covered = data.get('year_covered')
+        if not year_covered:
+            raise forms.ValidationError("Missing year for yearly payment")
+        try:
+            y = int(year_covered)
+            month_date = date(y, 1, 1)
+        except (TypeError, ValueError):
+            raise forms.ValidationError("Invalid year")
+        if not amount:
+            # if amount not provided, compute from YearlyRent (monthly * 12)
+            monthly = (load_rates(apartment_id) if rates is None else rates).get(y)
+            amount = monthly * 12 if monthly is not None else Decimal('0.00')
+    else:
+        raise forms.ValidationError("Invalid payment_type")
+
+    try:
+        amount = Decimal(str(amount))
+    except InvalidOperation:
+        raise forms.ValidationError("Invalid amount")
+    if not amount.is_finite():
+        raise forms.ValidationError("Invalid amount")
+    try:
+        # the column's max_digits / decimal_places, so bulk_create never sees an amount it cannot store
+        AMOUNT_VALIDATOR(amount)
+    except forms.ValidationError:
+        raise forms.ValidationError("Invalid amount")
+
+    date_paid = timezone.now().date()
+    if data.get("date_paid"):
+        if not isinstance(data["date_paid"], str):
+            raise forms.ValidationError("Invalid date format: expected YYYY-MM-DD")
+        try:
+            date_paid = datetime.strptime(data["date_paid"], "%Y-%m-%d").date()
+        except ValueError as e:
+            raise forms.ValidationError(f"Invalid date format: {e}")
+
+    return {"amount": amount, "payment_type": payment_type, "month_covered": month_date, "date_paid": date_paid}
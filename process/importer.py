@@ -0,0 +1,138 @@
+"""
+Streaming bulk import of payments from CSV or JSONL.
+
+Each record uses the same keys as add_payment plus the renter id:
+
+    renter_id,amount,payment_type,year_month_covered,year_covered,date_paid
+    12,250.00,monthly,2024-03,,2024-03-02
+    12,,yearly,,2025,
+
+Records are read one at a time and written with bulk_create in batches, each
+batch in its own transaction, so memory stays flat however large the file is.
+"""
+import csv
+import json
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+
+from .forms import clean_payment_data
+from .ledger import record_bulk_payments
+from .models import Renter, Payment, YearlyRent
+
+DEFAULT_BATCH_SIZE = 500
+
+
+class ImportReport:
+    """Counts plus a per-row error list (capped; pass on_error to stream them all)."""
+
+    def __init__(self, max_errors=100, on_error=None):
+        self.imported = 0
+        self.failed = 0
+        self.errors = []
+        self.max_errors = max_errors
+        self.on_error = on_error
+
+    def add_error(self, line, message):
+        self.failed += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append({"line": line, "error": message})
+        if self.on_error:
+            self.on_error(line, message)
+
+    def as_dict(self):
+        return {
+            "imported": self.imported,
+            "failed": self.failed,
+            "errors": self.errors,
+            "errors_truncated": self.failed > len(self.errors),
+        }
+
+
+def detect_format(filename):
+    return "jsonl" if filename.lower().endswith((".jsonl", ".ndjson", ".json")) else "csv"
+
+
+def iter_records(stream, fmt="csv"):
+    """Yield (line number, record dict, error message) for each row of a text stream."""
+    if fmt == "csv":
+        reader = csv.DictReader(stream)
+        for record in reader:
+            yield reader.line_num, {k.strip(): (v or "").strip() for k, v in record.items() if k}, None
+    elif fmt == "jsonl":
+        for line_no, line in enumerate(stream, 1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                yield line_no, None, f"Invalid JSON: {e}"
+                continue
+            if not isinstance(record, dict):
+                yield line_no, None, "Expected a JSON object"
+                continue
+            yield line_no, record, None
+    else:
+        raise ValueError(f"Unsupported format: {fmt}")
+
+
+def _import_batch(batch, report, dry_run):
+    renter_ids = set()
+    for _, record in batch:
+        try:
+            renter_ids.add(int(record.get("renter_id") or record.get("renter")))
+        except (TypeError, ValueError):
+            pass
+    renters = Renter.objects.only("id", "apartment_id", "start_date").in_bulk(renter_ids)
+    # yearly rows without an amount default to 12 x the rent: one query for the whole batch
+    rents = {}
+    apartment_ids = {renter.apartment_id for renter in renters.values() if renter.apartment_id}
+    for apartment_id, year, price in YearlyRent.objects.filter(apartment_id__in=apartment_ids).values_list(
+            "apartment_id", "year", "price"):
+        rents.setdefault(apartment_id, {})[year] = price
+
+    payments = []
+    for line, record in batch:
+        try:
+            renter = renters.get(int(record.get("renter_id") or record.get("renter")))
+        except (TypeError, ValueError):
+            report.add_error(line, "Missing or invalid renter_id")
+            continue
+        if renter is None:
+            report.add_error(line, "Renter not found")
+            continue
+        try:
+            fields = clean_payment_data(record, renter.apartment_id, rents.get(renter.apartment_id, {}))
+        except ValidationError as e:
+            report.add_error(line, e.messages[0])
+            continue
+        payments.append(Payment(renter_id=renter.pk, **fields))
+
+    if payments and not dry_run:
+        with transaction.atomic():
+            Payment.objects.bulk_create(payments)
+            record_bulk_payments(renters, payments)
+    report.imported += len(payments)
+
+
+def import_payments(stream, fmt="csv", batch_size=DEFAULT_BATCH_SIZE, dry_run=False, report=None,
+                    on_batch=None):
+    """
+    Import payments from a text stream; returns an ImportReport. `on_batch`,
+    if given, is called with the report after each batch is written.
+    """
+    report = report or ImportReport()
+    batch = []
+    for line, record, error in iter_records(stream, fmt):
+        if error:
+            report.add_error(line, error)
+            continue
+        batch.append((line, record))
+        if len(batch) >= batch_size:
+            _import_batch(batch, report, dry_run)
+            batch = []
+            if on_batch:
+                on_batch(report)
+    if batch:
+        _import_batch(batch, report, dry_run)
+    return report
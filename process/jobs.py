@@ -0,0 +1,216 @@
+"""
+Database-backed background jobs, no broker needed.
+
+    job = enqueue("export_ledger", {"floor": 2}, user_id=request.user_id)
+
+`manage.py run_worker` processes claim queued jobs one at a time with a
+compare-and-set UPDATE (WHERE status = 'queued'), so several workers can share
+the table safely, and record progress, the result dict or the traceback.
+Handlers are registered with @handler("kind") and called as fn(job, **params).
+Files they produce go under settings.JOB_OUTPUT_DIR.
+
+While a handler runs, a heartbeat thread keeps the job's updated_at fresh, so
+only jobs whose worker has died go stale. Stale jobs are requeued, except
+kinds registered with idempotent=False (the payment import commits batch by
+batch, so a second run would duplicate them): those are marked failed.
+"""
+import io
+import os
+import socket
+import threading
+import traceback
+
+from django.conf import settings
+from django.db import DatabaseError, connection, transaction
+from django.utils import timezone
+
+from .exports import csv_chunks, ledger_rows
+from .importer import import_payments
+from .ledger import fill_missing_months
+from .models import Job, Payment, Renter
+from .rentroll import update_rent_roll
+from .statements import load_manifest, render_chunk, save_manifest
+
+HANDLERS = {}
+NOT_IDEMPOTENT = set()
+
+
+def handler(kind, idempotent=True):
+    def register(fn):
+        HANDLERS[kind] = fn
+        if not idempotent:
+            NOT_IDEMPOTENT.add(kind)
+        return fn
+    return register
+
+
+def output_dir(*parts):
+    path = os.path.join(settings.JOB_OUTPUT_DIR, *parts)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def enqueue(kind, params=None, user_id=None):
+    if kind not in HANDLERS:
+        raise ValueError(f"Unknown job kind: {kind}")
+    return Job.objects.create(kind=kind, params=params or {}, created_by_id=user_id)
+
+
+def worker_name():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def claim_next(worker):
+    """Atomically take the oldest queued job, or return None when the queue is empty."""
+    while True:
+        candidate = Job.objects.filter(status=Job.QUEUED).order_by("id").values_list("pk", flat=True).first()
+        if candidate is None:
+            return None
+        claimed = Job.objects.filter(pk=candidate, status=Job.QUEUED).update(
+            status=Job.RUNNING, worker=worker, started_at=timezone.now(), updated_at=timezone.now()
+        )
+        if claimed:
+            return Job.objects.get(pk=candidate)
+        # another worker got there first; try the next one
+
+
+class Heartbeat:
+    """Touch a running job's updated_at every `interval` seconds from a side thread."""
+
+    def __init__(self, job, interval):
+        self.job, self.interval = job, interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        try:
+            while not self._stop.wait(self.interval):
+                try:
+                    Job.objects.filter(pk=self.job.pk, status=Job.RUNNING).update(updated_at=timezone.now())
+                except DatabaseError:
+                    pass  # the handler holds the write lock; try again next beat
+        finally:
+            connection.close()
+
+    def __enter__(self):
+        if self.interval:
+            self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join()
+
+
+def run_job(job, heartbeat=None):
+    """Run a claimed job to completion and record the outcome."""
+    try:
+        fn = HANDLERS[job.kind]
+        with Heartbeat(job, heartbeat):
+            result = fn(job, **job.params)
+    except Exception:
+        Job.objects.filter(pk=job.pk).update(
+            status=Job.FAILED, error=traceback.format_exc(), finished_at=timezone.now(), updated_at=timezone.now()
+        )
+        return False
+    Job.objects.filter(pk=job.pk).update(
+        status=Job.SUCCEEDED, result=result or {}, progress=100, finished_at=timezone.now(), updated_at=timezone.now()
+    )
+    return True
+
+
+def requeue_stale(timeout):
+    """
+    Deal with running jobs whose worker has not reported for `timeout` (a
+    timedelta): requeue them, or fail them if their kind is not safe to run
+    twice. Returns (requeued, failed).
+    """
+    now = timezone.now()
+    stale = Job.objects.filter(status=Job.RUNNING, updated_at__lt=now - timeout)
+    failed = stale.filter(kind__in=NOT_IDEMPOTENT).update(
+        status=Job.FAILED, finished_at=now, updated_at=now,
+        error="The worker stopped while this job was running. It was not retried because "
+              "its completed batches are already saved; see the message for how far it got.",
+    )
+    requeued = stale.update(status=Job.QUEUED, worker="", started_at=None, updated_at=now)
+    return requeued, failed
+
+
+def describe(job):
+    """The JSON shape the status API returns."""
+    return {
+        "id": job.pk,
+        "kind": job.kind,
+        "status": job.status,
+        "progress": job.progress,
+        "message": job.message,
+        "result": job.result,
+        "error": job.error.strip().splitlines()[-1] if job.error else None,
+        "created_at": job.created_at.isoformat(),
+        "started_at": job.started_at.isoformat() if job.started_at else None,
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+    }
+
+
+# ----- Handlers -----
+@handler("export_ledger")
+def export_ledger_job(job, floor=None, renters=None):
+    total = Payment.objects.count() or 1
+    path = os.path.join(output_dir("exports"), f"payment-ledger-{job.pk}.csv")
+    written = [0]
+
+    def counted(rows):
+        for row in rows:
+            written[0] += 1
+            if written[0] % 5000 == 0:
+                job.set_progress(written[0] * 100 // total, f"{written[0]} rows")
+            yield row
+
+    with open(path, "w", newline="", encoding="utf-8") as out:
+        for chunk in csv_chunks(counted(ledger_rows(floor, renters))):
+            out.write(chunk)
+    return {"file": path, "rows": written[0]}
+
+
+@handler("import_payments", idempotent=False)
+def import_payments_job(job, path, fmt="csv", batch_size=500, dry_run=False):
+    size = os.path.getsize(path) or 1
+    with open(path, "rb") as raw:
+        stream = io.TextIOWrapper(raw, encoding="utf-8-sig", newline="")
+
+        def on_batch(report):
+            job.set_progress(raw.tell() * 100 // size, f"{report.imported} imported, {report.failed} rejected")
+
+        report = import_payments(stream, fmt, batch_size, dry_run, on_batch=on_batch)
+    os.remove(path)
+    return report.as_dict()
+
+
+@handler("generate_statements")
+def generate_statements_job(job, formats=("html", "csv"), chunk_size=200, force=False):
+    directory = output_dir("statements")
+    manifest = {} if force else load_manifest(directory)
+    ids = list(Renter.objects.order_by("pk").values_list("pk", flat=True))
+    written = skipped = 0
+    for i in range(0, len(ids), chunk_size):
+        chunk = ids[i:i + chunk_size]
+        known = {str(pk): manifest[str(pk)] for pk in chunk if str(pk) in manifest}
+        chunk_written, chunk_skipped, fingerprints = render_chunk(chunk, directory, tuple(formats), known)
+        written, skipped = written + chunk_written, skipped + chunk_skipped
+        manifest.update({str(pk): fp for pk, fp in fingerprints.items()})
+        job.set_progress((i + len(chunk)) * 100 // len(ids), f"{written} written, {skipped} skipped")
+    save_manifest(directory, manifest)
+    return {"directory": directory, "written": written, "skipped": skipped}
+
+
+@handler("build_rent_roll")
+def build_rent_roll_job(job, full=False):
+    return {"months": update_rent_roll(full=full)}
+
+
+@handler("fill_renter_months")
+def fill_renter_months_job(job):
+    with transaction.atomic():
+        return {"renters": fill_missing_months()}
+
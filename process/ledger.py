@@ -0,0 +1,455 @@
+from datetime import date
+from decimal import Decimal, ROUND_DOWN
+
+from django.db.models import Count, F, Q, Sum, Value, DateField
+from django.db.models.functions import Coalesce, Greatest, TruncMonth
+
+from .models import YearlyRent, Renter, Payment, RenterMonth, RentRollSnapshot, CoverageMask
+from .rates import load_rates
+
+ZERO = Decimal('0.00')
+CENT = Decimal('0.01')
+
+
+# ----- Month indexes -----
+# A month is stored as year * 12 + (month - 1) so stepping through a tenancy
+# is plain integer arithmetic instead of relativedelta / strftime round-trips.
+def month_index(d):
+    return d.year * 12 + d.month - 1
+
+
+def index_to_date(idx):
+    year, month0 = divmod(idx, 12)
+    return date(year, month0 + 1, 1)
+
+
+def index_to_ym(idx):
+    year, month0 = divmod(idx, 12)
+    return f"{year}-{month0 + 1:02}"
+
+
+def covered_indexes(payment_type, month_covered, date_paid):
+    """Month indexes a single payment covers (yearly payments span 12 months)."""
+    start = month_index(month_covered or date_paid)
+    if payment_type == "yearly":
+        return range(start, start + 12)
+    if payment_type == "monthly":
+        return range(start, start + 1)
+    return range(0)
+
+
+def split_amount(amount, parts):
+    """Split an amount into `parts` cent-exact shares, remainder on the first."""
+    amount = amount if isinstance(amount, Decimal) else Decimal(str(amount))
+    share = (amount / parts).quantize(CENT, rounding=ROUND_DOWN)
+    return [amount - share * (parts - 1)] + [share] * (parts - 1)
+
+
+def expected_between(start_date, rents, today=None):
+    """
+    (months, total) expected from start_date's month through today's month,
+    computed per year segment as months-in-year x price.
+    """
+    start, end = month_index(start_date), month_index(today or date.today())
+    months, total = 0, ZERO
+    for year in range(start // 12, end // 12 + 1):
+        count = min(end, year * 12 + 11) - max(start, year * 12) + 1
+        months += count
+        total += count * rents.get(year, ZERO)
+    return months, total
+
+
+class Ledger:
+    """
+    Expected / paid / missed figures for one renter, computed in a single pass.
+
+    `months` yields (month index, expected monthly rent, paid) for every month
+    from `start_date` to `today`, and `total_paid` is the sum of the renter's
+    payments. Nothing here touches the database; the classmethods load the
+    inputs with a fixed number of queries.
+    """
+
+    def __init__(self, start_date, months, total_paid=ZERO, today=None):
+        self.start = month_index(start_date)
+        self.end = month_index(today or date.today())
+        self.total_paid = total_paid
+
+        self.expected = ZERO
+        self.expected_unpaid = ZERO
+        self.statuses = []
+        self.missed = []
+        for idx, monthly, is_paid in months:
+            self.expected += monthly
+            self.statuses.append((idx, is_paid))
+            if not is_paid:
+                self.missed.append(idx)
+                self.expected_unpaid += monthly
+
+    @classmethod
+    def compute(cls, start_date, rents, coverage, total_paid=ZERO, today=None):
+        """
+        Build from raw inputs: `rents` maps year -> monthly price and `coverage`
+        is an iterable of (payment_type, month_covered, date_paid) tuples.
+        """
+        today = today or date.today()
+        paid = set()
+        for payment_type, month_covered, date_paid in coverage:
+            paid.update(covered_indexes(payment_type, month_covered, date_paid))
+        months = (
+            (idx, rents.get(idx // 12, ZERO), idx in paid)
+            for idx in range(month_index(start_date), month_index(today) + 1)
+        )
+        return cls(start_date, months, total_paid=total_paid, today=today)
+
+    @classmethod
+    def from_payments(cls, start_date, rents, payments, today=None):
+        """Build from (amount, payment_type, month_covered, date_paid) rows."""
+        total = ZERO
+        coverage = []
+        for amount, payment_type, month_covered, date_paid in payments:
+            if amount is not None:
+                total += amount if isinstance(amount, Decimal) else Decimal(str(amount))
+            coverage.append((payment_type, month_covered, date_paid))
+        return cls.compute(start_date, rents, coverage, total_paid=total, today=today)
+
+    @classmethod
+    def for_renter(cls, renter, today=None):
+        """
+        One query: the renter's materialized RenterMonth rows, with the paid
+        total taken from the stored Renter.total_paid. Missing trailing months
+        (a new month started since the rows were written) are filled in first.
+        """
+        today = today or date.today()
+        start, end = month_index(renter.start_date), month_index(today)
+        rows = renter_month_rows(renter, start, end)
+        if len(rows) != max(end - start + 1, 0):
+            sync_renter_months(renter, today=today)
+            rows = renter_month_rows(renter, start, end)
+        months = ((month_index(month), expected, paid) for month, expected, paid in rows)
+        return cls(renter.start_date, months, total_paid=renter.total_paid, today=today)
+
+    @classmethod
+    def for_renters(cls, renters, today=None):
+        """
+        Yield (renter, ledger) for every renter in a queryset using three queries
+        in total: renters with their summed payments, the rent rows of their
+        apartments and the coverage columns of their payments.
+        """
+        renters = renters.annotate(paid_sum=Coalesce(Sum("payments__amount"), ZERO)).order_by("pk")
+        renter_ids = renters.values("pk")
+
+        rents = {}
+        rows = YearlyRent.objects.filter(apartment__renter__in=renter_ids).values_list("apartment_id", "year", "price")
+        for apartment_id, year, price in rows:
+            rents.setdefault(apartment_id, {})[year] = price
+
+        coverage = {}
+        rows = Payment.objects.filter(renter__in=renter_ids).values_list(
+            "renter_id", "payment_type", "month_covered", "date_paid"
+        )
+        for renter_id, payment_type, month_covered, date_paid in rows:
+            coverage.setdefault(renter_id, []).append((payment_type, month_covered, date_paid))
+
+        for renter in renters:
+            yield renter, cls.compute(
+                renter.start_date,
+                rents.get(renter.apartment_id, {}),
+                coverage.get(renter.pk, ()),
+                total_paid=renter.paid_sum,
+                today=today,
+            )
+
+    @property
+    def balance(self):
+        """Positive = overpaid, Negative = owes money"""
+        return self.total_paid - self.expected
+
+    @property
+    def months_count(self):
+        return max(self.end - self.start + 1, 0)
+
+    def missed_months(self):
+        return [index_to_ym(idx) for idx in self.missed]
+
+    def payment_status_by_month(self):
+        return [(index_to_ym(idx), is_paid) for idx, is_paid in self.statuses]
+
+    def matrix(self):
+        """(years, rows) for the month x year table on the renter page."""
+        first_year, last_year = self.start // 12, self.end // 12
+        years = list(range(first_year, last_year + 1))
+        rows = [[False] * len(years) for _ in range(12)]
+        for idx, is_paid in self.statuses:
+            rows[idx % 12][idx // 12 - first_year] = is_paid
+        return years, rows
+
+
+# ----- Materialized RenterMonth rows -----
+def renter_month_rows(renter, start, end):
+    return list(
+        renter.months.filter(month__gte=index_to_date(start), month__lte=index_to_date(end))
+        .order_by("month")
+        .values_list("month", "expected", "paid")
+    )
+
+
+def compute_month_rows(renter, indexes):
+    """
+    Unsaved RenterMonth rows for the given month indexes of one renter, built
+    from the apartment's rent table and the payments that can reach them.
+    """
+    indexes = sorted(set(indexes))
+    if not indexes:
+        return []
+    first, last = indexes[0], indexes[-1]
+
+    # straight from the table: stored rows must not depend on this process's rate cache
+    rents = load_rates(renter.apartment_id)
+
+    # a yearly payment starting up to 11 months earlier can still cover `first`
+    lower, upper = index_to_date(first - 11), index_to_date(last + 1)
+    payments = renter.payments.filter(
+        Q(month_covered__gte=lower, month_covered__lt=upper)
+        | Q(month_covered__isnull=True, date_paid__gte=lower, date_paid__lt=upper)
+    ).values_list("amount", "payment_type", "month_covered", "date_paid")
+
+    wanted = set(indexes)
+    covered = {}
+    for amount, payment_type, month_covered, date_paid in payments:
+        span = covered_indexes(payment_type, month_covered, date_paid)
+        if not span:
+            continue
+        for idx, share in zip(span, split_amount(amount or ZERO, len(span))):
+            if idx in wanted:
+                covered[idx] = covered.get(idx, ZERO) + share
+
+    return [
+        RenterMonth(
+            renter_id=renter.pk,
+            month=index_to_date(idx),
+            expected=rents.get(idx // 12, ZERO),
+            covered=covered.get(idx, ZERO),
+            paid=idx in covered,
+        )
+        for idx in indexes
+    ]
+
+
+def write_month_rows(rows):
+    RenterMonth.objects.bulk_create(
+        rows,
+        update_conflicts=True,
+        unique_fields=["renter", "month"],
+        update_fields=["expected", "covered", "paid"],
+    )
+    mark_months_dirty(row.month for row in rows)
+    years = {}
+    for row in rows:
+        years.setdefault(row.renter_id, set()).add(row.month.year)
+    for renter_id, renter_years in years.items():
+        refresh_coverage_masks(renter_id, renter_years)
+
+
+def month_masks(months):
+    """{year: (paid, unpaid)} 12-bit masks from (first-of-month date, paid) pairs."""
+    masks = {}
+    for month, is_paid in months:
+        paid, unpaid = masks.get(month.year, (0, 0))
+        bit = 1 << (month.month - 1)
+        masks[month.year] = (paid | bit, unpaid) if is_paid else (paid, unpaid | bit)
+    return masks
+
+
+def refresh_coverage_masks(renter_id, years):
+    """Rewrite one renter's CoverageMask rows for `years` from its RenterMonth rows."""
+    years = set(years)
+    if not years:
+        return
+    months = RenterMonth.objects.filter(
+        renter_id=renter_id, month__gte=date(min(years), 1, 1), month__lt=date(max(years) + 1, 1, 1)
+    ).values_list("month", "paid")
+    masks = {year: bits for year, bits in month_masks(months).items() if year in years}
+    CoverageMask.objects.bulk_create(
+        [CoverageMask(renter_id=renter_id, year=year, paid=paid, unpaid=unpaid) for year, (paid, unpaid) in masks.items()],
+        update_conflicts=True,
+        unique_fields=["renter", "year"],
+        update_fields=["paid", "unpaid"],
+    )
+    if years - set(masks):
+        CoverageMask.objects.filter(renter_id=renter_id, year__in=years - set(masks)).delete()
+
+
+def mark_months_dirty(months):
+    """Flag the rent-roll snapshots of these months for the next build_rent_roll."""
+    months = set(months)
+    if months:
+        RentRollSnapshot.objects.bulk_create(
+            [RentRollSnapshot(month=month) for month in months],
+            update_conflicts=True,
+            unique_fields=["month"],
+            update_fields=["dirty"],
+        )
+
+
+def refresh_renter_months(renter, indexes, today=None):
+    """Recompute only the given months of one renter (those inside the tenancy)."""
+    start = month_index(renter.start_date)
+    end = month_index(today or date.today())
+    indexes = [idx for idx in indexes if start <= idx <= end]
+    write_month_rows(compute_month_rows(renter, indexes))
+
+
+def sync_renter_months(renter, today=None):
+    """Rebuild every RenterMonth row of one renter from scratch."""
+    start = month_index(renter.start_date)
+    end = month_index(today or date.today())
+    outside = renter.months.exclude(month__gte=index_to_date(start), month__lte=index_to_date(end))
+    removed = list(outside.values_list("month", flat=True))
+    if removed:
+        mark_months_dirty(removed)
+        outside.delete()
+        refresh_coverage_masks(renter.pk, {month.year for month in removed})
+    rows = compute_month_rows(renter, range(start, end + 1))
+    write_month_rows(rows)
+    return len(rows)
+
+
+def fill_missing_months(today=None):
+    """
+    RenterMonth rows are only written when a renter's payments or rents change,
+    so a renter nobody has touched for a while has no rows for the months since
+    (and a payment for a later month can leave a gap behind it). Create every
+    missing month through today's month; returns the number of renters filled.
+    One aggregate query when nothing is missing.
+    """
+    today = today or date.today()
+    end = month_index(today)
+    renters = (
+        Renter.objects.filter(start_date__lte=today)
+        # months are stored as the 1st; count from the 1st of the start month
+        .annotate(stored=Count("months", filter=Q(months__month__gte=TruncMonth("start_date"),
+                                                  months__month__lte=index_to_date(end))))
+        .only("id", "apartment_id", "start_date")
+    )
+    behind = [renter for renter in renters if renter.stored < end - month_index(renter.start_date) + 1]
+    for renter in behind:
+        start = month_index(renter.start_date)
+        stored = {month_index(month) for month in renter.months.filter(month__gte=index_to_date(start))
+                  .values_list("month", flat=True)}
+        refresh_renter_months(renter, [idx for idx in range(start, end + 1) if idx not in stored], today)
+    return len(behind)
+
+
+def bump_ledger_versions(apartment_ids):
+    """A rent change alters the ledgers of the apartments' renters: bump their ledger_version."""
+    return Renter.objects.filter(apartment_id__in=apartment_ids).update(ledger_version=F("ledger_version") + 1)
+
+
+def set_month_rent(apartment_id, year, price):
+    """Push a YearlyRent change into the expected column of the stored months."""
+    months = RenterMonth.objects.filter(renter__apartment_id=apartment_id, month__year=year)
+    mark_months_dirty(months.values_list("month", flat=True).distinct())
+    bump_ledger_versions([apartment_id])
+    return months.update(expected=price)
+
+
+def verify_renter_months(renter, today=None):
+    """Return the month strings whose stored row differs from a fresh computation."""
+    start = month_index(renter.start_date)
+    end = month_index(today or date.today())
+    stored = {
+        month_index(month): (expected, covered, paid)
+        for month, expected, covered, paid in renter.months.values_list("month", "expected", "covered", "paid")
+    }
+    drift = []
+    for row in compute_month_rows(renter, range(start, end + 1)):
+        idx = month_index(row.month)
+        if stored.pop(idx, None) != (row.expected, row.covered, row.paid):
+            drift.append(index_to_ym(idx))
+    drift.extend(index_to_ym(idx) for idx in sorted(stored))
+    return drift
+
+
+# ----- Stored Renter totals -----
+def as_decimal(amount):
+    if amount is None:
+        return ZERO
+    return amount if isinstance(amount, Decimal) else Decimal(str(amount))
+
+
+def paid_through(payment_type, month_covered, date_paid):
+    """First day of the last month a payment covers."""
+    span = covered_indexes(payment_type, month_covered, date_paid)
+    return index_to_date(span[-1]) if span else None
+
+
+def apply_payment_totals(renter_id, amount, count, through=None):
+    """
+    O(1) update of a renter's running totals: add `amount` and `count` and move
+    paid_through forward to `through`. Must run in the same transaction as the
+    Payment write it mirrors.
+    """
+    updates = {
+        "total_paid": F("total_paid") + as_decimal(amount),
+        "payment_count": F("payment_count") + count,
+        "ledger_version": F("ledger_version") + 1,
+    }
+    if through:
+        through = Value(through, output_field=DateField())
+        updates["paid_through"] = Greatest(Coalesce(F("paid_through"), through), through)
+    return Renter.objects.filter(pk=renter_id).update(**updates)
+
+
+def renter_totals(renter_id):
+    """(total_paid, paid_through, payment_count) recomputed from the payments."""
+    total, count, through = ZERO, 0, None
+    rows = Payment.objects.filter(renter_id=renter_id).values_list("amount", "payment_type", "month_covered", "date_paid")
+    for amount, *coverage in rows:
+        total += as_decimal(amount)
+        count += 1
+        last = paid_through(*coverage)
+        if last and (through is None or last > through):
+            through = last
+    return total, through, count
+
+
+def reset_renter_totals(renter_id):
+    total, through, count = renter_totals(renter_id)
+    Renter.objects.filter(pk=renter_id).update(total_paid=total, paid_through=through, payment_count=count,
+                                               ledger_version=F("ledger_version") + 1)
+
+
+def reconcile_renter_totals(renter, save=True):
+    """Repair drift in one renter's stored totals; returns True if they were off."""
+    total, through, count = renter_totals(renter.pk)
+    if (renter.total_paid, renter.paid_through, renter.payment_count) == (total, through, count):
+        return False
+    if save:
+        Renter.objects.filter(pk=renter.pk).update(total_paid=total, paid_through=through, payment_count=count,
+                                                   ledger_version=F("ledger_version") + 1)
+        renter.total_paid, renter.paid_through, renter.payment_count = total, through, count
+    return True
+
+
+# ----- Bulk writes -----
+def record_bulk_payments(renters, payments):
+    """
+    Mirror a bulk_create of payments (which sends no signals) into the stored
+    Renter totals and RenterMonth rows. `renters` maps renter id -> Renter.
+    Call inside the same transaction as the bulk_create.
+    """
+    per_renter = {}
+    for payment in payments:
+        total, count, through, indexes = per_renter.get(payment.renter_id, (ZERO, 0, None, set()))
+        coverage = (payment.payment_type, payment.month_covered, payment.date_paid)
+        last = paid_through(*coverage)
+        indexes.update(covered_indexes(*coverage))
+        per_renter[payment.renter_id] = (
+            total + as_decimal(payment.amount),
+            count + 1,
+            max(through, last) if through and last else (through or last),
+            indexes,
+        )
+    for renter_id, (total, count, through, indexes) in per_renter.items():
+        apply_payment_totals(renter_id, total, count, through)
+        refresh_renter_months(renters[renter_id], indexes)
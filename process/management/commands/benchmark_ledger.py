@@ -0,0 +1,82 @@
+import random
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from process.ledger import index_to_date, month_index
+from process.models import Floor, Apartment, YearlyRent, Renter, Payment
+from process.synthetic import finish_renters, payment_history, rent_table
+
+METHODS = {
+    "expected_payments": lambda renter: renter.expected_payments(),
+    "missed_months": lambda renter: renter.missed_months(),
+    "payment_status_by_month": lambda renter: renter.payment_status_by_month(),
+    "total_paid": lambda renter: renter.total_paid,
+    "all four": lambda renter: (renter.expected_payments(), renter.missed_months(),
+                                renter.payment_status_by_month(), renter.total_paid),
+}
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Time the Renter ledger methods as tenancy length and payment count grow, reporting wall time "
+        "and query count. Works inside a transaction that is rolled back, so no data is left behind."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--months", default="12,60,120,240", help="Comma-separated tenancy lengths")
+        parser.add_argument("--pay-rate", type=float, default=0.9)
+        parser.add_argument("--repeat", type=int, default=5, help="Runs per measurement (best is reported)")
+        parser.add_argument("--seed", type=int, default=0)
+
+    def measure(self, renter_pk, method, repeat):
+        best, queries = None, 0
+        for _ in range(repeat):
+            # a fresh instance each run so the per-instance ledger cache starts cold
+            renter = Renter.objects.get(pk=renter_pk)
+            with CaptureQueriesContext(connection) as ctx:
+                started = time.perf_counter()
+                METHODS[method](renter)
+                elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+            queries = len(ctx.captured_queries)
+        return best, queries
+
+    def handle(self, *args, **options):
+        lengths = [int(m) for m in options["months"].split(",") if m.strip()]
+        rng = random.Random(options["seed"])
+        header = f"{'months':>6} {'payments':>8}  {'method':<24} {'ms':>9} {'queries':>7}"
+        self.stdout.write(header)
+        self.stdout.write("-" * len(header))
+        try:
+            with transaction.atomic():
+                floor = Floor.objects.create(number=-(10 ** 6))
+                today = date.today()
+                for months in lengths:
+                    start = index_to_date(month_index(today) - months + 1)
+                    apartment = Apartment.objects.create(floor=floor)
+                    rents = rent_table(rng, start.year, today.year)
+                    YearlyRent.objects.bulk_create(
+                        [YearlyRent(apartment=apartment, year=y, price=p) for y, p in rents.items()]
+                    )
+                    renter = Renter.objects.create(name=f"Benchmark {months}", email="bench@example.com",
+                                                   phone="0", apartment=apartment, floor=floor, start_date=start)
+                    payments = Payment.objects.bulk_create(
+                        payment_history(rng, renter, rents, pay_rate=options["pay_rate"], today=today)
+                    )
+                    finish_renters([renter])
+                    for method in METHODS:
+                        elapsed, queries = self.measure(renter.pk, method, options["repeat"])
+                        self.stdout.write(
+                            f"{months:>6} {len(payments):>8}  {method:<24} {elapsed * 1000:>9.3f} {queries:>7}"
+                        )
+                raise Rollback
+        except Rollback:
+            pass
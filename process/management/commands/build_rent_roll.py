@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from process.rentroll import update_rent_roll
+
+
+class Command(BaseCommand):
+    help = "Refresh the monthly rent-roll snapshots, recomputing only dirty or missing months."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--full", action="store_true", help="Recompute every month")
+
+    def handle(self, *args, **options):
+        count = update_rent_roll(full=options["full"])
+        self.stdout.write(self.style.SUCCESS(f"Recomputed {count} months"))
@@ -0,0 +1,43 @@
+from decimal import Decimal, InvalidOperation
+
+from django.core.management.base import BaseCommand, CommandError
+
+from process.rent_changes import select_apartments, plan_rent_change, apply_rent_change
+
+
+def decimal_arg(value):
+    try:
+        return Decimal(value)
+    except InvalidOperation:
+        raise ValueError(value)
+
+
+class Command(BaseCommand):
+    help = "Set a year's monthly rent for whole floors, listed apartments or the building in one transaction."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--year", type=int, required=True)
+        amount = parser.add_mutually_exclusive_group(required=True)
+        amount.add_argument("--price", type=decimal_arg, help="New monthly price")
+        amount.add_argument("--percent", type=decimal_arg, help="Increase over the prior year's price, e.g. 3.5")
+        parser.add_argument("--floor", type=int, action="append", help="Floor id (repeatable)")
+        parser.add_argument("--apartment", type=int, action="append", help="Apartment id (repeatable)")
+        parser.add_argument("--all", action="store_true", help="Every apartment in the building")
+        parser.add_argument("--dry-run", action="store_true", help="Report the change without writing it")
+
+    def handle(self, *args, **options):
+        try:
+            apartments = select_apartments(options["floor"], options["apartment"], options["all"])
+            plan, skipped = plan_rent_change(apartments, options["year"], options["price"], options["percent"])
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        if skipped:
+            self.stdout.write(f"Skipped (no {options['year'] - 1} rent): {', '.join(map(str, skipped))}")
+        if options["dry_run"]:
+            for apartment_id, price in plan.items():
+                self.stdout.write(f"Apartment {apartment_id}: {price}")
+            self.stdout.write(self.style.SUCCESS(f"Would update {len(plan)} apartments"))
+            return
+        affected = apply_rent_change(options["year"], plan)
+        self.stdout.write(self.style.SUCCESS(f"Updated {options['year']} rent for {affected} apartments"))
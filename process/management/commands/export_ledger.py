@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from process.exports import DEFAULT_CHUNK_SIZE, csv_chunks, ledger_rows
+
+
+class Command(BaseCommand):
+    help = "Stream the payment ledger with running balances as CSV (see process/exports.py for the columns)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("-o", "--output", help="Write to this file instead of stdout")
+        parser.add_argument("--floor", type=int, help="Only renters on this floor id")
+        parser.add_argument("--renter", type=int, action="append", help="Only this renter id (repeatable)")
+        parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        if options["chunk_size"] < 1:
+            raise CommandError("--chunk-size must be positive")
+        chunks = csv_chunks(ledger_rows(options["floor"], options["renter"], options["chunk_size"]))
+        if not options["output"]:
+            for chunk in chunks:
+                self.stdout.write(chunk, ending="")
+            return
+
+        try:
+            with open(options["output"], "w", newline="", encoding="utf-8") as out:
+                for chunk in chunks:
+                    out.write(chunk)
+        except OSError as e:
+            raise CommandError(str(e))
+        self.stdout.write(self.style.SUCCESS(f"Wrote ledger to {options['output']}"))
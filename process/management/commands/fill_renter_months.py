@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from process.ledger import fill_missing_months
+
+
+class Command(BaseCommand):
+    help = ("Write the RenterMonth rows missing through this month. Schedule it for the 1st of each month: "
+            "delinquency lookups, exports and the admin only read the rows that exist.")
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            count = fill_missing_months()
+        self.stdout.write(self.style.SUCCESS(f"Filled months for {count} renters"))
@@ -0,0 +1,32 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from process.synthetic import generate
+
+
+class Command(BaseCommand):
+    help = "Seed synthetic floors, apartments, renters, yearly rents and payment histories."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--floors", type=int, default=10)
+        parser.add_argument("--apartments-per-floor", type=int, default=20)
+        parser.add_argument("--years", type=int, default=5, help="Years of rent and payment history")
+        parser.add_argument("--occupancy", type=float, default=0.9, help="Share of apartments with a renter")
+        parser.add_argument("--pay-rate", type=float, default=0.9, help="Share of months paid")
+        parser.add_argument("--yearly-rate", type=float, default=0.1, help="Chance a year is paid up front")
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        if options["floors"] < 1 or options["apartments_per_floor"] < 1 or options["years"] < 1:
+            raise CommandError("--floors, --apartments-per-floor and --years must be positive")
+        started = time.perf_counter()
+        counts = generate(
+            options["floors"], options["apartments_per_floor"], options["years"],
+            occupancy=options["occupancy"], pay_rate=options["pay_rate"], yearly_rate=options["yearly_rate"],
+            seed=options["seed"], batch_size=options["batch_size"],
+        )
+        elapsed = time.perf_counter() - started
+        summary = ", ".join(f"{count} {name.replace('_', ' ')}" for name, count in counts.items())
+        self.stdout.write(self.style.SUCCESS(f"Created {summary} in {elapsed:.1f}s"))
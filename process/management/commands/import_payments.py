@@ -0,0 +1,45 @@
+import csv
+
+from django.core.management.base import BaseCommand, CommandError
+
+from process.importer import DEFAULT_BATCH_SIZE, ImportReport, detect_format, import_payments
+
+
+class Command(BaseCommand):
+    help = "Stream-import payments from a CSV or JSONL file (see process/importer.py for the columns)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path")
+        parser.add_argument("--format", choices=["csv", "jsonl"], help="Defaults to the file extension")
+        parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+        parser.add_argument("--dry-run", action="store_true", help="Validate only, write nothing")
+        parser.add_argument("--errors", help="Write every rejected row to this CSV file")
+
+    def handle(self, *args, **options):
+        if options["batch_size"] < 1:
+            raise CommandError("--batch-size must be positive")
+        fmt = options["format"] or detect_format(options["path"])
+
+        error_file = open(options["errors"], "w", newline="") if options["errors"] else None
+        try:
+            on_error = None
+            if error_file:
+                writer = csv.writer(error_file)
+                writer.writerow(["line", "error"])
+
+                def on_error(line, message):
+                    writer.writerow([line, message])
+            report = ImportReport(max_errors=0 if error_file else 20, on_error=on_error)
+            try:
+                with open(options["path"], newline="", encoding="utf-8-sig") as stream:
+                    import_payments(stream, fmt, options["batch_size"], options["dry_run"], report)
+            except OSError as e:
+                raise CommandError(str(e))
+        finally:
+            if error_file:
+                error_file.close()
+
+        for error in report.errors:
+            self.stdout.write(f"line {error['line']}: {error['error']}")
+        verb = "Validated" if options["dry_run"] else "Imported"
+        self.stdout.write(self.style.SUCCESS(f"{verb} {report.imported} payments, {report.failed} rows rejected"))
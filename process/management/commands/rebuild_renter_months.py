@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from process.models import Renter
+from process.ledger import sync_renter_months, verify_renter_months
+
+
+class Command(BaseCommand):
+    help = "Rebuild (or with --verify, check) the materialized RenterMonth ledger rows."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--renter", type=int, action="append", help="Only this renter id (repeatable)")
+        parser.add_argument("--verify", action="store_true", help="Report drift instead of rewriting rows")
+
+    def handle(self, *args, **options):
+        renters = Renter.objects.order_by("pk")
+        if options["renter"]:
+            renters = renters.filter(pk__in=options["renter"])
+
+        if options["verify"]:
+            drifted = 0
+            for renter in renters.iterator():
+                drift = verify_renter_months(renter)
+                if drift:
+                    drifted += 1
+                    self.stdout.write(f"Renter {renter.pk} ({renter.name}): {', '.join(drift)}")
+            if drifted:
+                raise CommandError(f"{drifted} renter(s) have drifted; run without --verify to rebuild")
+            self.stdout.write(self.style.SUCCESS("All renter months are up to date"))
+            return
+
+        renter_count = month_count = 0
+        for renter in renters.iterator():
+            with transaction.atomic():
+                month_count += sync_renter_months(renter)
+            renter_count += 1
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {month_count} months for {renter_count} renters"))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from process.search import fts_enabled, rebuild_index
+
+
+class Command(BaseCommand):
+    help = "Rebuild the FTS5 renter search index from the renter table."
+
+    def handle(self, *args, **options):
+        if not fts_enabled():
+            raise CommandError("Renter search uses SQLite FTS5; this database falls back to LIKE queries")
+        count = rebuild_index()
+        self.stdout.write(self.style.SUCCESS(f"Indexed {count} renters"))
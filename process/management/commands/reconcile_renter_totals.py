@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from process.models import Renter
+from process.ledger import reconcile_renter_totals
+
+
+class Command(BaseCommand):
+    help = "Recompute Renter.total_paid / paid_through / payment_count from payments and repair any drift."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--renter", type=int, action="append", help="Only this renter id (repeatable)")
+        parser.add_argument("--dry-run", action="store_true", help="Report drift without writing")
+
+    def handle(self, *args, **options):
+        renters = Renter.objects.order_by("pk")
+        if options["renter"]:
+            renters = renters.filter(pk__in=options["renter"])
+
+        checked = repaired = 0
+        for renter in renters.iterator():
+            checked += 1
+            if reconcile_renter_totals(renter, save=not options["dry_run"]):
+                repaired += 1
+                self.stdout.write(f"Renter {renter.pk} ({renter.name}) had drifted")
+
+        verb = "drifted" if options["dry_run"] else "repaired"
+        self.stdout.write(self.style.SUCCESS(f"Checked {checked} renters, {repaired} {verb}"))
@@ -0,0 +1,60 @@
+import signal
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from process.jobs import claim_next, requeue_stale, run_job, worker_name
+
+
+class Command(BaseCommand):
+    help = "Process background jobs from the Job table. Run as many workers as you like."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--poll-interval", type=float, default=2.0, help="Seconds to sleep when the queue is empty")
+        parser.add_argument("--once", action="store_true", help="Exit when the queue is empty")
+        parser.add_argument("--max-jobs", type=int, help="Exit after this many jobs")
+        parser.add_argument("--stale-minutes", type=int, default=30,
+                            help="Requeue running jobs with no progress for this long (0 disables)")
+
+    def handle(self, *args, **options):
+        name = worker_name()
+        stopping = []
+        # finish the current job on SIGTERM/SIGINT instead of dying half way through it
+        previous = {sig: signal.getsignal(sig) for sig in (signal.SIGTERM, signal.SIGINT)}
+        for sig in previous:
+            signal.signal(sig, lambda *_: stopping.append(True))
+        try:
+            done = self.work(name, stopping, options)
+        finally:
+            for sig, old in previous.items():
+                signal.signal(sig, old)
+        self.stdout.write(self.style.SUCCESS(f"Worker {name} stopped after {done} jobs"))
+
+    def work(self, name, stopping, options):
+        self.stdout.write(f"Worker {name} started")
+        done = 0
+        # beat well inside the stale timeout so a live job is never requeued
+        heartbeat = options["stale_minutes"] * 60 / 4 or None
+        while not stopping:
+            close_old_connections()
+            if options["stale_minutes"]:
+                requeued, failed = requeue_stale(timedelta(minutes=options["stale_minutes"]))
+                if requeued or failed:
+                    self.stdout.write(f"Requeued {requeued} stale jobs, failed {failed} that cannot be repeated")
+            job = claim_next(name)
+            if job is None:
+                if options["once"]:
+                    break
+                time.sleep(options["poll_interval"])
+                continue
+
+            started = time.perf_counter()
+            ok = run_job(job, heartbeat=heartbeat)
+            status = "done" if ok else "FAILED"
+            self.stdout.write(f"Job {job.pk} ({job.kind}) {status} in {time.perf_counter() - started:.1f}s")
+            done += 1
+            if options["max_jobs"] and done >= options["max_jobs"]:
+                break
+        return done
@@ -0,0 +1,156 @@
+"""
+Opt-in per-request SQL instrumentation (settings.QUERY_TIMING / DJANGO_QUERY_TIMING=1).
+
+Every request gets a Server-Timing header with total, SQL time and query count.
+Streamed responses send their headers before the body runs, so theirs is
+marked partial; their stats are recorded once the stream has been consumed.
+The same SQL text run over and over in one request is flagged as a likely N+1.
+Rolling per-URL-name stats are kept in memory and exposed to staff by
+views.query_stats_api. The hook is one execute_wrapper call per query, cheap
+enough to leave on in production.
+"""
+import logging
+import time
+from collections import deque
+from contextlib import ExitStack
+from threading import Lock
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+
+class QueryRecorder:
+    """execute_wrapper hook counting queries, SQL time and repeats of each statement."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.statements = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - started
+            self.count += 1
+            self.statements[sql] = self.statements.get(sql, 0) + 1
+
+    def repeated(self, threshold):
+        return {sql: n for sql, n in self.statements.items() if n >= threshold}
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+
+class RequestStats:
+    """Rolling window of (total ms, sql ms, queries) per URL name."""
+
+    def __init__(self, window=500):
+        self.window = window
+        self._samples = {}
+        self._n_plus_one = {}
+        self._lock = Lock()
+
+    def record(self, name, total_ms, sql_ms, queries, n_plus_one):
+        with self._lock:
+            samples = self._samples.get(name)
+            if samples is None:
+                samples = self._samples[name] = deque(maxlen=self.window)
+            samples.append((total_ms, sql_ms, queries))
+            if n_plus_one:
+                self._n_plus_one[name] = self._n_plus_one.get(name, 0) + 1
+
+    def summary(self):
+        """Per-URL-name percentiles, worst p95 total time first."""
+        with self._lock:
+            snapshot = {name: list(samples) for name, samples in self._samples.items()}
+            n_plus_one = dict(self._n_plus_one)
+        rows = []
+        for name, samples in snapshot.items():
+            totals, sqls, queries = zip(*samples)
+            rows.append({
+                "url_name": name,
+                "requests": len(samples),
+                "total_ms": {p: round(percentile(totals, f), 2) for p, f in (("p50", .5), ("p95", .95), ("p99", .99))},
+                "sql_ms": {p: round(percentile(sqls, f), 2) for p, f in (("p50", .5), ("p95", .95), ("p99", .99))},
+                "queries": {"p50": percentile(queries, .5), "p95": percentile(queries, .95), "max": max(queries)},
+                "n_plus_one_requests": n_plus_one.get(name, 0),
+            })
+        rows.sort(key=lambda row: row["total_ms"]["p95"], reverse=True)
+        return rows
+
+    def clear(self):
+        with self._lock:
+            self._samples.clear()
+            self._n_plus_one.clear()
+
+
+request_stats = RequestStats(getattr(settings, "QUERY_TIMING_WINDOW", 500))
+
+
+class QueryTimingMiddleware:
+    def __init__(self, get_response):
+        if not getattr(settings, "QUERY_TIMING", False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.threshold = getattr(settings, "QUERY_TIMING_N_PLUS_ONE_THRESHOLD", 5)
+
+    def __call__(self, request):
+        recorder = QueryRecorder()
+        started = time.perf_counter()
+        stack = ExitStack()
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(recorder))
+        try:
+            response = self.get_response(request)
+        except BaseException:
+            stack.close()
+            raise
+
+        if response.streaming:
+            # the body (and its queries) runs after the headers go out: keep
+            # recording until the stream ends, and say so in the header
+            timing = self.timing(request, recorder, started, record=False)
+            timing.append('stream;desc="partial: excludes queries run while streaming"')
+            response["Server-Timing"] = ", ".join(timing)
+            response.streaming_content = self.stream(response.streaming_content, stack, request, recorder, started)
+            return response
+
+        stack.close()
+        response["Server-Timing"] = ", ".join(self.timing(request, recorder, started))
+        return response
+
+    def stream(self, content, stack, request, recorder, started):
+        try:
+            yield from content
+        finally:
+            stack.close()
+            self.timing(request, recorder, started)
+
+    def timing(self, request, recorder, started, record=True):
+        """Server-Timing entries so far; with `record`, also add the request to request_stats."""
+        total_ms = (time.perf_counter() - started) * 1000
+        sql_ms = recorder.duration * 1000
+        repeated = recorder.repeated(self.threshold)
+        match = getattr(request, "resolver_match", None)
+        name = (match.view_name if match else None) or "unresolved"
+        if record:
+            request_stats.record(name, total_ms, sql_ms, recorder.count, bool(repeated))
+
+        timing = [
+            f'db;dur={sql_ms:.2f};desc="{recorder.count} queries"',
+            f"total;dur={total_ms:.2f}",
+        ]
+        if repeated:
+            worst = max(repeated.values())
+            timing.append(f'nplus1;desc="{len(repeated)} statements repeated up to {worst}x"')
+            if record:
+                logger.warning("Possible N+1 in %s: %s", name,
+                               "; ".join(f"{n}x {sql[:120]}" for sql, n in repeated.items()))
+        return timing
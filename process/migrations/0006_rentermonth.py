@@ -0,0 +1,71 @@
+# Generated by Django 5.2.1 on 2026-10-18 08:39
+
+from datetime import date
+from decimal import Decimal, ROUND_DOWN
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def month_rows(renter, rents, payments, missing):
+    """Unsaved RenterMonth kwargs for the month indexes in `missing` (year * 12 + month - 1)."""
+    covered = {}
+    for amount, payment_type, month_covered, date_paid in payments:
+        start = month_covered or date_paid
+        idx = start.year * 12 + start.month - 1
+        span = range(idx, idx + 12) if payment_type == 'yearly' else range(idx, idx + 1) if payment_type == 'monthly' else ()
+        if not span:
+            continue
+        amount = Decimal(str(amount or 0))
+        share = (amount / len(span)).quantize(Decimal('0.01'), rounding=ROUND_DOWN)
+        for i, month in enumerate(span):
+            part = amount - share * (len(span) - 1) if i == 0 else share
+            covered[month] = covered.get(month, 0) + part
+    return [
+        dict(renter_id=renter.pk, month=date(idx // 12, idx % 12 + 1, 1), expected=rents.get(idx // 12, 0),
+             covered=covered.get(idx, 0), paid=idx in covered)
+        for idx in missing
+    ]
+
+
+def backfill_months(apps, schema_editor):
+    Renter = apps.get_model('process', 'Renter')
+    RenterMonth = apps.get_model('process', 'RenterMonth')
+    YearlyRent = apps.get_model('process', 'YearlyRent')
+    Payment = apps.get_model('process', 'Payment')
+    today = date.today()
+    end = today.year * 12 + today.month - 1
+    rents = {}
+    for apartment_id, year, price in YearlyRent.objects.values_list('apartment_id', 'year', 'price'):
+        rents.setdefault(apartment_id, {})[year] = price
+    for renter in Renter.objects.filter(start_date__lte=today).order_by('pk').iterator():
+        start = renter.start_date.year * 12 + renter.start_date.month - 1
+        payments = Payment.objects.filter(renter_id=renter.pk).values_list(
+            'amount', 'payment_type', 'month_covered', 'date_paid')
+        rows = month_rows(renter, rents.get(renter.apartment_id, {}), payments, range(start, end + 1))
+        RenterMonth.objects.bulk_create([RenterMonth(**row) for row in rows], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('process', '0005_alter_apartment_floor_alter_renter_apartment_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RenterMonth',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(help_text='First day of the month')),
+                ('expected', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('covered', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('paid', models.BooleanField(default=False)),
+                ('renter', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='months', to='process.renter')),
+            ],
+            options={
+                'unique_together': {('renter', 'month')},
+            },
+        ),
+        migrations.RunPython(backfill_months, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.2.1 on 2026-10-18 08:41
+
+from datetime import date
+
+from django.db import migrations, models
+
+
+def backfill_totals(apps, schema_editor):
+    Renter = apps.get_model('process', 'Renter')
+    Payment = apps.get_model('process', 'Payment')
+    totals = {}
+    rows = Payment.objects.values_list('renter_id', 'amount', 'payment_type', 'month_covered', 'date_paid')
+    for renter_id, amount, payment_type, month_covered, date_paid in rows:
+        total, count, through = totals.get(renter_id, (0, 0, None))
+        start = month_covered or date_paid
+        idx = start.year * 12 + start.month - 1 + (11 if payment_type == 'yearly' else 0)
+        last = date(idx // 12, idx % 12 + 1, 1)
+        totals[renter_id] = (total + (amount or 0), count + 1, max(through, last) if through else last)
+    for renter_id, (total, count, through) in totals.items():
+        Renter.objects.filter(pk=renter_id).update(total_paid=total, payment_count=count, paid_through=through)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('process', '0006_rentermonth'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='renter',
+            name='paid_through',
+            field=models.DateField(blank=True, editable=False, help_text='Last month covered by any payment', null=True),
+        ),
+        migrations.AddField(
+            model_name='renter',
+            name='payment_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='renter',
+            name='total_paid',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=12),
+        ),
+        migrations.RunPython(backfill_totals, migrations.RunPython.noop),
+    ]
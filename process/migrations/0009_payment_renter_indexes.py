@@ -0,0 +1,45 @@
+# Generated by Django 5.2.1 on 2026-10-18 08:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('process', '0008_refreshtoken'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['renter', 'month_covered'], name='payment_renter_month_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['renter', 'date_paid'], name='payment_renter_paid_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['date_paid', 'payment_type'], name='payment_paid_type_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['month_covered'], name='payment_month_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='renter',
+            index=models.Index(fields=['name'], name='renter_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='renter',
+            index=models.Index(fields=['email'], name='renter_email_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='renter',
+            index=models.Index(fields=['start_date'], name='renter_start_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='rentermonth',
+            index=models.Index(fields=['month', 'paid'], name='rentermonth_month_paid_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.1 on 2026-10-18 08:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('process', '0009_payment_renter_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='renter',
+            name='ledger_version',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+    ]
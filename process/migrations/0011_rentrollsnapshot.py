@@ -0,0 +1,27 @@
+# Generated by Django 5.2.1 on 2026-10-18 08:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('process', '0010_renter_ledger_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RentRollSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(help_text='First day of the month', unique=True)),
+                ('expected', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('collected', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('occupied', models.PositiveIntegerField(default=0, help_text='Renters in tenancy that month')),
+                ('apartments', models.PositiveIntegerField(default=0, help_text='Apartments in the building when computed')),
+                ('delinquent', models.PositiveIntegerField(default=0, help_text='Renters with the month unpaid')),
+                ('dirty', models.BooleanField(default=True)),
+                ('computed_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.1 on 2026-10-18 08:57
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_masks(apps, schema_editor):
+    RenterMonth = apps.get_model('process', 'RenterMonth')
+    CoverageMask = apps.get_model('process', 'CoverageMask')
+    masks = {}
+    for renter_id, month, paid in RenterMonth.objects.values_list('renter_id', 'month', 'paid').iterator():
+        key = (renter_id, month.year)
+        paid_bits, unpaid_bits = masks.get(key, (0, 0))
+        bit = 1 << (month.month - 1)
+        masks[key] = (paid_bits | bit, unpaid_bits) if paid else (paid_bits, unpaid_bits | bit)
+    CoverageMask.objects.bulk_create(
+        [CoverageMask(renter_id=r, year=y, paid=p, unpaid=u) for (r, y), (p, u) in masks.items()], batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('process', '0011_rentrollsnapshot'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CoverageMask',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year', models.IntegerField()),
+                ('paid', models.PositiveSmallIntegerField(default=0)),
+                ('unpaid', models.PositiveSmallIntegerField(default=0)),
+                ('renter', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='coverage_masks', to='process.renter')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['year', 'unpaid'], name='coveragemask_year_unpaid_idx')],
+                'unique_together': {('renter', 'year')},
+            },
+        ),
+        migrations.RunPython(backfill_masks, migrations.RunPython.noop),
+    ]
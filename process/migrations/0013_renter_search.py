@@ -0,0 +1,59 @@
+from django.db import migrations
+
+# External-content FTS5 index over process_renter; the triggers keep it in
+# step with inserts, deletes and edits of name/email/phone only.
+FORWARD = [
+    """
+    CREATE VIRTUAL TABLE process_renter_fts USING fts5(
+        name, email, phone,
+        content='process_renter', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3 4'
+    )
+    """,
+    """
+    CREATE TRIGGER process_renter_fts_insert AFTER INSERT ON process_renter BEGIN
+        INSERT INTO process_renter_fts(rowid, name, email, phone) VALUES (new.id, new.name, new.email, new.phone);
+    END
+    """,
+    """
+    CREATE TRIGGER process_renter_fts_delete AFTER DELETE ON process_renter BEGIN
+        INSERT INTO process_renter_fts(process_renter_fts, rowid, name, email, phone)
+        VALUES ('delete', old.id, old.name, old.email, old.phone);
+    END
+    """,
+    """
+    CREATE TRIGGER process_renter_fts_update AFTER UPDATE OF name, email, phone ON process_renter BEGIN
+        INSERT INTO process_renter_fts(process_renter_fts, rowid, name, email, phone)
+        VALUES ('delete', old.id, old.name, old.email, old.phone);
+        INSERT INTO process_renter_fts(rowid, name, email, phone) VALUES (new.id, new.name, new.email, new.phone);
+    END
+    """,
+    "INSERT INTO process_renter_fts(process_renter_fts) VALUES ('rebuild')",
+]
+
+BACKWARD = [
+    "DROP TRIGGER IF EXISTS process_renter_fts_update",
+    "DROP TRIGGER IF EXISTS process_renter_fts_delete",
+    "DROP TRIGGER IF EXISTS process_renter_fts_insert",
+    "DROP TABLE IF EXISTS process_renter_fts",
+]
+
+
+def run(statements):
+    def apply(apps, schema_editor):
+        if schema_editor.connection.vendor != 'sqlite':
+            return
+        for sql in statements:
+            schema_editor.execute(sql)
+    return apply
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('process', '0012_coveragemask'),
+    ]
+
+    operations = [
+        migrations.RunPython(run(FORWARD), run(BACKWARD)),
+    ]
@@ -0,0 +1,89 @@
+from datetime import date
+from decimal import Decimal, ROUND_DOWN
+
+from django.db import migrations
+
+
+def month_rows(renter, rents, payments, missing):
+    """Unsaved RenterMonth kwargs for the month indexes in `missing` (year * 12 + month - 1)."""
+    covered = {}
+    for amount, payment_type, month_covered, date_paid in payments:
+        start = month_covered or date_paid
+        idx = start.year * 12 + start.month - 1
+        span = range(idx, idx + 12) if payment_type == 'yearly' else range(idx, idx + 1) if payment_type == 'monthly' else ()
+        if not span:
+            continue
+        amount = Decimal(str(amount or 0))
+        share = (amount / len(span)).quantize(Decimal('0.01'), rounding=ROUND_DOWN)
+        for i, month in enumerate(span):
+            part = amount - share * (len(span) - 1) if i == 0 else share
+            covered[month] = covered.get(month, 0) + part
+    return [
+        dict(renter_id=renter.pk, month=date(idx // 12, idx % 12 + 1, 1), expected=rents.get(idx // 12, 0),
+             covered=covered.get(idx, 0), paid=idx in covered)
+        for idx in missing
+    ]
+
+
+def backfill_months(apps, schema_editor):
+    """
+    Write the RenterMonth rows (and their masks) still missing through this
+    month: 0006 now backfills on a fresh database, this catches up databases
+    that were migrated past 0006 before it did and renters left behind since.
+    """
+    Renter = apps.get_model('process', 'Renter')
+    RenterMonth = apps.get_model('process', 'RenterMonth')
+    YearlyRent = apps.get_model('process', 'YearlyRent')
+    Payment = apps.get_model('process', 'Payment')
+    CoverageMask = apps.get_model('process', 'CoverageMask')
+    RentRollSnapshot = apps.get_model('process', 'RentRollSnapshot')
+
+    today = date.today()
+    end = today.year * 12 + today.month - 1
+    rents = {}
+    for apartment_id, year, price in YearlyRent.objects.values_list('apartment_id', 'year', 'price'):
+        rents.setdefault(apartment_id, {})[year] = price
+
+    touched = set()
+    for renter in Renter.objects.filter(start_date__lte=today).order_by('pk').iterator():
+        start = renter.start_date.year * 12 + renter.start_date.month - 1
+        stored = {m.year * 12 + m.month - 1
+                  for m in RenterMonth.objects.filter(renter_id=renter.pk).values_list('month', flat=True)}
+        missing = [idx for idx in range(start, end + 1) if idx not in stored]
+        if not missing:
+            continue
+        payments = Payment.objects.filter(renter_id=renter.pk).values_list(
+            'amount', 'payment_type', 'month_covered', 'date_paid')
+        rows = month_rows(renter, rents.get(renter.apartment_id, {}), payments, missing)
+        RenterMonth.objects.bulk_create([RenterMonth(**row) for row in rows], batch_size=1000)
+
+        years = {idx // 12 for idx in missing}
+        masks = {}
+        for month, paid in RenterMonth.objects.filter(renter_id=renter.pk, month__year__in=years).values_list(
+                'month', 'paid'):
+            paid_bits, unpaid_bits = masks.get(month.year, (0, 0))
+            bit = 1 << (month.month - 1)
+            masks[month.year] = (paid_bits | bit, unpaid_bits) if paid else (paid_bits, unpaid_bits | bit)
+        CoverageMask.objects.bulk_create(
+            [CoverageMask(renter_id=renter.pk, year=year, paid=paid, unpaid=unpaid)
+             for year, (paid, unpaid) in masks.items()],
+            update_conflicts=True, unique_fields=['renter', 'year'], update_fields=['paid', 'unpaid'],
+        )
+        touched.update(row['month'] for row in rows)
+
+    if touched:
+        RentRollSnapshot.objects.bulk_create(
+            [RentRollSnapshot(month=month) for month in touched],
+            update_conflicts=True, unique_fields=['month'], update_fields=['dirty'],
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('process', '0014_job'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_months, migrations.RunPython.noop),
+    ]
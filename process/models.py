@@ -1,13 +1,54 @@
 from django.db import models
+from django.db.models import Value
+from django.db.models.functions import Coalesce
 from django.utils import timezone
+from django.utils.functional import cached_property
 from datetime import date
-from dateutil.relativedelta import relativedelta
 from decimal import Decimal
 from django.urls import reverse
 
+class FloorQuerySet(models.QuerySet):
+    def with_summary(self, today=None):
+        """
+        Annotate occupancy and revenue per floor in one query:
+        `apartment_total`, `occupied_total`, `expected_monthly` (this year's
+        rent over occupied apartments), `collected_to_date` (payments dated
+        this year up to today) and `has_unpaid` (any renter with an unpaid
+        month so far). The sums are correlated subqueries so the joins used
+        for the counts cannot multiply them.
+        """
+        today = today or date.today()
+        zero = Value(Decimal("0.00"))
+        rents = (
+            YearlyRent.objects.filter(apartment__floor=models.OuterRef("pk"), year=today.year,
+                                      apartment__renter__isnull=False)
+            .values("apartment__floor")
+            .annotate(total=models.Sum("price"))
+            .values("total")
+        )
+        collected = (
+            Payment.objects.filter(renter__apartment__floor=models.OuterRef("pk"),
+                                   date_paid__gte=date(today.year, 1, 1), date_paid__lte=today)
+            .values("renter__apartment__floor")
+            .annotate(total=models.Sum("amount"))
+            .values("total")
+        )
+        unpaid = RenterMonth.objects.filter(renter__apartment__floor=models.OuterRef("pk"), paid=False,
+                                            month__lte=today)
+        return self.annotate(
+            apartment_total=models.Count("apartments", distinct=True),
+            occupied_total=models.Count("apartments", filter=models.Q(apartments__renter__isnull=False), distinct=True),
+            expected_monthly=Coalesce(models.Subquery(rents), zero, output_field=models.DecimalField()),
+            collected_to_date=Coalesce(models.Subquery(collected), zero, output_field=models.DecimalField()),
+            has_unpaid=models.Exists(unpaid),
+        )
+
+
 class Floor(models.Model):
     number = models.IntegerField(unique=True)
 
+    objects = FloorQuerySet.as_manager()
+
     def __str__(self):
         return f"Floor {self.number}"
 
@@ -38,6 +79,24 @@ class YearlyRent(models.Model):
     def __str__(self):
         return f"{self.apartment} - {self.year}: {self.price}"
         
+class RenterQuerySet(models.QuerySet):
+    def with_balance(self, today=None):
+        """
+        Annotate `expected_to_date` (from the materialized RenterMonth rows) and
+        `balance_to_date` so renters can be sorted / filtered by balance in SQL.
+        """
+        today = (today or date.today()).replace(day=1)
+        expected = (
+            RenterMonth.objects.filter(renter=models.OuterRef("pk"), month__lte=today)
+            .values("renter")
+            .annotate(total=models.Sum("expected"))
+            .values("total")
+        )
+        return self.annotate(
+            expected_to_date=Coalesce(models.Subquery(expected), Value(Decimal("0.00")), output_field=models.DecimalField()),
+        ).annotate(balance_to_date=models.F("total_paid") - models.F("expected_to_date"))
+
+
 class Renter(models.Model):
     name = models.CharField(max_length=100)
     email = models.EmailField()
@@ -46,102 +105,93 @@ class Renter(models.Model):
     floor = models.ForeignKey(Floor, on_delete=models.CASCADE, blank=True, null=True)
     start_date = models.DateField(default=timezone.now)
 
+    # Running totals, maintained with F() updates alongside every Payment write
+    # (see signals.py) and repaired by `manage.py reconcile_renter_totals`.
+    total_paid = models.DecimalField(max_digits=12, decimal_places=2, default=0, editable=False)
+    paid_through = models.DateField(blank=True, null=True, editable=False,
+                                    help_text="Last month covered by any payment")
+    payment_count = models.PositiveIntegerField(default=0, editable=False)
+    # Bumped with every totals write, i.e. whenever a payment is added, edited
+    # or removed, and when the apartment's rents change; used as a cheap
+    # validator for the matrix API's ETag and the renter page fragments.
+    ledger_version = models.PositiveIntegerField(default=0, editable=False)
+
+    # Only ever written by those F() updates: an instance saved after a payment
+    # landed would otherwise put back the totals (and version) it loaded.
+    TOTALS_FIELDS = ("total_paid", "paid_through", "payment_count", "ledger_version")
+
+    objects = RenterQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["name"], name="renter_name_idx"),
+            models.Index(fields=["email"], name="renter_email_idx"),
+            models.Index(fields=["start_date"], name="renter_start_date_idx"),
+        ]
+
     def __str__(self):
         return self.name
 
     # ----- Payment Calculations -----
+    # All figures come from one Ledger built from the renter's RenterMonth rows
+    # and the stored total_paid, so a page touching every figure costs one query.
+    @cached_property
+    def ledger(self):
+        from .ledger import Ledger
+        return Ledger.for_renter(self)
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._remember_tenancy()
+        return instance
+
+    def refresh_from_db(self, *args, **kwargs):
+        self.__dict__.pop("ledger", None)
+        super().refresh_from_db(*args, **kwargs)
+        self._remember_tenancy()
+
+    def _remember_tenancy(self):
+        # deferred fields stay None, which reads as "changed"
+        self._loaded_tenancy = (self.__dict__.get("start_date"), self.__dict__.get("apartment_id"))
+
+    def tenancy_changed(self):
+        """True if start_date or apartment differ from what was loaded (or nothing was)."""
+        return getattr(self, "_loaded_tenancy", None) != (self.__dict__.get("start_date"), self.__dict__.get("apartment_id"))
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding and self.pk is not None:
+            update_fields = kwargs.get("update_fields")
+            if update_fields is None:
+                update_fields = [field.name for field in self._meta.concrete_fields if not field.primary_key]
+            kwargs["update_fields"] = [name for name in update_fields if name not in self.TOTALS_FIELDS]
+        super().save(*args, **kwargs)
+        self._remember_tenancy()
+
     def months_since_start(self):
         today = date.today()
         return (today.year - self.start_date.year) * 12 + (today.month - self.start_date.month) + 1
 
     def expected_payments(self):
         """Expected payments per month based on yearly rents of the apartment."""
-        total = Decimal('0.00')
-        today = date.today().replace(day=1)
-        current = self.start_date.replace(day=1)
-
-        while current <= today:
-            try:
-                year_rent = self.apartment.yearly_rents.get(year=current.year)
-                # YearlyRent.price represents monthly payment for that year (Decimal)
-                monthly_rent = year_rent.price
-                total += monthly_rent
-            except YearlyRent.DoesNotExist:
-                total += Decimal('0.00')
-            current += relativedelta(months=1)
-
-        return total
-
-    def total_paid(self):
-        # ensure Decimal total
-        total = Decimal('0.00')
-        for p in self.payments.all():
-            amt = p.amount if p.amount is not None else Decimal('0.00')
-            if not isinstance(amt, Decimal):
-                try:
-                    amt = Decimal(str(amt))
-                except Exception:
-                    amt = Decimal('0.00')
-            total += amt
-        return total
+        return self.ledger.expected
 
     def balance(self):
         """Positive = overpaid, Negative = owes money"""
-        return self.total_paid() - self.expected_payments()
+        return self.ledger.balance
 
     def missed_months(self):
         """
         Return a list of months (YYYY-MM) that the renter didn’t pay.
         Uses month-by-month calculation, even if yearly rent changes."""
-        paid_months = set()
-
-        for p in self.payments.all():
-            start = p.month_covered or p.date_paid.replace(day=1)
-            if p.payment_type == "monthly":
-                paid_months.add(start.strftime("%Y-%m"))
-            elif p.payment_type == "yearly":
-                for i in range(12):
-                    m = start + relativedelta(months=i)
-                    paid_months.add(m.strftime("%Y-%m"))
-
-        missed = []
-        current = self.start_date.replace(day=1)
-        today = date.today().replace(day=1)
-
-        while current <= today:
-            ym = current.strftime("%Y-%m")
-            if ym not in paid_months:
-                missed.append(ym)
-            current += relativedelta(months=1)
-
-        return missed
+        return self.ledger.missed_months()
 
     def get_absolute_url(self):
         return reverse("renter-detail", kwargs={"pk": self.pk})
 
     def payment_status_by_month(self):
         """Returns a list of tuples: (month, paid: True/False) for display purposes"""
-        paid_months = set()
-        for p in self.payments.all():
-            # prefer explicit month_covered if set, otherwise use the date paid
-            start = (p.month_covered or p.date_paid).replace(day=1)
-            if p.payment_type == "monthly":
-                paid_months.add(start.strftime("%Y-%m"))
-            elif p.payment_type == "yearly":
-                for i in range(12):
-                    m = start + relativedelta(months=i)
-                    paid_months.add(m.strftime("%Y-%m"))
-
-        status = []
-        current = self.start_date.replace(day=1)
-        today = date.today().replace(day=1)
-
-        while current <= today:
-            ym = current.strftime("%Y-%m")
-            status.append((ym, ym in paid_months))
-            current += relativedelta(months=1)
-
-        return status
+        return self.ledger.payment_status_by_month()
 
 
 class Payment(models.Model):
@@ -156,7 +206,138 @@ class Payment(models.Model):
     payment_type = models.CharField(max_length=10, choices=PAYMENT_TYPES, default="monthly")
     month_covered = models.DateField(help_text="First day of the month this payment covers", blank=True, null=True)
 
+    class Meta:
+        indexes = [
+            # a renter's payments reaching a month range (ledger refresh, renter page)
+            models.Index(fields=["renter", "month_covered"], name="payment_renter_month_idx"),
+            # the same when month_covered is empty and date_paid stands in for it
+            models.Index(fields=["renter", "date_paid"], name="payment_renter_paid_idx"),
+            # admin/reporting filters by payment date and type
+            models.Index(fields=["date_paid", "payment_type"], name="payment_paid_type_idx"),
+            # portfolio-wide "who paid month X"
+            models.Index(fields=["month_covered"], name="payment_month_idx"),
+        ]
+
     def __str__(self):
         if self.month_covered:
             return f"{self.payment_type.title()} payment of {self.amount} by {self.renter.name} for {self.month_covered.strftime('%Y-%m')}"
         return f"{self.payment_type.title()} payment of {self.amount} by {self.renter.name} on {self.date_paid}"
+
+
+class RenterMonth(models.Model):
+    """
+    Materialized ledger: one row per renter per month of tenancy, kept in step
+    with Payment / YearlyRent writes by the receivers in signals.py.
+    """
+    renter = models.ForeignKey(Renter, related_name="months", on_delete=models.CASCADE)
+    month = models.DateField(help_text="First day of the month")
+    expected = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    covered = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    paid = models.BooleanField(default=False)
+
+    class Meta:
+        unique_together = ("renter", "month")
+        indexes = [models.Index(fields=["month", "paid"], name="rentermonth_month_paid_idx")]
+
+    def __str__(self):
+        return f"{self.renter} - {self.month.strftime('%Y-%m')}: {'paid' if self.paid else 'unpaid'}"
+
+
+class CoverageMask(models.Model):
+    """
+    One row per renter per year of tenancy with 12-bit month masks (bit 0 =
+    January): `paid` for covered months and `unpaid` for months of tenancy
+    so far that no payment reaches. Rewritten from RenterMonth whenever those
+    rows change, so "who hasn't paid month X" is a bitwise test on one row per
+    renter instead of a ledger walk.
+    """
+    renter = models.ForeignKey(Renter, related_name="coverage_masks", on_delete=models.CASCADE)
+    year = models.IntegerField()
+    paid = models.PositiveSmallIntegerField(default=0)
+    unpaid = models.PositiveSmallIntegerField(default=0)
+
+    class Meta:
+        unique_together = ("renter", "year")
+        indexes = [models.Index(fields=["year", "unpaid"], name="coveragemask_year_unpaid_idx")]
+
+    def __str__(self):
+        return f"{self.renter} - {self.year}: paid {self.paid:012b}"
+
+
+class RentRollSnapshot(models.Model):
+    """
+    Building-wide figures for one month, aggregated from RenterMonth by
+    `manage.py build_rent_roll`. Writes to RenterMonth flag the month `dirty`
+    so the next run recomputes only what changed.
+    """
+    month = models.DateField(unique=True, help_text="First day of the month")
+    expected = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    collected = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    occupied = models.PositiveIntegerField(default=0, help_text="Renters in tenancy that month")
+    apartments = models.PositiveIntegerField(default=0, help_text="Apartments in the building when computed")
+    delinquent = models.PositiveIntegerField(default=0, help_text="Renters with the month unpaid")
+    dirty = models.BooleanField(default=True)
+    computed_at = models.DateTimeField(blank=True, null=True)
+
+    def __str__(self):
+        return f"Rent roll {self.month.strftime('%Y-%m')}"
+
+    @property
+    def occupancy(self):
+        return self.occupied / self.apartments if self.apartments else 0.0
+
+
+class Job(models.Model):
+    """
+    A background task run by `manage.py run_worker` (see process/jobs.py).
+    Workers claim queued rows with a compare-and-set UPDATE, so any number of
+    them can poll the same table.
+    """
+    QUEUED, RUNNING, SUCCEEDED, FAILED = "queued", "running", "succeeded", "failed"
+    STATUSES = [
+        (QUEUED, "Queued"),
+        (RUNNING, "Running"),
+        (SUCCEEDED, "Succeeded"),
+        (FAILED, "Failed"),
+    ]
+
+    kind = models.CharField(max_length=50)
+    params = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=10, choices=STATUSES, default=QUEUED)
+    progress = models.PositiveSmallIntegerField(default=0, help_text="Percent complete")
+    message = models.CharField(max_length=200, blank=True)
+    result = models.JSONField(blank=True, null=True)
+    error = models.TextField(blank=True)
+    worker = models.CharField(max_length=100, blank=True)
+    created_by = models.ForeignKey("auth.User", related_name="jobs", on_delete=models.SET_NULL, blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(blank=True, null=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["status", "id"], name="job_status_idx")]
+
+    def __str__(self):
+        return f"Job {self.pk} ({self.kind}, {self.status})"
+
+    def set_progress(self, percent, message=""):
+        """Save progress at once so pollers see it (call it outside long transactions)."""
+        self.progress, self.message = max(0, min(int(percent), 100)), message[:200]
+        Job.objects.filter(pk=self.pk).update(progress=self.progress, message=self.message, updated_at=timezone.now())
+
+
+class RefreshToken(models.Model):
+    """Server-side record of an issued refresh token so it can be revoked."""
+    user = models.ForeignKey("auth.User", related_name="refresh_tokens", on_delete=models.CASCADE)
+    jti = models.CharField(max_length=32, unique=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField()
+    revoked_at = models.DateTimeField(blank=True, null=True)
+
+    def __str__(self):
+        return f"Refresh token {self.jti} for {self.user}"
+
+    @property
+    def is_active(self):
+        return self.revoked_at is None and self.expires_at > timezone.now()
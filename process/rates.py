@@ -0,0 +1,162 @@
+"""
+Process-local cache of each apartment's YearlyRent table (year -> monthly price).
+
+Entries live in a bounded LRU inside the worker process. Every entry is tagged
+with a version kept in Django's cache framework (a global version plus one per
+apartment); writes replace the version, so every process sharing that cache
+backend (the default file-based cache, see settings.CACHES) drops its copy on
+the next lookup. YearlyRent save/delete bump it from signals.py; code that
+bypasses signals (queryset.update, bulk_create) must call `invalidate_rates()`
+itself.
+
+Within a request the versions are read from the cache framework once per
+apartment and remembered until the request finishes (outside requests, e.g. in
+management commands, every lookup checks them).
+
+The cache is for reads. Code that stores figures derived from the rents
+(RenterMonth rows, default payment amounts) uses `load_rates()`, which always
+queries the table.
+"""
+import time
+from collections import OrderedDict
+from threading import Lock, local
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.signals import request_finished, request_started
+from django.db import transaction
+
+from .models import YearlyRent
+
+GLOBAL_VERSION_KEY = "rent-rates:v"
+
+# per-thread {apartment id: versions} for the request being served; None outside requests
+_request = local()
+
+
+def _begin_request(**kwargs):
+    _request.versions = {}
+
+
+def _end_request(**kwargs):
+    _request.versions = None
+
+
+request_started.connect(_begin_request)
+request_finished.connect(_end_request)
+
+
+def _forget_versions(apartment_id=None):
+    versions = getattr(_request, "versions", None)
+    if versions is not None:
+        if apartment_id:
+            versions.pop(apartment_id, None)
+        else:
+            versions.clear()
+
+
+def _apartment_version_key(apartment_id):
+    return f"rent-rates:v:{apartment_id}"
+
+
+def _versions(apartment_id):
+    remembered = getattr(_request, "versions", None)
+    if remembered is not None and apartment_id in remembered:
+        return remembered[apartment_id]
+    keys = [GLOBAL_VERSION_KEY, _apartment_version_key(apartment_id)]
+    found = cache.get_many(keys)
+    for key in keys:
+        if key not in found:
+            # seed with a timestamp so a flushed cache never reuses an old number;
+            # versions never expire
+            cache.add(key, time.time_ns(), None)
+            found[key] = cache.get(key)
+    versions = tuple(found[key] for key in keys)
+    if remembered is not None:
+        remembered[apartment_id] = versions
+    return versions
+
+
+def _bump(key):
+    # a fresh timestamp rather than incr(), which is a non-atomic read-modify-write
+    # on the file and local-memory backends and resets the timeout
+    cache.set(key, time.time_ns(), None)
+
+
+def load_rates(apartment_id):
+    """{year: monthly price} for one apartment, read from the database."""
+    if not apartment_id:
+        return {}
+    return dict(YearlyRent.objects.filter(apartment_id=apartment_id).values_list("year", "price"))
+
+
+class RateCache:
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = Lock()
+
+    def rates(self, apartment_id):
+        """{year: monthly price} for one apartment (empty dict if it has none)."""
+        if not apartment_id:
+            return {}
+        version = _versions(apartment_id)
+        with self._lock:
+            entry = self._entries.get(apartment_id)
+            if entry and entry[0] == version:
+                self._entries.move_to_end(apartment_id)
+                return entry[1]
+
+        rates = load_rates(apartment_id)
+        with self._lock:
+            self._entries[apartment_id] = (version, rates)
+            self._entries.move_to_end(apartment_id)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return rates
+
+    def price(self, apartment_id, year):
+        return self.rates(apartment_id).get(year)
+
+    def version(self, apartment_id):
+        """Opaque token that changes whenever the apartment's rents may have."""
+        return "%s.%s" % _versions(apartment_id)
+
+    def invalidate(self, apartment_id=None):
+        """
+        Bump the version for one apartment (or all of them). Bumped again on
+        commit so a worker that reloaded between the write and the commit does
+        not keep the pre-commit rows.
+        """
+        key = _apartment_version_key(apartment_id) if apartment_id else GLOBAL_VERSION_KEY
+
+        def bump():
+            _bump(key)
+            _forget_versions(apartment_id)
+            with self._lock:
+                if apartment_id:
+                    self._entries.pop(apartment_id, None)
+                else:
+                    self._entries.clear()
+
+        bump()
+        transaction.on_commit(bump)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+rate_cache = RateCache(maxsize=getattr(settings, "RENT_RATE_CACHE_SIZE", 1024))
+
+
+def rates_for(apartment_id):
+    return rate_cache.rates(apartment_id)
+
+
+def rent_for(apartment_id, year):
+    return rate_cache.price(apartment_id, year)
+
+
+def invalidate_rates(apartment_id=None):
+    rate_cache.invalidate(apartment_id)
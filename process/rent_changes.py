@@ -0,0 +1,95 @@
+"""
+Bulk rent changes: set one target year's monthly price for many apartments in a
+single transaction, either to a fixed amount or as a percentage over each
+apartment's prior-year YearlyRent.
+"""
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.core.exceptions import ValidationError
+from django.core.validators import DecimalValidator
+from django.db import transaction
+from django.db.models import OuterRef, Subquery
+
+from .ledger import bump_ledger_versions, mark_months_dirty
+from .models import Apartment, YearlyRent, RenterMonth
+from .rates import invalidate_rates
+
+CENT = Decimal("0.01")
+
+_price_field = YearlyRent._meta.get_field("price")
+PRICE_VALIDATOR = DecimalValidator(_price_field.max_digits, _price_field.decimal_places)
+
+
+def _check_price(price):
+    """Raise ValueError unless `price` is a finite, non-negative price the YearlyRent column can store."""
+    if not price.is_finite() or price < 0:
+        raise ValueError(f"Invalid monthly price: {price}")
+    try:
+        PRICE_VALIDATOR(price)
+    except ValidationError:
+        raise ValueError(f"Invalid monthly price: {price}")
+
+
+def select_apartments(floors=None, apartments=None, everything=False):
+    """Apartments targeted by floor ids, explicit apartment ids, or the whole building."""
+    if not (floors or apartments or everything):
+        raise ValueError("Choose floors, apartments or the whole building")
+    qs = Apartment.objects.all()
+    if floors:
+        qs = qs.filter(floor_id__in=floors)
+    if apartments:
+        qs = qs.filter(pk__in=apartments)
+    return qs
+
+
+def plan_rent_change(apartments, year, price=None, percent=None):
+    """
+    Return ({apartment id: new monthly price}, [apartment ids skipped]). With
+    `percent`, apartments without a rent for year - 1 are skipped. Raises
+    ValueError for a price, or a percent result, that is not finite, is
+    negative or does not fit the YearlyRent column.
+    """
+    if (price is None) == (percent is None):
+        raise ValueError("Give exactly one of price or percent")
+    ids = list(apartments.order_by("pk").values_list("pk", flat=True))
+    if price is not None:
+        price = Decimal(price)
+        _check_price(price)
+        return {apartment_id: price for apartment_id in ids}, []
+
+    percent = Decimal(percent)
+    if not percent.is_finite():
+        raise ValueError(f"Invalid percent: {percent}")
+    factor = 1 + percent / 100
+    prior = dict(
+        YearlyRent.objects.filter(apartment__in=apartments, year=year - 1).values_list("apartment_id", "price")
+    )
+    plan = {
+        apartment_id: (prior[apartment_id] * factor).quantize(CENT, rounding=ROUND_HALF_UP)
+        for apartment_id in ids if apartment_id in prior
+    }
+    for new_price in plan.values():
+        _check_price(new_price)
+    return plan, [apartment_id for apartment_id in ids if apartment_id not in prior]
+
+
+def apply_rent_change(year, plan):
+    """
+    Upsert the planned YearlyRent rows in one statement and push the new prices
+    into the RenterMonth expected column. bulk_create sends no signals, so the
+    rate cache is invalidated here. Returns the number of apartments changed.
+    """
+    if not plan:
+        return 0
+    rows = [YearlyRent(apartment_id=apartment_id, year=year, price=price) for apartment_id, price in plan.items()]
+    with transaction.atomic():
+        YearlyRent.objects.bulk_create(
+            rows, update_conflicts=True, unique_fields=["apartment", "year"], update_fields=["price"]
+        )
+        new_price = YearlyRent.objects.filter(apartment__renter=OuterRef("renter_id"), year=year).values("price")[:1]
+        months = RenterMonth.objects.filter(renter__apartment_id__in=list(plan), month__year=year)
+        mark_months_dirty(months.values_list("month", flat=True).distinct())
+        months.update(expected=Subquery(new_price))
+        bump_ledger_versions(list(plan))
+        invalidate_rates()
+    return len(rows)
@@ -0,0 +1,84 @@
+"""
+Monthly rent-roll snapshots: expected and collected revenue, occupancy and
+delinquency for the whole building, aggregated from RenterMonth.
+
+RenterMonth writes flag the affected RentRollSnapshot months dirty (see
+ledger.mark_months_dirty), so update_rent_roll() only aggregates those months
+plus any month without a snapshot yet. The dashboard reads the snapshot table
+alone.
+"""
+from datetime import date
+
+from django.db import transaction
+from django.db.models import Count, Min, Q, Sum
+from django.utils import timezone
+
+from .ledger import ZERO, fill_missing_months, index_to_date, month_index
+from .models import Apartment, RenterMonth, RentRollSnapshot
+
+
+def stale_months(today=None, full=False):
+    """First-of-month dates whose snapshot is dirty or missing, oldest first."""
+    today = today or date.today()
+    first = RenterMonth.objects.aggregate(first=Min("month"))["first"]
+    if first is None:
+        return sorted(RentRollSnapshot.objects.filter(dirty=True).values_list("month", flat=True))
+    span = {index_to_date(idx) for idx in range(month_index(first), month_index(today) + 1)}
+    if full:
+        return sorted(span | set(RentRollSnapshot.objects.values_list("month", flat=True)))
+    existing = set(RentRollSnapshot.objects.filter(dirty=False).values_list("month", flat=True))
+    dirty = set(RentRollSnapshot.objects.filter(dirty=True).values_list("month", flat=True))
+    return sorted((span - existing) | dirty)
+
+
+def build_snapshots(months):
+    """Aggregate RenterMonth for the given months and store the snapshots."""
+    if not months:
+        return 0
+    # clear the flags first: a write that lands while we aggregate re-flags its month
+    RentRollSnapshot.objects.filter(month__in=months).update(dirty=False)
+    figures = {
+        row["month"]: row
+        for row in RenterMonth.objects.filter(month__in=months)
+        .values("month")
+        .annotate(
+            expected_total=Sum("expected"),
+            collected_total=Sum("covered"),
+            occupied_count=Count("id"),
+            delinquent_count=Count("id", filter=Q(paid=False)),
+        )
+    }
+    apartments = Apartment.objects.count()
+    now = timezone.now()
+    rows = []
+    for month in months:
+        row = figures.get(month, {})
+        rows.append(RentRollSnapshot(
+            month=month,
+            expected=row.get("expected_total") or ZERO,
+            collected=row.get("collected_total") or ZERO,
+            occupied=row.get("occupied_count", 0),
+            apartments=apartments,
+            delinquent=row.get("delinquent_count", 0),
+            dirty=False,
+            computed_at=now,
+        ))
+    RentRollSnapshot.objects.bulk_create(
+        rows,
+        update_conflicts=True,
+        unique_fields=["month"],
+        update_fields=["expected", "collected", "occupied", "apartments", "delinquent", "computed_at"],
+    )
+    return len(rows)
+
+
+def update_rent_roll(today=None, full=False, batch_size=120):
+    """Bring the snapshot table up to date; returns the number of months recomputed."""
+    today = today or date.today()
+    with transaction.atomic():
+        fill_missing_months(today)
+    months = stale_months(today, full)
+    for i in range(0, len(months), batch_size):
+        with transaction.atomic():
+            build_snapshots(months[i:i + batch_size])
+    return len(months)
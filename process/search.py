@@ -0,0 +1,77 @@
+"""
+Renter search over a SQLite FTS5 index of name, email and phone.
+
+The index (process_renter_fts) is an external-content FTS5 table created by
+migration 0013 together with triggers on process_renter, so inserts, deletes
+and edits of those three columns keep it in step, bulk_create included.
+Totals updates (UPDATE ... SET total_paid) do not touch it. On databases
+without FTS5 the search falls back to icontains.
+"""
+import re
+
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+from .models import Renter
+
+FTS_TABLE = "process_renter_fts"
+
+SEARCH_SQL = f"""
+    SELECT r.*, f.number AS floor_number, bm25({FTS_TABLE}, 10.0, 2.0, 1.0) AS rank
+    FROM {FTS_TABLE}
+    JOIN process_renter r ON r.id = {FTS_TABLE}.rowid
+    LEFT JOIN process_apartment a ON a.id = r.apartment_id
+    LEFT JOIN process_floor f ON f.id = COALESCE(a.floor_id, r.floor_id)
+    WHERE {FTS_TABLE} MATCH %s
+    ORDER BY rank
+    LIMIT %s
+"""
+
+
+def fts_enabled():
+    return connection.vendor == "sqlite"
+
+
+def match_expression(query):
+    """'jo smi' -> '"jo"* "smi"*': every word must match as a prefix."""
+    words = re.findall(r"\w+", query)
+    return " ".join(f'"{word}"*' for word in words)
+
+
+def search_renters(query, limit=20):
+    """
+    Renters matching `query`, best first (name hits weigh most), each with
+    `floor_number` set; one query.
+    """
+    expression = match_expression(query)
+    if not expression:
+        return []
+    if fts_enabled():
+        return list(Renter.objects.raw(SEARCH_SQL, [expression, limit]))
+
+    renters = Renter.objects.select_related("apartment__floor", "floor")
+    for word in re.findall(r"\w+", query):
+        renters = renters.filter(Q(name__icontains=word) | Q(email__icontains=word) | Q(phone__icontains=word))
+    results = list(renters.order_by("name")[:limit])
+    for renter in results:
+        floor = renter.apartment.floor if renter.apartment and renter.apartment.floor else renter.floor
+        renter.floor_number = floor.number if floor else None
+    return results
+
+
+def matching_ids(query):
+    """Subquery of renter ids matching `query` (for pk__in), or None without FTS5."""
+    expression = match_expression(query)
+    if not expression or not fts_enabled():
+        return None
+    return RawSQL(f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s", [expression])
+
+
+def rebuild_index():
+    """Repopulate the FTS index from process_renter; returns the renter count."""
+    if not fts_enabled():
+        return 0
+    with connection.cursor() as cursor:
+        cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+    return Renter.objects.count()
@@ -0,0 +1,45 @@
+from rest_framework import serializers
+
+from .models import Renter, Payment, YearlyRent
+
+
+class FieldSelectionMixin:
+    """
+    Limit the output to the fields named in ?fields=a,b,c. Unknown names are
+    ignored; without the parameter every field is returned.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get("request")
+        wanted = selected_fields(request, self.Meta.fields) if request else None
+        if wanted:
+            for name in set(self.fields) - set(wanted):
+                self.fields.pop(name)
+
+
+def selected_fields(request, allowed):
+    """Requested field names that the serializer actually has, in order."""
+    raw = request.query_params.get("fields")
+    if not raw:
+        return None
+    return [name for name in (part.strip() for part in raw.split(",")) if name in allowed] or None
+
+
+class RenterSerializer(FieldSelectionMixin, serializers.ModelSerializer):
+    class Meta:
+        model = Renter
+        fields = ("id", "name", "email", "phone", "floor", "apartment", "start_date",
+                  "total_paid", "paid_through", "payment_count")
+
+
+class PaymentSerializer(FieldSelectionMixin, serializers.ModelSerializer):
+    class Meta:
+        model = Payment
+        fields = ("id", "renter", "amount", "payment_type", "month_covered", "date_paid")
+
+
+class YearlyRentSerializer(FieldSelectionMixin, serializers.ModelSerializer):
+    class Meta:
+        model = YearlyRent
+        fields = ("id", "apartment", "year", "price")
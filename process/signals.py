@@ -1,8 +1,13 @@
 # process/signals.py
-from django.db.models.signals import post_migrate
+from django.db.models import QuerySet
+from django.db.models.signals import post_migrate, pre_save, post_save, pre_delete, post_delete
 from django.contrib.auth import get_user_model
 from django.dispatch import receiver
 
+from .models import Renter, Payment, YearlyRent
+from . import ledger
+from .rates import invalidate_rates
+
 @receiver(post_migrate)
 def create_default_superuser(sender, **kwargs):
     User = get_user_model()
@@ -13,3 +18,97 @@ def create_default_superuser(sender, **kwargs):
             password="YourStrongPassword123!"
         )
         print("Default superuser created")
+
+
+def _deleted_directly(model, origin):
+    """False when the delete is a cascade from a parent row (renter, apartment...)."""
+    origin_model = origin.model if isinstance(origin, QuerySet) else type(origin)
+    return origin_model is model
+
+
+# ----- RenterMonth / Renter totals maintenance -----
+# Admin edits, add_payment and the shell all go through Model.save/delete, so
+# these receivers keep the materialized months and the stored Renter totals in
+# step. Edits remember the previous row in pre_save so the months it used to
+# cover are refreshed too.
+
+@receiver(pre_save, sender=Payment)
+def remember_old_payment(sender, instance, **kwargs):
+    instance._old_row = None
+    if instance.pk:
+        instance._old_row = (
+            Payment.objects.filter(pk=instance.pk)
+            .values_list("renter_id", "payment_type", "month_covered", "date_paid")
+            .first()
+        )
+
+
+@receiver(post_save, sender=Payment)
+def payment_saved(sender, instance, created, **kwargs):
+    coverage = (instance.payment_type, instance.month_covered, instance.date_paid)
+    if created:
+        # the common add_payment path: O(1) F() update in the caller's transaction
+        ledger.apply_payment_totals(instance.renter_id, instance.amount, 1, ledger.paid_through(*coverage))
+        ledger.refresh_renter_months(instance.renter, ledger.covered_indexes(*coverage))
+        return
+
+    old = getattr(instance, "_old_row", None)
+    indexes = set(ledger.covered_indexes(*coverage))
+    if old and old[0] != instance.renter_id:
+        old_renter = Renter.objects.filter(pk=old[0]).first()
+        if old_renter:
+            ledger.refresh_renter_months(old_renter, ledger.covered_indexes(*old[1:]))
+            ledger.reset_renter_totals(old_renter.pk)
+    elif old:
+        indexes.update(ledger.covered_indexes(*old[1:]))
+    ledger.refresh_renter_months(instance.renter, indexes)
+    ledger.reset_renter_totals(instance.renter_id)
+
+
+@receiver(post_delete, sender=Payment)
+def payment_deleted(sender, instance, origin=None, **kwargs):
+    if not _deleted_directly(Payment, origin):
+        return
+    indexes = ledger.covered_indexes(instance.payment_type, instance.month_covered, instance.date_paid)
+    ledger.refresh_renter_months(instance.renter, indexes)
+    ledger.reset_renter_totals(instance.renter_id)
+
+
+@receiver(pre_save, sender=YearlyRent)
+def remember_old_rent(sender, instance, **kwargs):
+    instance._old_rent_key = None
+    if instance.pk:
+        instance._old_rent_key = (
+            YearlyRent.objects.filter(pk=instance.pk).values_list("apartment_id", "year").first()
+        )
+
+
+@receiver(post_save, sender=YearlyRent)
+def yearly_rent_saved(sender, instance, **kwargs):
+    old = getattr(instance, "_old_rent_key", None)
+    if old and old != (instance.apartment_id, instance.year):
+        ledger.set_month_rent(old[0], old[1], 0)
+        invalidate_rates(old[0])
+    ledger.set_month_rent(instance.apartment_id, instance.year, instance.price)
+    invalidate_rates(instance.apartment_id)
+
+
+@receiver(post_delete, sender=YearlyRent)
+def yearly_rent_deleted(sender, instance, **kwargs):
+    ledger.set_month_rent(instance.apartment_id, instance.year, 0)
+    invalidate_rates(instance.apartment_id)
+
+
+@receiver(post_save, sender=Renter)
+def renter_saved(sender, instance, created, update_fields=None, **kwargs):
+    # a new tenancy window or apartment changes every month of the ledger;
+    # Renter.save() always names its fields, so compare with what was loaded
+    written = update_fields is None or {"start_date", "apartment"} & set(update_fields)
+    if created or (written and instance.tenancy_changed()):
+        ledger.sync_renter_months(instance)
+
+
+@receiver(pre_delete, sender=Renter)
+def renter_deleting(sender, instance, **kwargs):
+    # the cascade takes the renter's months out of the rent roll
+    ledger.mark_months_dirty(instance.months.values_list("month", flat=True))
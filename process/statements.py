@@ -0,0 +1,141 @@
+"""
+Monthly renter statements: payment history, missed months, expected-unpaid
+and balance (the renter page's figures) written as HTML and/or CSV files.
+
+Renters are processed in chunks; each chunk costs three queries (renters with
+apartment and floor, the apartments' rents, the changed renters' payments)
+and can run in a separate worker process. A manifest of per-renter
+fingerprints in the output directory lets a re-run skip renters whose
+statement would come out the same.
+"""
+import csv
+import hashlib
+import json
+import os
+from datetime import date
+
+from django.db import connections
+from django.template.loader import render_to_string
+
+from .ledger import Ledger, month_index
+from .models import Payment, Renter, YearlyRent
+
+MANIFEST = "manifest.json"
+FORMATS = ("html", "csv")
+
+
+def load_manifest(directory):
+    try:
+        with open(os.path.join(directory, MANIFEST)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_manifest(directory, manifest):
+    path = os.path.join(directory, MANIFEST)
+    with open(path + ".tmp", "w") as f:
+        json.dump(manifest, f, sort_keys=True)
+    os.replace(path + ".tmp", path)
+
+
+def fingerprint(renter, rents, today, formats):
+    """
+    Everything a statement depends on: the renter's details, ledger_version
+    (bumped by every payment write), the apartment's rents and the month.
+    """
+    floor = renter.apartment.floor if renter.apartment and renter.apartment.floor else renter.floor
+    key = [
+        renter.name, renter.email, renter.phone, renter.apartment_id, floor.number if floor else None,
+        renter.start_date.isoformat(), renter.ledger_version, str(renter.total_paid),
+        sorted((year, str(price)) for year, price in rents.items()), month_index(today), sorted(formats),
+    ]
+    return hashlib.sha1(json.dumps(key).encode()).hexdigest()
+
+
+def statement_context(renter, ledger, payments, today):
+    floor = renter.apartment.floor if renter.apartment and renter.apartment.floor else renter.floor
+    return {
+        "renter": renter,
+        "floor": floor,
+        "today": today,
+        "payments": payments,
+        "missed_months": ledger.missed_months(),
+        "total_paid": ledger.total_paid,
+        "expected_total": ledger.expected,
+        "expected_unpaid": ledger.expected_unpaid,
+        "balance": ledger.balance,
+    }
+
+
+def write_csv(path, context):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        renter = context["renter"]
+        writer.writerow(["renter_id", renter.pk])
+        writer.writerow(["renter", renter.name])
+        writer.writerow(["apartment", renter.apartment_id or ""])
+        writer.writerow(["floor", context["floor"].number if context["floor"] else ""])
+        writer.writerow(["statement_date", context["today"].isoformat()])
+        for key in ("total_paid", "expected_total", "expected_unpaid", "balance"):
+            writer.writerow([key, context[key]])
+        writer.writerow([])
+        writer.writerow(["date_paid", "payment_type", "month_covered", "amount"])
+        for date_paid, payment_type, month_covered, amount in context["payments"]:
+            writer.writerow([date_paid.isoformat(), payment_type,
+                             month_covered.strftime("%Y-%m") if month_covered else "", amount])
+        writer.writerow([])
+        writer.writerow(["missed_month"])
+        writer.writerows([month] for month in context["missed_months"])
+
+
+def render_chunk(renter_ids, directory, formats=FORMATS, known=None, today=None):
+    """
+    Write statements for one chunk of renter ids. `known` maps renter id (as a
+    string) to the fingerprint from the last run. Returns (written, skipped,
+    {renter id: fingerprint}) for the renters written.
+    """
+    today = today or date.today()
+    known = known or {}
+    renters = list(Renter.objects.filter(pk__in=renter_ids).select_related("apartment__floor", "floor").order_by("pk"))
+
+    rents = {}
+    apartment_ids = [renter.apartment_id for renter in renters if renter.apartment_id]
+    for apartment_id, year, price in YearlyRent.objects.filter(apartment_id__in=apartment_ids).values_list(
+            "apartment_id", "year", "price"):
+        rents.setdefault(apartment_id, {})[year] = price
+
+    changed, fingerprints, skipped = [], {}, 0
+    for renter in renters:
+        fp = fingerprint(renter, rents.get(renter.apartment_id, {}), today, formats)
+        if known.get(str(renter.pk)) == fp and all(
+                os.path.exists(os.path.join(directory, f"renter-{renter.pk}.{fmt}")) for fmt in formats):
+            skipped += 1
+            continue
+        changed.append(renter)
+        fingerprints[renter.pk] = fp
+
+    payments = {}
+    for renter_id, *row in Payment.objects.filter(renter_id__in=[r.pk for r in changed]).order_by(
+            "renter_id", "date_paid", "id").values_list("renter_id", "date_paid", "payment_type", "month_covered", "amount"):
+        payments.setdefault(renter_id, []).append(tuple(row))
+
+    for renter in changed:
+        history = payments.get(renter.pk, [])
+        coverage = [(payment_type, month_covered, date_paid) for date_paid, payment_type, month_covered, _ in history]
+        ledger = Ledger.compute(renter.start_date, rents.get(renter.apartment_id, {}), coverage,
+                                total_paid=renter.total_paid, today=today)
+        context = statement_context(renter, ledger, history, today)
+        if "html" in formats:
+            with open(os.path.join(directory, f"renter-{renter.pk}.html"), "w", encoding="utf-8") as f:
+                f.write(render_to_string("process/statement.html", context))
+        if "csv" in formats:
+            write_csv(os.path.join(directory, f"renter-{renter.pk}.csv"), context)
+    return len(changed), skipped, fingerprints
+
+
+def init_worker():
+    """Pool initializer: never reuse a database connection inherited from the parent."""
+    import django
+    django.setup()
+    connections.close_all()
@@ -4,9 +4,49 @@ if (!token) {
     window.location.href = "/login-page/";
 }
 
+// Typeahead renter search; waits for a pause in typing and drops stale replies
+function attachRenterSearch() {
+    const input = document.getElementById("renter_search");
+    const list = document.getElementById("renter_search_results");
+    if (!input || !list) return;
+    let timer = null;
+    let latest = 0;
+
+    input.addEventListener("input", () => {
+        clearTimeout(timer);
+        timer = setTimeout(async () => {
+            const q = input.value.trim();
+            const ticket = ++latest;
+            if (!q) {
+                list.replaceChildren();
+                return;
+            }
+            const res = await authFetch(`${input.dataset.searchUrl}?q=${encodeURIComponent(q)}&limit=10`);
+            if (!res.ok || ticket !== latest) return;
+            const data = await res.json();
+            list.replaceChildren(...data.results.map(r => {
+                const li = document.createElement("li");
+                const link = document.createElement("a");
+                link.href = r.url;
+                link.textContent = r.name;
+                li.appendChild(link);
+                const where = r.apartment_id ? `Apartment ${r.apartment_id}` : "No apartment";
+                li.append(` — ${where}${r.floor_number !== null ? `, Floor ${r.floor_number}` : ""} (${r.email}, ${r.phone})`);
+                return li;
+            }));
+            if (!data.results.length) {
+                const li = document.createElement("li");
+                li.textContent = "No matches";
+                list.appendChild(li);
+            }
+        }, 200);
+    });
+}
+
 // Wait for DOM to be ready before attaching event listeners
 document.addEventListener("DOMContentLoaded", function() {
     console.log("floor.js loaded - attaching form listeners");
+    attachRenterSearch();
     
     document.querySelectorAll("form").forEach(form => {
         // Skip payment forms (handled by payment.js)
@@ -21,9 +61,8 @@ document.addEventListener("DOMContentLoaded", function() {
             const actionUrl = form.getAttribute("action") || window.location.href;
 
             try {
-                const res = await fetch(actionUrl, {
+                const res = await authFetch(actionUrl, {
                     method: "POST",
-                    headers: { "Authorization": `Bearer ${token}` },
                     body: formData
                 });
 
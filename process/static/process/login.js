@@ -1,3 +1,37 @@
+// Renew the access token from the stored refresh token (or the refresh cookie).
+// Returns the new access token, or null if the refresh token is gone/revoked.
+async function refreshJwt() {
+    const refresh = localStorage.getItem("jwt_refresh");
+    try {
+        const res = await fetch("/refresh-jwt/", {
+            method: "POST",
+            headers: { "Content-Type": "application/json" },
+            body: JSON.stringify(refresh ? { refresh } : {})
+        });
+        if (!res.ok) return null;
+        const data = await res.json();
+        localStorage.setItem("jwt_token", data.token);
+        return data.token;
+    } catch (err) {
+        console.error(err);
+        return null;
+    }
+}
+
+// fetch() with the Bearer token; on 401 renews the access token once and retries.
+async function authFetch(url, options = {}) {
+    const send = (tok) => fetch(url, {
+        ...options,
+        headers: { ...(options.headers || {}), ...(tok ? { "Authorization": `Bearer ${tok}` } : {}) }
+    });
+    let res = await send(localStorage.getItem("jwt_token"));
+    if (res.status === 401) {
+        const renewed = await refreshJwt();
+        if (renewed) res = await send(renewed);
+    }
+    return res;
+}
+
 document.addEventListener("DOMContentLoaded", () => {
 
     // LOGIN
@@ -18,6 +52,7 @@ document.addEventListener("DOMContentLoaded", () => {
 
                 if (res.status === 200) {
                     localStorage.setItem("jwt_token", data.token); // for fetch forms
+                    localStorage.setItem("jwt_refresh", data.refresh); // renews jwt_token without the password
                     window.location.href = "/floors/";
                 } else {
                     document.getElementById("login-error").innerText = data.error;
@@ -30,7 +65,6 @@ document.addEventListener("DOMContentLoaded", () => {
     }
 
     // HANDLE ALL FORMS WITH JWT (skip forms handled manually)
-    const token = localStorage.getItem("jwt_token");
     document.querySelectorAll("form").forEach(form => {
         if (form.classList && form.classList.contains('manual-form')) return; // skip manual forms
         form.addEventListener("submit", async (e) => {
@@ -43,18 +77,16 @@ document.addEventListener("DOMContentLoaded", () => {
             try {
                 const actionUrl = form.getAttribute("action") || "/main-page/"; // ✅ FIX HERE
 
-                const res = await fetch(actionUrl, {
+                const res = await authFetch(actionUrl, {
                     method: "POST",
-                    headers: {
-                        "Content-Type": "application/json",
-                        "Authorization": token ? `Bearer ${token}` : ""
-                    },
+                    headers: { "Content-Type": "application/json" },
                     body: JSON.stringify(data)
                 });
 
                 if (res.status === 401) {
                     alert("Unauthorized! Login again.");
                     localStorage.removeItem("jwt_token");
+                    localStorage.removeItem("jwt_refresh");
                     window.location.href = "/login-page/";
                     return;
                 }
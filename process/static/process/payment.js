@@ -1,4 +1,38 @@
 const form = document.querySelector("form[action^='/add_payment/']");
+const matrixTable = document.querySelector("table.payment-matrix");
+const monthNames = ["January", "February", "March", "April", "May", "June",
+                    "July", "August", "September", "October", "November", "December"];
+
+// Rebuild the month x year table from /api/renter/<id>/matrix/; the browser
+// revalidates with the ETag, so an unchanged ledger comes back as a 304.
+async function refreshMatrix() {
+    if (!matrixTable) return;
+    const res = await authFetch(matrixTable.dataset.matrixUrl, { cache: "no-cache" });
+    if (!res.ok) {
+        window.location.reload();
+        return;
+    }
+    const data = await res.json();
+    const years = Object.keys(data.years);
+
+    const headerRow = document.createElement("tr");
+    ["Month / Year", ...years].forEach(label => {
+        const th = document.createElement("th");
+        th.textContent = label;
+        headerRow.appendChild(th);
+    });
+    matrixTable.tHead.replaceChildren(headerRow);
+
+    const body = document.createElement("tbody");
+    monthNames.forEach((name, m) => {
+        const row = body.insertRow();
+        row.insertCell().textContent = name;
+        years.forEach(year => {
+            row.insertCell().textContent = data.years[year][m] ? "✅" : "❌";
+        });
+    });
+    matrixTable.tBodies[0].replaceWith(body);
+}
 
 if (form) {
     form.addEventListener("submit", async (e) => {
@@ -24,12 +58,9 @@ if (form) {
             if (payment_type === 'monthly') payload.year_month_covered = year_month_covered;
             if (payment_type === 'yearly') payload.year_covered = year_covered;
 
-            const res = await fetch(form.action, {
+            const res = await authFetch(form.action, {
                 method: "POST",
-                headers: {
-                    "Content-Type": "application/json",
-                    "Authorization": `Bearer ${token}`
-                },
+                headers: { "Content-Type": "application/json" },
                 body: JSON.stringify(payload)
             });
 
@@ -45,50 +76,8 @@ if (form) {
                 // Remove success message after 3 seconds
                 setTimeout(() => successDiv.remove(), 3000);
 
-                // Update the payment matrix table
-                const monthNames = ["January", "February", "March", "April", "May", "June",
-                                  "July", "August", "September", "October", "November", "December"];
-                const rows = document.querySelectorAll("table.payment-matrix tbody tr");
-                const headerRow = document.querySelector("table.payment-matrix thead tr");
-                const headers = headerRow ? Array.from(headerRow.querySelectorAll("th")) : [];
-
-                function markPaid(yearStr, monthIndex) {
-                    const monthName = monthNames[monthIndex];
-                    for (let row of rows) {
-                        const monthCell = row.querySelector("td");
-                        if (monthCell && monthCell.textContent === monthName) {
-                            const yearIndex = headers.findIndex(h => h.textContent.trim() === String(yearStr));
-                            if (yearIndex > 0) {
-                                const statusCell = row.querySelectorAll("td")[yearIndex];
-                                if (statusCell) statusCell.textContent = "✅";
-                            }
-                            break;
-                        }
-                    }
-                }
-
-                // prefer server-provided month/payment_type if present
-                const respMonth = data.month;
-                const respType = data.payment_type || payment_type;
-                if (respMonth) {
-                    const [rYear, rMonth] = respMonth.split('-');
-                    if (respType === 'monthly') {
-                        markPaid(rYear, parseInt(rMonth, 10) - 1);
-                    } else if (respType === 'yearly') {
-                        // mark all 12 months of the year returned
-                        const y = parseInt(rYear, 10);
-                        for (let m = 0; m < 12; m++) markPaid(y, m);
-                    }
-                } else {
-                    if (payment_type === 'monthly' && year_month_covered) {
-                        const [year, month] = year_month_covered.split("-");
-                        const monthIndex = parseInt(month, 10) - 1;
-                        markPaid(year, monthIndex);
-                    } else if (payment_type === 'yearly' && year_covered) {
-                        const year = parseInt(year_covered, 10);
-                        for (let m = 0; m < 12; m++) markPaid(year, m);
-                    }
-                }
+                // Redraw the payment matrix from the server's view of the ledger
+                await refreshMatrix();
 
                 // Update totals in the DOM if provided
                 if (data.total_paid !== undefined) {
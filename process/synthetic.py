@@ -0,0 +1,111 @@
+"""
+Seeded synthetic building data for local load testing and benchmarks.
+
+Rows are written with bulk_create and the derived RenterMonth rows and Renter
+totals are rebuilt once per renter afterwards, so generating tens of thousands
+of payments takes seconds rather than minutes.
+"""
+import random
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Max
+
+from .ledger import index_to_date, month_index, reset_renter_totals, sync_renter_months
+from .models import Floor, Apartment, YearlyRent, Renter, Payment
+from .rates import invalidate_rates
+
+CENT = Decimal("0.01")
+
+
+def rent_table(rng, first_year, last_year):
+    """{year: monthly price} starting at 300-1200 and rising 0-6% a year."""
+    price = Decimal(rng.randrange(300, 1200))
+    table = {}
+    for year in range(first_year, last_year + 1):
+        table[year] = price.quantize(CENT)
+        price *= Decimal(1 + rng.uniform(0, 0.06))
+    return table
+
+
+def payment_history(rng, renter, rents, pay_rate=0.9, yearly_rate=0.1, today=None):
+    """
+    Unsaved payments for one renter from start_date to today: mostly monthly
+    payments (skipping about 1 - pay_rate of months, sometimes partial), with
+    some whole years paid up front.
+    """
+    today = today or date.today()
+    payments = []
+    idx, end = month_index(renter.start_date), month_index(today)
+    while idx <= end:
+        month = index_to_date(idx)
+        monthly = rents.get(month.year, Decimal("0.00"))
+        if month.month == 1 and idx + 11 <= end and rng.random() < yearly_rate:
+            payments.append(Payment(renter=renter, amount=monthly * 12, payment_type="yearly", month_covered=month,
+                                    date_paid=month - timedelta(days=rng.randrange(0, 15))))
+            idx += 12
+            continue
+        if rng.random() < pay_rate:
+            amount = monthly if rng.random() > 0.05 else (monthly / 2).quantize(CENT)
+            payments.append(Payment(renter=renter, amount=amount, payment_type="monthly", month_covered=month,
+                                    date_paid=month + timedelta(days=rng.randrange(0, 10))))
+        idx += 1
+    return payments
+
+
+def finish_renters(renters):
+    """Rebuild the derived ledger rows and totals that bulk_create skipped."""
+    for renter in renters:
+        sync_renter_months(renter)
+        reset_renter_totals(renter.pk)
+    invalidate_rates()
+
+
+@transaction.atomic
+def generate(floors, apartments_per_floor, years, occupancy=0.9, pay_rate=0.9, yearly_rate=0.1,
+             seed=None, batch_size=1000):
+    """Create a building; returns counts of the rows written."""
+    rng = random.Random(seed)
+    today = date.today()
+    first_year = today.year - years + 1
+    base = (Floor.objects.aggregate(top=Max("number"))["top"] or 0) + 1
+
+    floor_rows = Floor.objects.bulk_create([Floor(number=base + i) for i in range(floors)])
+    apartment_rows = Apartment.objects.bulk_create(
+        [Apartment(floor=floor) for floor in floor_rows for _ in range(apartments_per_floor)], batch_size=batch_size
+    )
+
+    rents, rent_rows = {}, []
+    for apartment in apartment_rows:
+        rents[apartment.pk] = rent_table(rng, first_year, today.year)
+        rent_rows.extend(YearlyRent(apartment=apartment, year=y, price=p) for y, p in rents[apartment.pk].items())
+    YearlyRent.objects.bulk_create(rent_rows, batch_size=batch_size)
+
+    renter_rows = []
+    for apartment in apartment_rows:
+        if rng.random() >= occupancy:
+            continue
+        start = date(first_year, 1, 1) + timedelta(days=rng.randrange(0, (today - date(first_year, 1, 1)).days + 1))
+        n = len(renter_rows)
+        renter_rows.append(Renter(name=f"Renter {apartment.pk}", email=f"renter{apartment.pk}@example.com",
+                                  phone=f"555{n:07d}"[:15], apartment=apartment, floor=apartment.floor,
+                                  start_date=start))
+    renter_rows = Renter.objects.bulk_create(renter_rows, batch_size=batch_size)
+
+    payment_count, pending = 0, []
+    for renter in renter_rows:
+        pending.extend(payment_history(rng, renter, rents[renter.apartment_id], pay_rate, yearly_rate, today))
+        if len(pending) >= batch_size:
+            payment_count += len(Payment.objects.bulk_create(pending, batch_size=batch_size))
+            pending = []
+    payment_count += len(Payment.objects.bulk_create(pending, batch_size=batch_size))
+
+    finish_renters(renter_rows)
+    return {
+        "floors": len(floor_rows),
+        "apartments": len(apartment_rows),
+        "yearly_rents": len(rent_rows),
+        "renters": len(renter_rows),
+        "payments": payment_count,
+    }
@@ -1,3 +1,1079 @@
-from django.test import TestCase
+import csv
+import importlib
+import json
+import os
+import tempfile
+import threading
+from datetime import date, timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.apps import apps as django_apps
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command, CommandError
+from django.core.signals import request_finished, request_started
+from django.db import OperationalError, connection, connections, transaction
+from django.db.backends.sqlite3.base import DatabaseWrapper as SQLiteDatabaseWrapper
+from django.db.models import F, Q
+from django.test import SimpleTestCase, TestCase, Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from rent import sqlite as sqlite_tuning
+
+from .models import Floor, Apartment, YearlyRent, Renter, Payment, RenterMonth, RentRollSnapshot, Job, CoverageMask
+from .delinquency import consecutive_missed, unpaid_in_month
+from .importer import import_payments
+from .jobs import requeue_stale
+from .middleware import QueryRecorder, request_stats
+from .ledger import Ledger, fill_missing_months, verify_renter_months
+from .rates import RateCache, invalidate_rates, rate_cache, rates_for
+from .rentroll import update_rent_roll
+from .search import search_renters
+from .views import verified_tokens
+
+
+# the settings' FileBasedCache lives in BASE_DIR/cache; tests must never read or clear it
+TEST_CACHES = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "rent-tests"}}
+
+
+@override_settings(CACHES=TEST_CACHES)
+class RentTestCase(TestCase):
+    def setUp(self):
+        # the rate cache and the page fragments outlive each test's rolled-back transaction
+        rate_cache.clear()
+        cache.clear()
+        super().setUp()
+
+    def login(self, client=None, username="simple", password="YourStrongPassword123!"):
+        """Log in through /login-jwt/ and return the Authorization header as request kwargs."""
+        response = (client or self.client).post("/login-jwt/", json.dumps({"username": username, "password": password}),
+                                                content_type="application/json")
+        return {"HTTP_AUTHORIZATION": f"Bearer {response.json()['token']}"}
+
+    def make_renter(self, start_date, name="Tenant", floor=None, apartment=None, rents=None, **fields):
+        """
+        A renter from `start_date`, in `apartment` or else in a new apartment on
+        `floor` (floor 1 by default). `rents` ({year: monthly price}) are added
+        to the apartment before the renter, so its months are built with them.
+        """
+        if apartment is None:
+            if floor is None:
+                floor, _ = Floor.objects.get_or_create(number=1)
+            apartment = Apartment.objects.create(floor=floor)
+        for year, price in (rents or {}).items():
+            YearlyRent.objects.create(apartment=apartment, year=year, price=Decimal(price))
+        fields = {"email": "t@example.com", "phone": "1", **fields}
+        return Renter.objects.create(name=name, apartment=apartment, floor_id=apartment.floor_id,
+                                     start_date=start_date, **fields)
+
+
+class LedgerTests(RentTestCase):
+    def setUp(self):
+        super().setUp()
+        this_year = date.today().year
+        self.renter = self.make_renter(date(this_year - 9, 1, 1), name="Long Tenant",
+                                       rents={year: "100.00" for year in range(this_year - 9, this_year + 1)})
+        Payment.objects.create(renter=self.renter, amount=Decimal("1200.00"), payment_type="yearly",
+                               month_covered=date(this_year - 9, 1, 1))
+        Payment.objects.create(renter=self.renter, amount=Decimal("100.00"), payment_type="monthly",
+                               month_covered=date(this_year - 8, 3, 1))
+
+    def test_figures(self):
+        renter = Renter.objects.get(pk=self.renter.pk)
+        months = renter.months_since_start()
+        self.assertEqual(renter.expected_payments(), Decimal("100.00") * months)
+        self.assertEqual(renter.total_paid, Decimal("1300.00"))
+        self.assertEqual(renter.payment_count, 2)
+        self.assertEqual(renter.paid_through, date(date.today().year - 8, 3, 1))
+        self.assertEqual(renter.balance(), Decimal("1300.00") - Decimal("100.00") * months)
+        missed = renter.missed_months()
+        self.assertEqual(len(missed), months - 13)
+        self.assertNotIn(f"{date.today().year - 8}-03", missed)
+        statuses = renter.payment_status_by_month()
+        self.assertEqual(len(statuses), months)
+        self.assertTrue(statuses[0][1])
+
+    def test_fixed_query_count(self):
+        renter = Renter.objects.get(pk=self.renter.pk)
+        with self.assertNumQueries(1):
+            renter.expected_payments()
+            renter.balance()
+            renter.missed_months()
+            renter.payment_status_by_month()
+
+
+class ArrearsApiTests(RentTestCase):
+    def test_constant_query_count(self):
+        this_year = date.today().year
+        for i in range(5):
+            renter = self.make_renter(date(this_year, 1, 1), name=f"r{i}", rents={this_year: "50.00"})
+            Payment.objects.create(renter=renter, amount=Decimal("50.00"), month_covered=date(this_year, 1, 1))
+
+        with self.assertNumQueries(3):
+            rows = list(Ledger.for_renters(Renter.objects.all()))
+        self.assertEqual(len(rows), 5)
+        for renter, ledger in rows:
+            self.assertEqual(ledger.total_paid, Decimal("50.00"))
+            self.assertEqual(ledger.expected, Decimal("50.00") * date.today().month)
+            self.assertEqual(len(ledger.missed), date.today().month - 1)
+
+
+class RenterMonthTests(RentTestCase):
+    def setUp(self):
+        super().setUp()
+        self.year = date.today().year
+        self.renter = self.make_renter(date(self.year - 1, 1, 1), rents={self.year - 1: "80.00"})
+        self.apartment = self.renter.apartment
+
+    def month(self, month):
+        return self.renter.months.get(month=month)
+
+    def test_maintained_incrementally(self):
+        self.assertEqual(self.renter.months.count(), 12 + date.today().month)
+        first = date(self.year - 1, 1, 1)
+        self.assertEqual(self.month(first).expected, Decimal("80.00"))
+
+        payment = Payment.objects.create(renter=self.renter, amount=Decimal("960.00"),
+                                         payment_type="yearly", month_covered=first)
+        self.assertEqual(self.renter.months.filter(paid=True).count(), 12)
+        self.assertEqual(self.month(first).covered, Decimal("80.00"))
+
+        payment.payment_type = "monthly"
+        payment.save()
+        self.assertEqual(self.renter.months.filter(paid=True).count(), 1)
+        self.assertEqual(self.month(first).covered, Decimal("960.00"))
+
+        payment.delete()
+        self.assertFalse(self.renter.months.filter(paid=True).exists())
+
+        YearlyRent.objects.create(apartment=self.apartment, year=self.year, price=Decimal("90.00"))
+        self.assertEqual(self.month(date(self.year, 1, 1)).expected, Decimal("90.00"))
+
+    def test_verify_and_rebuild_command(self):
+
+        Payment.objects.create(renter=self.renter, amount=Decimal("80.00"), month_covered=date(self.year - 1, 2, 1))
+        self.renter.months.update(paid=False)
+        with self.assertRaises(CommandError):
+            call_command("rebuild_renter_months", "--verify", stdout=StringIO())
+        call_command("rebuild_renter_months", stdout=StringIO())
+        call_command("rebuild_renter_months", "--verify", stdout=StringIO())
+        self.assertTrue(self.month(date(self.year - 1, 2, 1)).paid)
+
+    def test_fill_missing_months_through_today(self):
+        later = date(self.year + 1, 3, 15)
+        self.renter.months.filter(month=date(self.year - 1, 6, 1)).delete()
+        self.assertEqual(fill_missing_months(later), 1)
+        self.assertEqual(self.renter.months.count(), 12 * 2 + 3)
+        self.assertEqual(fill_missing_months(later), 0)
+
+        expected = Renter.objects.with_balance(later).get(pk=self.renter.pk).expected_to_date
+        self.assertEqual(expected, Ledger.for_renter(self.renter, today=later).expected)
+        self.assertEqual(CoverageMask.objects.get(renter=self.renter, year=self.year + 1).unpaid, 0b111)
+
+    def test_fill_counts_a_mid_month_start(self):
+        for i in range(3):
+            self.make_renter(date(self.year - 1, 3, 15), name=f"m{i}")
+        with self.assertNumQueries(1):
+            self.assertEqual(fill_missing_months(), 0)
+
+    def test_backfill_migration(self):
+        backfill = importlib.import_module("process.migrations.0015_backfill_renter_months").backfill_months
+        Payment.objects.create(renter=self.renter, amount=Decimal("80.00"), month_covered=date(self.year - 1, 4, 1))
+        self.renter.months.filter(month__gte=date(self.year - 1, 3, 1)).delete()
+        backfill(django_apps, None)
+        self.assertEqual(self.renter.months.count(), 12 + date.today().month)
+        self.assertTrue(self.month(date(self.year - 1, 4, 1)).paid)
+        self.assertEqual(self.month(date(self.year - 1, 5, 1)).expected, Decimal("80.00"))
+        self.assertEqual(verify_renter_months(self.renter), [])
+
+
+class RenterTotalsTests(RentTestCase):
+    def setUp(self):
+        super().setUp()
+        self.renter = self.make_renter(date(2020, 1, 1))
+
+    def test_totals_follow_payment_writes(self):
+        payment = Payment.objects.create(renter=self.renter, amount=Decimal("100.00"), month_covered=date(2020, 1, 1))
+        Payment.objects.create(renter=self.renter, amount=Decimal("1200.00"), payment_type="yearly",
+                               month_covered=date(2021, 1, 1))
+        self.renter.refresh_from_db()
+        self.assertEqual((self.renter.total_paid, self.renter.payment_count), (Decimal("1300.00"), 2))
+        self.assertEqual(self.renter.paid_through, date(2021, 12, 1))
+
+        payment.amount = Decimal("150.00")
+        payment.save()
+        self.renter.refresh_from_db()
+        self.assertEqual(self.renter.total_paid, Decimal("1350.00"))
+
+        payment.delete()
+        self.renter.refresh_from_db()
+        self.assertEqual((self.renter.total_paid, self.renter.payment_count), (Decimal("1200.00"), 1))
+
+    def test_save_rebuilds_months_only_when_the_tenancy_changes(self):
+        renter = Renter.objects.get(pk=self.renter.pk)
+        renter.name = "Renamed"
+        with self.assertNumQueries(1):
+            renter.save()
+        renter.start_date = date(2020, 6, 1)
+        renter.save()
+        self.assertEqual(renter.months.order_by("month").first().month, date(2020, 6, 1))
+
+    def test_save_of_stale_instance_keeps_totals(self):
+        stale = Renter.objects.get(pk=self.renter.pk)
+        Payment.objects.create(renter=self.renter, amount=Decimal("10.00"), month_covered=date(2020, 1, 1))
+        stale.name = "Renamed"
+        stale.save()
+        self.renter.refresh_from_db()
+        self.assertEqual(self.renter.name, "Renamed")
+        self.assertEqual((self.renter.total_paid, self.renter.payment_count, self.renter.ledger_version),
+                         (Decimal("10.00"), 1, 1))
+
+    def test_reconcile_repairs_drift_and_balance_sorts_in_sql(self):
+
+        Payment.objects.create(renter=self.renter, amount=Decimal("100.00"), month_covered=date(2020, 1, 1))
+        Renter.objects.filter(pk=self.renter.pk).update(total_paid=0, payment_count=0, paid_through=None)
+        call_command("reconcile_renter_totals", stdout=StringIO())
+        renter = Renter.objects.with_balance().get(pk=self.renter.pk)
+        self.assertEqual((renter.total_paid, renter.payment_count), (Decimal("100.00"), 1))
+        self.assertEqual(renter.balance_to_date, renter.total_paid - renter.expected_to_date)
+
+
+class AdminChangelistTests(RentTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(get_user_model().objects.get(username="simple"))
+
+    def make_renters(self, count):
+        for i in range(count):
+            renter = self.make_renter(date(2020, 1, 1), name=f"r{i}")
+            Payment.objects.create(renter=renter, amount=Decimal("10.00"), month_covered=date(2020, 1, 1))
+
+    def changelist_queries(self, url):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries)
+
+    def test_query_count_does_not_grow_with_rows(self):
+        urls = ["/admin/process/renter/", "/admin/process/payment/", "/admin/process/floor/",
+                "/admin/process/renter/?o=5"]
+        self.make_renters(2)
+        small = [self.changelist_queries(url) for url in urls]
+        self.make_renters(8)
+        self.assertEqual(small, [self.changelist_queries(url) for url in urls])
+
+
+class FloorTreeTests(RentTestCase):
+    def setUp(self):
+        super().setUp()
+        self.auth = self.login(Client())
+
+    def add_floor(self, number, apartments):
+        floor = Floor.objects.create(number=number)
+        for i in range(apartments):
+            apartment = Apartment.objects.create(floor=floor)
+            if i % 2:
+                self.make_renter(date(2024, 1, 1), name=f"r{number}-{i}", apartment=apartment)
+
+    def page_queries(self, url):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url, **self.auth)
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries)
+
+    def test_query_count_is_fixed(self):
+        self.add_floor(1, 2)
+        small = [self.page_queries("/main-page/"), self.page_queries("/floors/")]
+        for number in range(2, 6):
+            self.add_floor(number, 5)
+        self.assertEqual(small, [self.page_queries("/main-page/"), self.page_queries("/floors/")])
+        self.assertLessEqual(max(small), 3)
+
+
+class RateCacheTests(RentTestCase):
+    def setUp(self):
+        super().setUp()
+        self.apartment = Apartment.objects.create(floor=Floor.objects.create(number=1))
+        YearlyRent.objects.create(apartment=self.apartment, year=2024, price=Decimal("100.00"))
+
+    def test_hit_costs_no_query_and_writes_invalidate(self):
+        self.assertEqual(rates_for(self.apartment.pk), {2024: Decimal("100.00")})
+        with self.assertNumQueries(0):
+            rates_for(self.apartment.pk)
+
+        YearlyRent.objects.update_or_create(apartment=self.apartment, year=2024, defaults={"price": 120})
+        self.assertEqual(rates_for(self.apartment.pk), {2024: Decimal("120.00")})
+        YearlyRent.objects.filter(apartment=self.apartment).delete()
+        self.assertEqual(rates_for(self.apartment.pk), {})
+
+    def test_versions_read_once_per_request(self):
+        request_started.send(sender=None)
+        self.addCleanup(request_finished.send, sender=None)
+        rates_for(self.apartment.pk)
+        with mock.patch.object(cache, "get_many", wraps=cache.get_many) as get_many:
+            rates_for(self.apartment.pk)
+            rates_for(self.apartment.pk)
+            self.assertEqual(get_many.call_count, 0)
+            YearlyRent.objects.filter(apartment=self.apartment).update(price=Decimal("130.00"))
+            invalidate_rates(self.apartment.pk)
+            self.assertEqual(rates_for(self.apartment.pk), {2024: Decimal("130.00")})
+            self.assertEqual(get_many.call_count, 1)
+
+    def test_lru_is_bounded(self):
+        cache = RateCache(maxsize=2)
+        other = Apartment.objects.create()
+        third = Apartment.objects.create()
+        for apartment in (self.apartment, other, third):
+            cache.rates(apartment.pk)
+        self.assertEqual(list(cache._entries), [other.pk, third.pk])
+
+    def test_stored_months_ignore_a_stale_rate_cache(self):
+        renter = self.make_renter(date(2024, 1, 1), apartment=self.apartment)
+        self.assertEqual(rates_for(self.apartment.pk), {2024: Decimal("100.00")})
+        # another process changed the rent; this process never saw the invalidation
+        YearlyRent.objects.filter(apartment=self.apartment).update(price=Decimal("500.00"))
+        Payment.objects.create(renter=renter, amount=Decimal("500.00"), month_covered=date(2024, 3, 1))
+        self.assertEqual(renter.months.get(month=date(2024, 3, 1)).expected, Decimal("500.00"))
+
+
+class ExpectedApiTests(RentTestCase):
+    def setUp(self):
+        super().setUp()
+        self.apartment = Apartment.objects.create(floor=Floor.objects.create(number=1))
+        self.year = date.today().year
+        YearlyRent.objects.create(apartment=self.apartment, year=self.year - 1, price=Decimal("100.00"))
+        YearlyRent.objects.create(apartment=self.apartment, year=self.year, price=Decimal("200.00"))
+
+    def test_closed_form_total(self):
+        response = self.client.get("/api/expected/", {"apartment": self.apartment.pk,
+                                                      "start_date": f"{self.year - 1}-11-15"})
+        months = date.today().month
+        self.assertEqual(response.json(), {"months_count": months + 2, "months": months + 2,
+                                           "expected_total": 200.0 + 200.0 * months})
+        self.assertIn("max-age=300", response["Cache-Control"])
+
+    def test_batch_and_conditional_get(self):
+        query = (f"apartment={self.apartment.pk}&start_date={self.year}-01-01"
+                 f"&apartment=9999&start_date={self.year}-01-01")
+        response = self.client.get(f"/api/expected/?{query}")
+        results = response.json()["results"]
+        self.assertEqual(results[0]["expected_total"], 200.0 * date.today().month)
+        self.assertEqual(results[1]["error"], "apartment not found")
+
+        with self.assertNumQueries(0):
+            repeat = self.client.get(f"/api/expected/?{query}", HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(repeat.status_code, 304)
+
+        YearlyRent.objects.filter(year=self.year).get().delete()
+        changed = self.client.get(f"/api/expected/?{query}", HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(changed.status_code, 200)
+
+    def test_errors_get_no_etag(self):
+        for params, status in (({"apartment": 9999, "start_date": f"{self.year}-01-01"}, 404),
+                               ({"apartment": self.apartment.pk, "start_date": "yesterday"}, 400),
+                               ({"apartment": self.apartment.pk, "start_date": f"{self.year + 1}-01-01"}, 400)):
+            response = self.client.get("/api/expected/", params)
+            self.assertEqual(response.status_code, status)
+            self.assertNotIn("ETag", response)
+
+
+class RefreshTokenTests(RentTestCase):
+    def setUp(self):
+        super().setUp()
+        verified_tokens.clear()
+        response = self.client.post("/login-jwt/", json.dumps(
+            {"username": "simple", "password": "YourStrongPassword123!"}), content_type="application/json")
+        self.tokens = response.json()
+        self.client.cookies.clear()
+
+    def get_floors(self, token):
+        return self.client.get("/floors/", HTTP_AUTHORIZATION=f"Bearer {token}").status_code
+
+    def test_refresh_and_revoke(self):
+        self.assertEqual(self.get_floors(self.tokens["token"]), 200)
+        self.assertEqual(self.get_floors(self.tokens["refresh"]), 401)
+
+        body = json.dumps({"refresh": self.tokens["refresh"]})
+        response = self.client.post("/refresh-jwt/", body, content_type="application/json")
+        self.assertEqual(self.get_floors(response.json()["token"]), 200)
+
+        self.client.post("/logout-jwt/", body, content_type="application/json")
+        response = self.client.post("/refresh-jwt/", body, content_type="application/json")
+        self.assertEqual(response.status_code, 401)
+
+    def test_verified_tokens_skip_decoding(self):
+        self.get_floors(self.tokens["token"])
+        with mock.patch("process.views.jwt.decode") as decode:
+            self.assertEqual(self.get_floors(self.tokens["token"]), 200)
+        decode.assert_not_called()
+
+    def test_expired_cookie_renewed_from_refresh_cookie(self):
+        self.client.cookies["jwt_refresh"] = self.tokens["refresh"]
+        self.client.cookies["jwt_token"] = "expired"
+        response = self.client.get("/floors/")
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("jwt_token", response.cookies)
+
+
+class PaymentImportTests(RentTestCase):
+    def setUp(self):
+        super().setUp()
+        self.renter = self.make_renter(date(2024, 1, 1), rents={2024: "100.00"})
+
+    def test_csv_import_with_errors(self):
+        rows = [
+            "renter_id,amount,payment_type,year_month_covered,year_covered",
+            f"{self.renter.pk},100.00,monthly,2024-01,",
+            f"{self.renter.pk},,yearly,,2024",
+            f"{self.renter.pk},100.00,monthly,,",
+            "9999,100.00,monthly,2024-02,",
+        ]
+        report = import_payments(StringIO("\n".join(rows)), "csv", batch_size=2)
+        self.assertEqual((report.imported, report.failed), (2, 2))
+        self.assertEqual([e["line"] for e in report.errors], [4, 5])
+
+        self.renter.refresh_from_db()
+        self.assertEqual((self.renter.total_paid, self.renter.payment_count), (Decimal("1300.00"), 2))
+        self.assertEqual(self.renter.paid_through, date(2024, 12, 1))
+        self.assertEqual(self.renter.months.filter(month__year=2024, paid=True).count(), 12)
+
+    def test_yearly_defaults_resolve_rents_per_batch(self):
+        others = []
+        for i in range(3):
+            others.append(self.make_renter(date(2024, 1, 1), name=f"y{i}", rents={2024: Decimal("10.00") * (i + 1)}))
+        body = "\n".join(json.dumps({"renter_id": r.pk, "payment_type": "yearly", "year_covered": 2024}) for r in others)
+        with CaptureQueriesContext(connection) as queries:
+            import_payments(StringIO(body), "jsonl", dry_run=True)
+        self.assertEqual(sum("process_yearlyrent" in q["sql"] for q in queries.captured_queries), 1)
+
+    def test_bad_types_and_oversized_amounts_are_row_errors(self):
+        body = "\n".join(json.dumps(record) for record in [
+            {"renter_id": self.renter.pk, "amount": "50", "year_month_covered": 202403},
+            {"renter_id": self.renter.pk, "amount": "99999999999", "year_month_covered": "2024-03"},
+            {"renter_id": self.renter.pk, "amount": "50", "year_month_covered": "2024-03", "date_paid": 20240301},
+            {"renter_id": self.renter.pk, "amount": "50", "year_month_covered": "2024-04"},
+        ])
+        report = import_payments(StringIO(body), "jsonl")
+        self.assertEqual((report.imported, report.failed), (1, 3))
+        self.assertEqual([e["line"] for e in report.errors], [1, 2, 3])
+
+        response = self.client.post(f"/add_payment/{self.renter.pk}/", json.dumps(
+            {"amount": "50", "year_month_covered": 202403}), content_type="application/json", **self.login())
+        self.assertEqual(response.status_code, 400)
+
+    def test_jsonl_upload_endpoint(self):
+        body = "\n".join([
+            json.dumps({"renter_id": self.renter.pk, "amount": "50", "year_month_covered": "2024-03"}),
+            "not json",
+        ])
+        upload = SimpleUploadedFile("bank.jsonl", body.encode())
+        response = self.client.post("/api/payments/import/", {"file": upload}, **self.login())
+        self.assertEqual(response.json()["imported"], 1)
+        self.assertEqual(response.json()["failed"], 1)
+        self.assertEqual(Payment.objects.count(), 1)
+
+
+class BulkRentChangeTests(RentTestCase):
+    def setUp(self):
+        super().setUp()
+        self.floor = Floor.objects.create(number=1)
+        self.apartments = [Apartment.objects.create(floor=self.floor) for _ in range(3)]
+        for apartment in self.apartments[:2]:
+            YearlyRent.objects.create(apartment=apartment, year=2024, price=Decimal("100.00"))
+        self.renter = self.make_renter(date(2025, 1, 1), apartment=self.apartments[0])
+
+    def test_percent_increase_for_floor(self):
+        rates_for(self.apartments[0].pk)
+        out = StringIO()
+        call_command("bulk_rent_change", "--year", "2025", "--percent", "5", "--floor", str(self.floor.pk), stdout=out)
+        self.assertIn("Updated 2025 rent for 2 apartments", out.getvalue())
+        self.assertEqual(rates_for(self.apartments[0].pk)[2025], Decimal("105.00"))
+        self.assertEqual(self.renter.months.get(month=date(2025, 1, 1)).expected, Decimal("105.00"))
+
+    def test_fixed_price_endpoint_upserts(self):
+        body = {"year": 2024, "monthly_price": "120", "apartments": [a.pk for a in self.apartments]}
+        response = self.client.post("/api/rents/bulk/", json.dumps(body), content_type="application/json",
+                                    **self.login())
+        self.assertEqual(response.json()["affected"], 3)
+        self.assertEqual(YearlyRent.objects.filter(year=2024, price=Decimal("120.00")).count(), 3)
+
+    def test_endpoint_rejects_unstorable_values(self):
+        auth = self.login()
+        for field, value in [("monthly_price", "NaN"), ("monthly_price", "Infinity"), ("monthly_price", "-50"),
+                             ("monthly_price", "1e20"), ("monthly_price", "10.005"), ("percent", "NaN"),
+                             ("percent", "-Infinity"), ("percent", "-150"), ("percent", "1e20")]:
+            body = {"year": 2025, field: value, "apartments": [a.pk for a in self.apartments]}
+            response = self.client.post("/api/rents/bulk/", json.dumps(body), content_type="application/json", **auth)
+            self.assertEqual(response.status_code, 400, (field, value))
+        self.assertFalse(YearlyRent.objects.filter(year=2025).exists())
+
+
+class SqlitePerformanceModeTests(SimpleTestCase):
+    """
+    Parallel writers and readers on one SQLite file, each thread on its own
+    Django connection configured with performance_options() as settings.py
+    does, so init_command and transaction_mode are what is exercised.
+    """
+    alias = "sqlite_performance"
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.settings_dict = {**connections["default"].settings_dict, "NAME": os.path.join(tmp.name, "db.sqlite3"),
+                              "OPTIONS": sqlite_tuning.performance_options()}
+        with self.connect().cursor() as cursor:
+            cursor.execute("CREATE TABLE payment (id INTEGER PRIMARY KEY, amount INTEGER)")
+        self.addCleanup(self.disconnect)
+
+    def connect(self):
+        """A connection of this thread's own, registered under `alias` so transaction.atomic finds it."""
+        connections[self.alias] = SQLiteDatabaseWrapper(self.settings_dict, self.alias)
+        return connections[self.alias]
+
+    def disconnect(self):
+        connections[self.alias].close()
+        del connections[self.alias]
+
+    def worker(self, errors, statements, write):
+        conn = self.connect()
+        try:
+            with conn.execute_wrapper(lambda execute, sql, *args: statements.append(sql) or execute(sql, *args)):
+                for i in range(40):
+                    if write:
+                        # add_payment's shape: read the running total, then insert
+                        with transaction.atomic(using=self.alias), conn.cursor() as cursor:
+                            cursor.execute("SELECT COALESCE(SUM(amount), 0) FROM payment")
+                            cursor.execute("INSERT INTO payment (amount) VALUES (%s)", [i])
+                    else:
+                        with conn.cursor() as cursor:
+                            cursor.execute("SELECT COUNT(*), SUM(amount) FROM payment")
+                with conn.cursor() as cursor:
+                    cursor.execute("PRAGMA busy_timeout")
+                    statements.append(("busy_timeout", cursor.fetchone()[0]))
+        except OperationalError as e:
+            errors.append(str(e))
+        finally:
+            self.disconnect()
+
+    def test_parallel_writers_and_readers(self):
+        errors, statements = [], []
+        threads = [threading.Thread(target=self.worker, args=(errors, statements, i % 2 == 0)) for i in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(statements.count("BEGIN IMMEDIATE"), 4 * 40)
+        self.assertEqual(statements.count(("busy_timeout", 5000)), 8)
+        with connections[self.alias].cursor() as cursor:
+            cursor.execute("SELECT COUNT(*) FROM payment")
+            self.assertEqual(cursor.fetchone()[0], 4 * 40)
+            cursor.execute("PRAGMA journal_mode")
+            self.assertEqual(cursor.fetchone()[0], "wal")
+
+    def test_settings_options(self):
+        options = sqlite_tuning.performance_options()
+        self.assertEqual(options["transaction_mode"], "IMMEDIATE")
+        self.assertIn("PRAGMA journal_mode=WAL", options["init_command"])
+
+
+class QueryPlanTests(RentTestCase):
+    """EXPLAIN QUERY PLAN on the hot query shapes: none may fall back to a full table scan."""
+
+    def assertNoTableScan(self, queryset):
+        plan = queryset.explain()
+        table = queryset.model._meta.db_table
+        scans = [line for line in plan.splitlines() if line.split(" ", 3)[-1].strip() == f"SCAN {table}"]
+        self.assertEqual(scans, [], f"full scan of {table}:\n{plan}")
+
+    def test_payment_access_paths(self):
+        lower, upper = date(2023, 2, 1), date(2024, 2, 1)
+        self.assertNoTableScan(Payment.objects.filter(
+            Q(month_covered__gte=lower, month_covered__lt=upper)
+            | Q(month_covered__isnull=True, date_paid__gte=lower, date_paid__lt=upper),
+            renter_id=1,
+        ))
+        self.assertNoTableScan(Payment.objects.filter(date_paid__gte=lower, payment_type="monthly"))
+        self.assertNoTableScan(Payment.objects.filter(month_covered=lower))
+
+    def test_renter_access_paths(self):
+        self.assertNoTableScan(Renter.objects.filter(name="Tenant"))
+        self.assertNoTableScan(Renter.objects.filter(email="t@example.com"))
+        self.assertNoTableScan(Renter.objects.filter(start_date__gte=date(2024, 1, 1)))
+
+    def test_ledger_access_paths(self):
+        self.assertNoTableScan(RenterMonth.objects.filter(month=date(2024, 1, 1), paid=False))
+        self.assertNoTableScan(RenterMonth.objects.filter(renter_id=1, month__gte=date(2024, 1, 1)))
+        self.assertNoTableScan(YearlyRent.objects.filter(apartment_id=1))
+
+
+class SyntheticDataTests(RentTestCase):
+    def test_generate_is_seeded_and_consistent(self):
+        out = StringIO()
+        call_command("generate_rent_data", "--floors", "2", "--apartments-per-floor", "3", "--years", "2",
+                     "--seed", "7", stdout=out)
+        self.assertIn("Created 2 floors, 6 apartments", out.getvalue())
+        call_command("rebuild_renter_months", "--verify", stdout=StringIO())
+        for renter in Renter.objects.all():
+            self.assertEqual(renter.payment_count, renter.payments.count())
+
+    def test_benchmark_leaves_no_rows(self):
+        out = StringIO()
+        call_command("benchmark_ledger", "--months", "12,24", "--repeat", "1", stdout=out)
+        self.assertIn("payment_status_by_month", out.getvalue())
+        self.assertFalse(Renter.objects.exists())
+
+
+class QueryTimingTests(RentTestCase):
+    def test_disabled_by_default(self):
+        response = self.client.get("/floors/", **self.login())
+        self.assertNotIn("Server-Timing", response)
+
+    @override_settings(QUERY_TIMING=True)
+    def test_server_timing_and_staff_stats(self):
+        request_stats.clear()
+        client = Client()
+        auth = self.login(client)
+        response = client.get("/floors/", **auth)
+        self.assertRegex(response["Server-Timing"], r'^db;dur=[\d.]+;desc="\d+ queries", total;dur=[\d.]+$')
+
+        stats = client.get("/api/stats/queries/", **auth).json()
+        names = {row["url_name"]: row for row in stats["results"]}
+        self.assertEqual(names["floor-list"]["requests"], 1)
+        self.assertIn("p95", names["floor-list"]["total_ms"])
+
+        response = client.get("/api/export/ledger/", **auth)
+        self.assertIn('stream;desc="partial', response["Server-Timing"])
+        b"".join(response.streaming_content)
+        names = {row["url_name"]: row for row in request_stats.summary()}
+        self.assertGreater(names["export_ledger_csv"]["queries"]["max"], 1)
+
+        get_user_model().objects.create_user("clerk", password="clerk-pass-123")
+        self.assertEqual(client.get("/api/stats/queries/", **self.login(client, "clerk", "clerk-pass-123")).status_code, 403)
+
+    def test_recorder_flags_repeated_statements(self):
+        floor = Floor.objects.create(number=1)
+        recorder = QueryRecorder()
+        with connection.execute_wrapper(recorder):
+            for _ in range(6):
+                Floor.objects.get(pk=floor.pk)
+            Apartment.objects.count()
+        self.assertEqual(recorder.count, 7)
+        self.assertEqual(list(recorder.repeated(5).values()), [6])
+
+
+class RenterMatrixApiTests(RentTestCase):
+    def setUp(self):
+        super().setUp()
+        self.year = date.today().year
+        self.renter = self.make_renter(date(self.year - 2, 3, 1), name="m",
+                                       rents={year: "100.00" for year in (self.year - 2, self.year - 1, self.year)})
+        Payment.objects.create(renter=self.renter, amount=Decimal("100.00"), month_covered=date(self.year - 2, 3, 1))
+        self.auth = self.login()
+        self.url = f"/api/renter/{self.renter.pk}/matrix/"
+
+    def test_matrix_and_year_range(self):
+        data = self.client.get(self.url, **self.auth).json()
+        self.assertEqual((data["first_year"], data["last_year"]), (self.year - 2, self.year))
+        first = data["years"][str(self.year - 2)]
+        self.assertEqual(first[:3], [None, None, 1])
+        self.assertEqual(first[3], 0)
+        self.assertEqual(data["total_paid"], 100.0)
+
+        data = self.client.get(self.url, {"year_from": self.year - 1, "year_to": self.year - 1}, **self.auth).json()
+        self.assertEqual(list(data["years"]), [str(self.year - 1)])
+        self.assertTrue(all(ym.startswith(str(self.year - 1)) for ym in data["missed_months"]))
+        self.assertEqual(self.client.get(self.url, {"year_from": "x"}, **self.auth).status_code, 400)
+
+    def test_etag_changes_with_payments_and_rents(self):
+        etag = self.client.get(self.url, **self.auth)["ETag"]
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag, **self.auth)
+        self.assertEqual(response.status_code, 304)
+
+        Payment.objects.create(renter=self.renter, amount=Decimal("100.00"), month_covered=date(self.year - 2, 4, 1))
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag, **self.auth)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["years"][str(self.year - 2)][3], 1)
+
+        etag = response["ETag"]
+        YearlyRent.objects.filter(year=self.year).update(price=Decimal("1.00"))
+        rate_cache.invalidate(self.renter.apartment_id)
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag, **self.auth).status_code, 200)
+
+
+class KeysetApiTests(RentTestCase):
+    def setUp(self):
+        super().setUp()
+        floors = [Floor.objects.create(number=n) for n in (1, 2)]
+        for i in range(6):
+            renter = self.make_renter(date(2024, 1, 1), name=f"k{i}", floor=floors[i % 2])
+            Payment.objects.create(renter=renter, amount=Decimal("10.00"), month_covered=date(2024, 1, 1),
+                                   date_paid=date(2024, 1, 1 + i), payment_type="yearly" if i == 5 else "monthly")
+        self.floor = floors[1]
+        self.auth = self.login()
+
+    def test_requires_token(self):
+        self.assertEqual(self.client.get("/api/v1/renters/").status_code, 401)
+
+    def test_cursor_pages_cost_the_same(self):
+        seen, url = [], "/api/v1/payments/?page_size=2"
+        while url:
+            with self.assertNumQueries(1):
+                data = self.client.get(url, **self.auth).json()
+            seen.extend(row["id"] for row in data["results"])
+            url = data["next"]
+        self.assertEqual(seen, sorted(Payment.objects.values_list("id", flat=True)))
+
+    def test_filters_and_field_selection(self):
+        data = self.client.get("/api/v1/payments/", {"floor": self.floor.pk, "payment_type": "monthly",
+                                                     "date_from": "2024-01-02", "fields": "id,amount"}, **self.auth).json()
+        self.assertEqual(len(data["results"]), 2)
+        self.assertEqual(set(data["results"][0]), {"id", "amount"})
+
+        data = self.client.get("/api/v1/renters/", {"floor": self.floor.pk, "fields": "name"}, **self.auth).json()
+        self.assertEqual([row["name"] for row in data["results"]], ["k1", "k3", "k5"])
+        self.assertEqual(self.client.get("/api/v1/payments/", {"date_to": "soon"}, **self.auth).status_code, 400)
+
+
+class LedgerExportTests(RentTestCase):
+    def setUp(self):
+        super().setUp()
+        floor = Floor.objects.create(number=3)
+        self.renters = []
+        for name in ("a", "b"):
+            self.renters.append(self.make_renter(date(2024, 1, 1), name=name, floor=floor, rents={2024: "100.00"}))
+        a, b = self.renters
+        Payment.objects.create(renter=a, amount=Decimal("100.00"), month_covered=date(2024, 1, 1), date_paid=date(2024, 1, 5))
+        Payment.objects.create(renter=a, amount=Decimal("150.00"), month_covered=date(2024, 2, 1), date_paid=date(2024, 3, 2))
+        Payment.objects.create(renter=b, amount=Decimal("50.00"), month_covered=date(2024, 1, 1), date_paid=date(2024, 1, 9))
+
+    def rows(self, text):
+        return list(csv.DictReader(StringIO(text)))
+
+    def test_running_balances(self):
+        out = StringIO()
+        call_command("export_ledger", "--chunk-size", "1", stdout=out)
+        rows = self.rows(out.getvalue())
+        self.assertEqual([(r["renter"], r["paid_to_date"], r["charged_to_date"], r["balance"]) for r in rows], [
+            ("a", "100.00", "100.00", "0.00"),
+            ("a", "250.00", "300.00", "-50.00"),
+            ("b", "50.00", "100.00", "-50.00"),
+        ])
+        self.assertEqual(rows[0]["floor"], "3")
+        self.assertEqual(rows[1]["month_covered"], "2024-02")
+
+    def test_streaming_endpoint(self):
+        response = self.client.get("/api/export/ledger/", {"renter": self.renters[1].pk}, **self.login())
+        self.assertTrue(response.streaming)
+        rows = self.rows(b"".join(response.streaming_content).decode())
+        self.assertEqual([r["renter_id"] for r in rows], [str(self.renters[1].pk)])
+        self.assertEqual(Client().get("/api/export/ledger/").status_code, 401)
+
+
+class RentRollTests(RentTestCase):
+    def setUp(self):
+        super().setUp()
+        floor = Floor.objects.create(number=1)
+        self.this_month = date.today().replace(day=1)
+        self.renters = []
+        for i in range(3):
+            apartment = Apartment.objects.create(floor=floor)
+            YearlyRent.objects.create(apartment=apartment, year=self.this_month.year, price=Decimal("100.00"))
+            if i < 2:
+                self.renters.append(self.make_renter(self.this_month, name=f"r{i}", apartment=apartment))
+        Payment.objects.create(renter=self.renters[0], amount=Decimal("100.00"), month_covered=self.this_month)
+
+    def test_incremental_rebuild(self):
+        out = StringIO()
+        call_command("build_rent_roll", stdout=out)
+        self.assertIn("Recomputed 1 months", out.getvalue())
+        snapshot = RentRollSnapshot.objects.get(month=self.this_month)
+        self.assertEqual((snapshot.expected, snapshot.collected), (Decimal("200.00"), Decimal("100.00")))
+        self.assertEqual((snapshot.occupied, snapshot.apartments, snapshot.delinquent), (2, 3, 1))
+
+        call_command("build_rent_roll", stdout=out)
+        self.assertIn("Recomputed 0 months", out.getvalue())
+
+        Payment.objects.create(renter=self.renters[1], amount=Decimal("100.00"), month_covered=self.this_month)
+        self.assertTrue(RentRollSnapshot.objects.get(month=self.this_month).dirty)
+        self.assertEqual(update_rent_roll(), 1)
+        self.assertEqual(RentRollSnapshot.objects.get(month=self.this_month).delinquent, 0)
+
+    def test_dashboard_reads_snapshots(self):
+        update_rent_roll()
+        auth = self.login()
+        with self.assertNumQueries(1):
+            data = self.client.get("/api/dashboard/rent-roll/", **auth).json()
+        row = data["results"][-1]
+        self.assertEqual(row["month"], self.this_month.strftime("%Y-%m"))
+        self.assertEqual((row["collection_rate"], row["delinquent"], row["stale"]), (0.5, 1, False))
+
+
+class FloorSummaryTests(RentTestCase):
+    def test_summary_in_one_query(self):
+        today = date.today()
+        for number, occupied in ((1, 2), (2, 0)):
+            floor = Floor.objects.create(number=number)
+            for i in range(3):
+                apartment = Apartment.objects.create(floor=floor)
+                YearlyRent.objects.create(apartment=apartment, year=today.year, price=Decimal("100.00"))
+                YearlyRent.objects.create(apartment=apartment, year=today.year - 1, price=Decimal("90.00"))
+                if i < occupied:
+                    renter = self.make_renter(today.replace(day=1), name=f"f{i}", apartment=apartment)
+                    Payment.objects.create(renter=renter, amount=Decimal("60.00"), month_covered=today.replace(day=1))
+                    Payment.objects.create(renter=renter, amount=Decimal("40.00"), month_covered=today.replace(day=1))
+
+        auth = self.login()
+        with self.assertNumQueries(1):
+            data = self.client.get("/api/floors/summary/", **auth).json()
+        first, second = data["floors"]
+        self.assertEqual((first["apartments"], first["occupied"], first["vacancy_rate"]), (3, 2, 0.3333))
+        self.assertEqual((first["expected_monthly"], first["collected_to_date"]), (200.0, 200.0))
+        self.assertEqual((second["occupied"], second["expected_monthly"], second["has_unpaid"]), (0, 0.0, False))
+        self.assertEqual((data["totals"]["apartments"], data["totals"]["vacancy_rate"]), (6, 0.6667))
+
+        response = self.client.get("/floors/summary/", **auth)
+        self.assertContains(response, "Floor 2")
+
+
+class CoverageMaskTests(RentTestCase):
+    def setUp(self):
+        super().setUp()
+        floor = Floor.objects.create(number=1)
+        self.renters = []
+        for i in range(2):
+            self.renters.append(self.make_renter(date(2023, 1, 1), name=f"c{i}", floor=floor,
+                                                 rents={2023: "100.00", 2024: "100.00"}))
+        a, b = self.renters
+        Payment.objects.create(renter=a, amount=Decimal("1200.00"), payment_type="yearly", month_covered=date(2023, 1, 1))
+        Payment.objects.create(renter=b, amount=Decimal("100.00"), month_covered=date(2023, 3, 1))
+
+    def test_masks_follow_payment_writes(self):
+        a, b = self.renters
+        self.assertEqual(a.coverage_masks.get(year=2023).paid, 0xFFF)
+        mask = b.coverage_masks.get(year=2023)
+        self.assertEqual((mask.paid, mask.unpaid), (0b100, 0xFFF ^ 0b100))
+
+        payment = b.payments.get()
+        payment.month_covered = date(2023, 4, 1)
+        payment.save()
+        self.assertEqual(b.coverage_masks.get(year=2023).paid, 0b1000)
+        payment.delete()
+        self.assertEqual(b.coverage_masks.get(year=2023).paid, 0)
+
+        expected = {(m.month.year, m.month.month) for m in b.months.filter(paid=False)}
+        masks = {(m.year, bit + 1) for m in b.coverage_masks.all() for bit in range(12) if m.unpaid & (1 << bit)}
+        self.assertEqual(masks, expected)
+
+    def test_lookups(self):
+        a, b = self.renters
+        self.assertEqual([r["renter_id"] for r in unpaid_in_month(2023, 5)], [b.pk])
+        self.assertEqual(unpaid_in_month(2023, 3), [])
+
+        runs = consecutive_missed(9, today=date(2024, 6, 1))
+        self.assertEqual([r["renter_id"] for r in runs], [b.pk])
+        self.assertEqual((runs[0]["longest_run"], runs[0]["longest_run_from"], runs[0]["longest_run_to"]),
+                         (15, "2023-04", "2024-06"))
+        self.assertEqual(runs[0]["current_run"], 15)
+        self.assertEqual(consecutive_missed(3, current=True, today=date(2023, 2, 1)), [])
+        runs = consecutive_missed(2, current=True, today=date(2023, 2, 1))
+        self.assertEqual([(r["renter_id"], r["current_run"]) for r in runs], [(b.pk, 2)])
+
+        auth = self.login()
+        data = self.client.get("/api/delinquency/", {"month": "2023-05"}, **auth).json()
+        self.assertEqual(data["count"], 1)
+        data = self.client.get("/api/delinquency/", {"consecutive": 2, "current": 1}, **auth).json()
+        self.assertIn(b.pk, [r["renter_id"] for r in data["results"]])
+        self.assertEqual(self.client.get("/api/delinquency/", **auth).status_code, 400)
+
+    def test_lookups_cover_months_since_the_last_write(self):
+        a, b = self.renters
+        today = date.today()
+        # nobody has touched either renter since the month started
+        RenterMonth.objects.filter(month=today.replace(day=1)).delete()
+        CoverageMask.objects.filter(year=today.year).update(unpaid=F("unpaid").bitand(~(1 << (today.month - 1))))
+        with self.assertNumQueries(1):
+            # lookups only read: the gap stays until the scheduled fill runs
+            self.assertEqual(unpaid_in_month(today.year, today.month), [])
+        out = StringIO()
+        call_command("fill_renter_months", stdout=out)
+        self.assertIn("Filled months for 2 renters", out.getvalue())
+        self.assertEqual([r["renter_id"] for r in unpaid_in_month(today.year, today.month)], [a.pk, b.pk])
+
+        later = date(today.year + 1, 6, 1)
+        fill_missing_months(later)
+        runs = consecutive_missed(6, current=True, today=later)
+        self.assertEqual([r["renter_id"] for r in runs], [a.pk, b.pk])
+        self.assertEqual(runs[0]["longest_run_to"], f"{later.year}-06")
+
+
+class RenterSearchTests(RentTestCase):
+    def setUp(self):
+        super().setUp()
+        floor = Floor.objects.create(number=4)
+        self.apartment = Apartment.objects.create(floor=floor)
+        self.jones = self.make_renter(date(2024, 1, 1), name="Alice Jones", apartment=self.apartment,
+                                      email="alice@example.com", phone="555-0101")
+        Renter.objects.create(name="Bob Johnson", email="bob@jones.org", phone="555-0202", floor=floor,
+                              start_date=date(2024, 1, 1))
+
+    def names(self, query):
+        return [renter.name for renter in search_renters(query)]
+
+    def test_prefix_ranking_and_sync(self):
+        self.assertEqual(self.names("jon"), ["Alice Jones", "Bob Johnson"])
+        self.assertEqual(self.names("jo ali"), ["Alice Jones"])
+        self.assertEqual(search_renters("0101")[0].floor_number, 4)
+
+        self.jones.name = "Alice Smith"
+        self.jones.save()
+        self.assertEqual(self.names("smi"), ["Alice Smith"])
+        self.jones.delete()
+        self.assertEqual(self.names("alice"), [])
+        self.assertEqual(self.names('"*)'), [])
+
+    def test_endpoint_and_rebuild(self):
+        auth = self.login()
+        with self.assertNumQueries(1):
+            data = self.client.get("/api/renters/search/", {"q": "ali"}, **auth).json()
+        self.assertEqual(data["results"][0]["apartment_id"], self.apartment.pk)
+
+        out = StringIO()
+        call_command("rebuild_renter_search", stdout=out)
+        self.assertIn("Indexed 2 renters", out.getvalue())
+        self.assertEqual(self.names("bob"), ["Bob Johnson"])
+
+
+class StatementTests(RentTestCase):
+    def test_generate_and_skip_unchanged(self):
+        renters = [self.make_renter(date(2025, 1, 1), name=f"s{i}", rents={2025: "100.00"}) for i in range(3)]
+        Payment.objects.create(renter=renters[0], amount=Decimal("100.00"), month_covered=date(2025, 1, 1),
+                               date_paid=date(2025, 1, 3))
+
+        with tempfile.TemporaryDirectory() as directory:
+            out = StringIO()
+            call_command("generate_statements", directory, "--workers", "1", "--chunk-size", "2", stdout=out)
+            self.assertIn("Wrote 3 statements, skipped 0", out.getvalue())
+            with open(os.path.join(directory, f"renter-{renters[0].pk}.csv")) as f:
+                rows = list(csv.reader(f))
+            self.assertIn(["total_paid", "100.00"], rows)
+            self.assertIn(["2025-01-03", "monthly", "2025-01", "100.00"], rows)
+            with open(os.path.join(directory, f"renter-{renters[0].pk}.html")) as f:
+                self.assertIn("2025-02", f.read())
+
+            Payment.objects.create(renter=renters[1], amount=Decimal("50.00"), month_covered=date(2025, 2, 1))
+            out = StringIO()
+            call_command("generate_statements", directory, "--workers", "1", stdout=out)
+            self.assertIn("Wrote 1 statements, skipped 2", out.getvalue())
+
+
+class JobTests(RentTestCase):
+    def setUp(self):
+        super().setUp()
+        self.output = tempfile.TemporaryDirectory()
+        self.addCleanup(self.output.cleanup)
+        override = override_settings(JOB_OUTPUT_DIR=self.output.name)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.auth = self.login()
+        self.renter = self.make_renter(date(2025, 1, 1), name="Queued")
+
+    def run_worker(self):
+        out = StringIO()
+        call_command("run_worker", "--once", stdout=out)
+        return out.getvalue()
+
+    def test_background_import_and_export(self):
+        upload = SimpleUploadedFile("bank.jsonl", json.dumps(
+            {"renter_id": self.renter.pk, "amount": "50", "year_month_covered": "2025-01"}).encode())
+        response = self.client.post("/api/payments/import/", {"file": upload, "background": "1"}, **self.auth)
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.json()["status"], Job.QUEUED)
+        status_url = response.json()["status_url"]
+        self.assertFalse(Payment.objects.exists())
+
+        export = self.client.get("/api/export/ledger/?background=1", **self.auth).json()
+        self.assertIn("stopped after 2 jobs", self.run_worker())
+
+        job = self.client.get(status_url, **self.auth).json()
+        self.assertEqual((job["status"], job["progress"], job["result"]["imported"]), (Job.SUCCEEDED, 100, 1))
+        self.assertEqual(Payment.objects.count(), 1)
+        self.assertEqual(os.listdir(os.path.join(self.output.name, "uploads")), [])
+
+        download = self.client.get(f"/api/jobs/{export['id']}/download/", **self.auth)
+        rows = list(csv.reader(b"".join(download.streaming_content).decode().splitlines()))
+        self.assertEqual(len(rows), 2)
+        self.assertEqual(rows[1][:2], [str(self.renter.pk), "Queued"])
+
+    def test_queue_api_and_failures(self):
+        response = self.client.post("/api/jobs/", json.dumps({"kind": "import_payments", "params": {"path": "/etc/passwd"}}),
+                                    content_type="application/json", **self.auth)
+        self.assertEqual(response.status_code, 400)
+        response = self.client.post("/api/jobs/", json.dumps({"kind": "build_rent_roll", "params": {"full": True}}),
+                                    content_type="application/json", **self.auth)
+        self.assertEqual(response.status_code, 202)
+        failing = Job.objects.create(kind="import_payments", params={"path": os.path.join(self.output.name, "missing")})
+
+        self.run_worker()
+        self.assertEqual(Job.objects.get(pk=response.json()["id"]).status, Job.SUCCEEDED)
+        failing.refresh_from_db()
+        self.assertEqual(failing.status, Job.FAILED)
+        self.assertIn("FileNotFoundError", failing.error)
+        listed = self.client.get("/api/jobs/", **self.auth).json()["results"]
+        self.assertEqual([job["id"] for job in listed], [failing.pk, response.json()["id"]])
+        self.assertEqual(Client().get("/api/jobs/").status_code, 401)
+
+    def test_boolean_params_are_parsed(self):
+        post = lambda params: self.client.post("/api/jobs/", json.dumps({"kind": "build_rent_roll", "params": params}),
+                                               content_type="application/json", **self.auth)
+        self.assertEqual(Job.objects.get(pk=post({"full": "false"}).json()["id"]).params, {"full": False})
+        self.assertEqual(Job.objects.get(pk=post({"full": "1"}).json()["id"]).params, {"full": True})
+        self.assertEqual(post({"full": "maybe"}).status_code, 400)
+
+    def test_stale_jobs_requeued_unless_not_repeatable(self):
+        rent_roll = Job.objects.create(kind="build_rent_roll", status=Job.RUNNING, worker="gone:1")
+        importing = Job.objects.create(kind="import_payments", status=Job.RUNNING, worker="gone:1",
+                                       message="500 imported, 0 rejected")
+        fresh = Job.objects.create(kind="build_rent_roll", status=Job.RUNNING, worker="alive:2")
+        Job.objects.filter(pk__in=[rent_roll.pk, importing.pk]).update(updated_at=timezone.now() - timedelta(hours=1))
+
+        self.assertEqual(requeue_stale(timedelta(minutes=30)), (1, 1))
+        statuses = dict(Job.objects.values_list("pk", "status"))
+        self.assertEqual([statuses[job.pk] for job in (rent_roll, importing, fresh)],
+                         [Job.QUEUED, Job.FAILED, Job.RUNNING])
+
+
+class RenterPageCacheTests(RentTestCase):
+    def setUp(self):
+        super().setUp()
+        self.renter = self.make_renter(date(2025, 1, 1), name="Cached", rents={2025: "100.00"})
+        self.apartment = self.renter.apartment
+        self.auth = self.login()
+        self.url = f"/renter/{self.renter.pk}/"
+
+    def test_repeat_view_skips_ledger_and_writes_invalidate(self):
+        first = self.client.get(self.url, **self.auth).content.decode()
+        self.assertEqual(first.count("✅"), 0)
+        self.assertIn('<td id="balance">$-', first)
+
+        with mock.patch.object(Ledger, "for_renter", side_effect=AssertionError("ledger built")), \
+                mock.patch.object(rate_cache, "version", side_effect=AssertionError("process-local version")), \
+                CaptureQueriesContext(connection) as queries:
+            repeat = self.client.get(self.url, **self.auth).content.decode()
+        self.assertEqual(len(queries), 1)
+        self.assertEqual(repeat.count("❌"), first.count("❌"))
+        self.assertIn('<td id="balance">$-', repeat)
+
+        Payment.objects.create(renter=self.renter, amount=Decimal("100.00"), month_covered=date(2025, 1, 1))
+        self.assertEqual(self.client.get(self.url, **self.auth).content.decode().count("✅"), 1)
+
+        version = Renter.objects.get(pk=self.renter.pk).ledger_version
+        YearlyRent.objects.create(apartment=self.apartment, year=2026, price=Decimal("321.00"))
+        self.assertEqual(Renter.objects.get(pk=self.renter.pk).ledger_version, version + 1)
+        self.assertIn("$321.00", self.client.get(self.url, **self.auth).content.decode())
@@ -1,19 +1,42 @@
-from django.urls import path
-from . import views
+from django.urls import include, path
+from rest_framework.routers import SimpleRouter
+from . import api, views
 from django.shortcuts import render
 
+router = SimpleRouter()
+router.register('renters', api.RenterViewSet, basename='api-renter')
+router.register('payments', api.PaymentViewSet, basename='api-payment')
+router.register('yearly-rents', api.YearlyRentViewSet, basename='api-yearly-rent')
 
 urlpatterns = [
 
    path('floors/', views.FloorListView.as_view(), name='floor-list'),
+   path('api/renters/search/', views.renter_search_api, name='renter_search_api'),
+   path('floors/summary/', views.floor_summary_page, name='floor-summary'),
+   path('api/floors/summary/', views.floor_summary_api, name='floor_summary_api'),
 
     path('renter/<int:pk>/', views.RenterDetailView.as_view(), name='renter-detail'),
 
+    path('api/renter/<int:pk>/matrix/', views.renter_matrix_api, name='renter_matrix_api'),
+
     path('main-page/', views.floor_page, name='floor-page'),
    path('add_payment/<int:renter_id>/', views.add_payment, name='add_payment'),
    path('api/expected/', views.expected_payments_api, name='expected_api'),
+   path('api/arrears/', views.arrears_api, name='arrears_api'),
+   path('api/delinquency/', views.delinquency_api, name='delinquency_api'),
+   path('api/dashboard/rent-roll/', views.rent_roll_api, name='rent_roll_api'),
+   path('api/export/ledger/', views.export_ledger_csv, name='export_ledger_csv'),
+   path('api/payments/import/', views.import_payments_api, name='import_payments_api'),
+   path('api/jobs/', views.jobs_api, name='jobs_api'),
+   path('api/jobs/<int:pk>/', views.job_status_api, name='job_status_api'),
+   path('api/jobs/<int:pk>/download/', views.job_download, name='job_download'),
    path('add_yearly_rent/<int:renter_id>/', views.add_yearly_rent, name='add_yearly_rent'),
+   path('api/stats/queries/', views.query_stats_api, name='query_stats_api'),
+   path('api/rents/bulk/', views.bulk_rent_change_api, name='bulk_rent_change_api'),
  path('login-jwt/', views.login_jwt, name='login_jwt'),
+ path('refresh-jwt/', views.refresh_jwt, name='refresh_jwt'),
+ path('logout-jwt/', views.logout_jwt, name='logout_jwt'),
+    path('api/v1/', include(router.urls)),
     path('', lambda request: render(request, 'process/login.html'), name='login-page'),
 
 ]
\ No newline at end of file
@@ -1,24 +1,150 @@
-from django.shortcuts import render, redirect
+from django.shortcuts import render, redirect, get_object_or_404
 from django.views.generic import DetailView, ListView
 from django.utils import timezone
-from django.http import JsonResponse
+from django.urls import reverse
+from django.http import FileResponse, Http404, JsonResponse, StreamingHttpResponse
 from django.contrib.auth import authenticate
+from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import Prefetch
 from functools import wraps
 import jwt
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from collections import OrderedDict
+from threading import Lock
+import hashlib
+import io
+import os
+import time
+import uuid
 import json
+from decimal import Decimal, InvalidOperation
 
 from django.utils.decorators import method_decorator
+from django.utils.functional import cached_property
 from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import condition
+from django.utils.cache import patch_cache_control
 
-from .models import Renter, Floor, Apartment, Payment
+from .models import Renter, Floor, Apartment, Payment, RefreshToken, RentRollSnapshot, Job
 from .models import YearlyRent
-from .forms import RenterForm, FloorForm, ApartmentForm
+from .forms import RenterForm, FloorForm, ApartmentForm, clean_payment_data
+from .middleware import request_stats
+from .delinquency import consecutive_missed, unpaid_in_month
+from .exports import DEFAULT_CHUNK_SIZE, csv_chunks, ledger_rows
+from .jobs import describe as describe_job, enqueue, output_dir
+from .importer import DEFAULT_BATCH_SIZE, detect_format, import_payments
+from .ledger import Ledger, expected_between
+from .rates import rate_cache, rates_for
+from .search import search_renters
+from .rent_changes import select_apartments, plan_rent_change, apply_rent_change
 
 from django.conf import settings
 SECRET_KEY = settings.SECRET_KEY
  # use settings.SECRET_KEY in production
 
+# ---------------- JWT TOKENS ----------------
+# Short-lived access tokens plus revocable refresh tokens: clients renew access
+# through /refresh-jwt/ instead of re-running the password hash in login_jwt.
+ACCESS_LIFETIME = getattr(settings, "JWT_ACCESS_LIFETIME", timedelta(minutes=15))
+REFRESH_LIFETIME = getattr(settings, "JWT_REFRESH_LIFETIME", timedelta(days=7))
+
+
+def issue_access_token(user_id, username):
+    payload = {
+        "user_id": user_id,
+        "username": username,
+        "type": "access",
+        "exp": datetime.now(dt_timezone.utc) + ACCESS_LIFETIME,
+    }
+    return jwt.encode(payload, SECRET_KEY, algorithm="HS256")
+
+
+def issue_refresh_token(user):
+    expires = timezone.now() + REFRESH_LIFETIME
+    record = RefreshToken.objects.create(user=user, jti=uuid.uuid4().hex, expires_at=expires)
+    payload = {"user_id": user.id, "jti": record.jti, "type": "refresh", "exp": expires}
+    return jwt.encode(payload, SECRET_KEY, algorithm="HS256")
+
+
+def _refresh_record(token):
+    """The active RefreshToken row behind a refresh JWT, or None."""
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=["HS256"])
+    except jwt.InvalidTokenError:
+        return None
+    if payload.get("type") != "refresh":
+        return None
+    record = RefreshToken.objects.select_related("user").filter(jti=payload.get("jti")).first()
+    if not record or not record.is_active or not record.user.is_active:
+        return None
+    return record
+
+
+def _set_token_cookies(response, access=None, refresh=None):
+    if access:
+        response.set_cookie("jwt_token", access, httponly=True, samesite="Lax",
+                            max_age=int(ACCESS_LIFETIME.total_seconds()))
+    if refresh:
+        response.set_cookie("jwt_refresh", refresh, httponly=True, samesite="Lax",
+                            max_age=int(REFRESH_LIFETIME.total_seconds()))
+
+
+class VerifiedTokenCache:
+    """
+    Bounded LRU of access tokens whose signature has already been checked, so
+    jwt_required skips the HMAC verify + JSON decode on repeat requests. The
+    expiry is still checked on every hit.
+    """
+
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, token):
+        with self._lock:
+            payload = self._entries.get(token)
+            if payload is None:
+                return None
+            if payload["exp"] <= time.time():
+                del self._entries[token]
+                return None
+            self._entries.move_to_end(token)
+            return payload
+
+    def put(self, token, payload):
+        with self._lock:
+            self._entries[token] = payload
+            self._entries.move_to_end(token)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+verified_tokens = VerifiedTokenCache(getattr(settings, "JWT_VERIFIED_CACHE_SIZE", 1024))
+
+
+def verify_access_token(token):
+    """Payload of a valid access token, or None."""
+    payload = verified_tokens.get(token)
+    if payload is not None:
+        return payload
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=["HS256"])
+    except jwt.InvalidTokenError:
+        return None
+    # tokens issued before refresh support carry no type; treat them as access
+    if payload.get("type", "access") != "access" or "user_id" not in payload:
+        return None
+    verified_tokens.put(token, payload)
+    return payload
+
+
 # ---------------- JWT LOGIN ----------------
 @csrf_exempt
 def login_jwt(request):
@@ -35,20 +161,53 @@ def login_jwt(request):
 
     user = authenticate(username=username, password=password)
     if user:
-        payload = {
-            "user_id": user.id,
-            "username": user.username,
-            "exp": datetime.utcnow() + timedelta(hours=1)
-        }
-        token = jwt.encode(payload, SECRET_KEY, algorithm="HS256")
-        response = JsonResponse({"token": token})
-        # Set JWT as HttpOnly cookie
-        response.set_cookie("jwt_token", token, httponly=True, samesite="Lax")
+        token = issue_access_token(user.id, user.username)
+        refresh = issue_refresh_token(user)
+        response = JsonResponse({"token": token, "refresh": refresh})
+        # Set both JWTs as HttpOnly cookies
+        _set_token_cookies(response, access=token, refresh=refresh)
         return response
 
     return JsonResponse({"error": "Invalid credentials"}, status=401)
 
 
+def _posted_refresh_token(request):
+    try:
+        data = json.loads(request.body.decode("utf-8"))
+        token = data.get("refresh")
+    except Exception:
+        token = request.POST.get("refresh")
+    return token or request.COOKIES.get("jwt_refresh")
+
+
+@csrf_exempt
+def refresh_jwt(request):
+    """Exchange a refresh token (body or cookie) for a new access token."""
+    if request.method != "POST":
+        return JsonResponse({"error": "POST required"}, status=400)
+    record = _refresh_record(_posted_refresh_token(request) or "")
+    if not record:
+        return JsonResponse({"error": "Invalid refresh token"}, status=401)
+    token = issue_access_token(record.user_id, record.user.username)
+    response = JsonResponse({"token": token})
+    _set_token_cookies(response, access=token)
+    return response
+
+
+@csrf_exempt
+def logout_jwt(request):
+    """Revoke the refresh token and clear both cookies."""
+    if request.method != "POST":
+        return JsonResponse({"error": "POST required"}, status=400)
+    record = _refresh_record(_posted_refresh_token(request) or "")
+    if record:
+        RefreshToken.objects.filter(pk=record.pk).update(revoked_at=timezone.now())
+    response = JsonResponse({"success": True})
+    response.delete_cookie("jwt_token")
+    response.delete_cookie("jwt_refresh")
+    return response
+
+
 # ---------------- JWT REQUIRED DECORATOR ----------------
 def jwt_required(view_func):
     @wraps(view_func)
@@ -66,23 +225,82 @@ def jwt_required(view_func):
         else:
             # fallback: check cookie
             token = request.COOKIES.get("jwt_token")
-            if not token:
-                return JsonResponse({"error": "Unauthorized"}, status=401)
 
-        try:
-            payload = jwt.decode(token, SECRET_KEY, algorithms=["HS256"])
-            request.user_id = payload["user_id"]
-        except Exception:
+        payload = verify_access_token(token) if token else None
+        renewed = None
+        if payload is None and not auth_header:
+            # page loads: renew an expired access cookie from the refresh cookie
+            record = _refresh_record(request.COOKIES.get("jwt_refresh") or "")
+            if record:
+                renewed = issue_access_token(record.user_id, record.user.username)
+                payload = verify_access_token(renewed)
+        if payload is None:
             return JsonResponse({"error": "Unauthorized"}, status=401)
+        request.user_id = payload["user_id"]
 
-        return view_func(request, *args, **kwargs)
+        response = view_func(request, *args, **kwargs)
+        if renewed:
+            _set_token_cookies(response, access=renewed)
+        return response
     return wrapper
 
 
 # ---------------- RENTER DETAIL VIEW ----------------
+MONTH_NAMES = [
+    "January", "February", "March", "April", "May", "June",
+    "July", "August", "September", "October", "November", "December"
+]
+
+
+class RenterPage:
+    """
+    Ledger figures for the renter page, computed on first access. The template
+    only reads them inside {% cache %} fragments, so a cache hit never builds
+    the ledger or loads the rent table.
+    """
+    def __init__(self, renter):
+        self.renter = renter
+
+    @cached_property
+    def matrix(self):
+        years, rows = self.renter.ledger.matrix()
+        return years, [{"month_name": MONTH_NAMES[i], "statuses": statuses} for i, statuses in enumerate(rows)]
+
+    @property
+    def years(self):
+        return self.matrix[0]
+
+    @property
+    def payments_by_month(self):
+        return self.matrix[1]
+
+    @cached_property
+    def expected_unpaid(self):
+        return round(float(self.renter.ledger.expected_unpaid), 2)
+
+    @cached_property
+    def missed_months(self):
+        return self.renter.ledger.missed_months()
+
+    @cached_property
+    def yearly_rents(self):
+        return sorted(rates_for(self.renter.apartment_id).items())
+
+
+def renter_page_version(renter):
+    """
+    Fragment-cache version for one renter page: ledger_version (bumped by every
+    payment write and every change to the apartment's rents), the start date
+    and apartment, and today's date. All of it comes with the renter row, so
+    the version costs no lookup of its own and is the same in every process.
+    """
+    return f"{renter.ledger_version}:{renter.start_date}:{renter.apartment_id}:{date.today()}"
+
+
 @method_decorator(csrf_exempt, name='dispatch')
 class RenterDetailView(DetailView):
     model = Renter
+    queryset = Renter.objects.select_related("floor", "apartment__floor")
     template_name = "process/renter_detail.html"
     context_object_name = "renter"
 
@@ -92,47 +310,88 @@ class RenterDetailView(DetailView):
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        months = [f"{i:02}" for i in range(1, 13)]
-        month_names = [
-            "January", "February", "March", "April", "May", "June",
-            "July", "August", "September", "October", "November", "December"
-        ]
-        normalized_payments = {}
-        for m, paid in self.object.payment_status_by_month():
-            year, month = m.split("-")
-            normalized_payments[f"{year}-{int(month):02}"] = paid
-        current_year = self.object.start_date.year
-        end_year = datetime.now().year
-        years = list(range(current_year, end_year + 1))
-        table = []
-        for i, month in enumerate(months):
-            row = {"month_name": month_names[i], "statuses": []}
-            for year in years:
-                ym = f"{year}-{month}"
-                row["statuses"].append(normalized_payments.get(ym, False))
-            table.append(row)
-        context["years"] = years
-        context["payments_by_month"] = table
-        # compute expected unpaid total using missed months and YearlyRent for the apartment
-        missed = self.object.missed_months()
-        expected_unpaid = 0.0
-        for ym in missed:
-            try:
-                year = int(ym.split('-')[0])
-            except Exception:
-                continue
-            try:
-                yr = YearlyRent.objects.get(apartment=self.object.apartment, year=year)
-                monthly = float(yr.price)
-            except YearlyRent.DoesNotExist:
-                monthly = 0.0
-            expected_unpaid += monthly
-        context['expected_unpaid'] = round(expected_unpaid, 2)
-        context['missed_months'] = missed
+        context["page"] = RenterPage(self.object)
+        context["page_version"] = renter_page_version(self.object)
+        context["page_cache_seconds"] = settings.RENTER_PAGE_CACHE_SECONDS
         return context
 
+# ---------------- PAYMENT MATRIX API ----------------
+# /api/renter/<pk>/matrix/?year_from=2020&year_to=2024
+# The ETag covers everything the matrix depends on: the renter's ledger_version
+# (bumped on every payment write), start date and apartment, the apartment's
+# rent-table version and today's date, so polling costs one small query.
+
+def _year_range(request):
+    """(year_from, year_to) from the query string; either may be None."""
+    bounds = []
+    for key in ("year_from", "year_to"):
+        value = request.GET.get(key)
+        bounds.append(int(value) if value else None)
+    return tuple(bounds)
+
+
+def matrix_etag(request, pk):
+    row = Renter.objects.filter(pk=pk).values_list("ledger_version", "apartment_id", "start_date").first()
+    if row is None:
+        return None
+    version, apartment_id, start = row
+    rents = rate_cache.version(apartment_id) if apartment_id else "-"
+    key = f"{pk}:{version}:{apartment_id}:{start}:{rents}:{date.today()}:{request.GET.urlencode()}"
+    return hashlib.md5(key.encode()).hexdigest()
+
+
+@csrf_exempt
+@jwt_required
+@condition(etag_func=matrix_etag)
+def renter_matrix_api(request, pk):
+    """
+    Month x year payment matrix, totals and missed months for one renter.
+    `years` maps each year to 12 entries: 1 paid, 0 unpaid, null outside the
+    tenancy. Totals always cover the whole tenancy.
+    """
+    try:
+        year_from, year_to = _year_range(request)
+    except ValueError:
+        return JsonResponse({"error": "invalid year range"}, status=400)
+    renter = get_object_or_404(Renter, pk=pk)
+    ledger = renter.ledger
+
+    first_year, last_year = ledger.start // 12, ledger.end // 12
+    lo = max(first_year, year_from) if year_from else first_year
+    hi = min(last_year, year_to) if year_to else last_year
+    years = {year: [None] * 12 for year in range(lo, hi + 1)}
+    for idx, is_paid in ledger.statuses:
+        if idx // 12 in years:
+            years[idx // 12][idx % 12] = int(is_paid)
+
+    response = JsonResponse({
+        "renter_id": renter.pk,
+        "start_date": renter.start_date.isoformat(),
+        "first_year": first_year,
+        "last_year": last_year,
+        "years": {str(year): months for year, months in years.items()},
+        "missed_months": [ym for ym in ledger.missed_months() if lo <= int(ym[:4]) <= hi],
+        "total_paid": round(float(ledger.total_paid), 2),
+        "expected_total": round(float(ledger.expected), 2),
+        "expected_unpaid": round(float(ledger.expected_unpaid), 2),
+        "balance": round(float(ledger.balance), 2),
+    })
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
 # ---------------- FLOOR PAGE ----------------
 
+def floor_tree():
+    """
+    Floors with their apartments and renters, plus the apartment dropdown,
+    loaded in three queries however large the building is.
+    """
+    apartments = Apartment.objects.select_related("renter").order_by("id")
+    floors = Floor.objects.prefetch_related(Prefetch("apartments", queryset=apartments)).order_by("number")
+    return floors, Apartment.objects.select_related("floor").order_by("id")
+
+
 @csrf_exempt
 @jwt_required
 def floor_page(request):
@@ -182,9 +441,8 @@ def floor_page(request):
         "floor_form": floor_form,
         "apartment_form": apartment_form,
         "renter_form": renter_form,
-        "all_floors": Floor.objects.all(),
-        "all_apartments": Apartment.objects.all(),
     }
+    context["all_floors"], context["all_apartments"] = floor_tree()
     return render(request, "process/FLOOR.html", context)
 
 # ---------------- FLOOR LIST ----------------
@@ -194,6 +452,9 @@ class FloorListView(ListView):
     template_name = "process/FLOOR.html"
     context_object_name = "all_floors"
 
+    def get_queryset(self):
+        return floor_tree()[0]
+
     @method_decorator(jwt_required)
     def dispatch(self, *args, **kwargs):
         return super().dispatch(*args, **kwargs)
@@ -205,9 +466,80 @@ class FloorListView(ListView):
         context['floor_form'] = FloorForm()
         context['apartment_form'] = ApartmentForm()
         context['renter_form'] = RenterForm()
-        context['all_apartments'] = Apartment.objects.all()
+        context['all_apartments'] = floor_tree()[1]
         return context
 
+# ---------------- RENTER SEARCH ----------------
+@csrf_exempt
+@jwt_required
+def renter_search_api(request):
+    """Ranked prefix search over renter name, email and phone: ?q=<text>&limit=<n>."""
+    query = request.GET.get('q', '').strip()
+    try:
+        limit = min(max(int(request.GET.get('limit') or 20), 1), 100)
+    except ValueError:
+        return JsonResponse({'error': 'invalid limit'}, status=400)
+    results = [
+        {
+            'renter_id': renter.pk,
+            'name': renter.name,
+            'email': renter.email,
+            'phone': renter.phone,
+            'apartment_id': renter.apartment_id,
+            'floor_number': renter.floor_number,
+            'url': renter.get_absolute_url(),
+        }
+        for renter in search_renters(query, limit)
+    ]
+    return JsonResponse({'query': query, 'results': results})
+
+# ---------------- FLOOR SUMMARY ----------------
+
+def floor_summary(today=None):
+    """Per-floor occupancy and revenue rows plus building totals, in one query."""
+    rows, totals = [], {
+        "apartments": 0, "occupied": 0, "expected_monthly": Decimal("0.00"), "collected_to_date": Decimal("0.00"),
+    }
+    for floor in Floor.objects.with_summary(today).order_by("number"):
+        rows.append({
+            "floor_id": floor.pk,
+            "number": floor.number,
+            "apartments": floor.apartment_total,
+            "occupied": floor.occupied_total,
+            "vacancy_rate": _vacancy(floor.apartment_total, floor.occupied_total),
+            "expected_monthly": floor.expected_monthly,
+            "collected_to_date": floor.collected_to_date,
+            "has_unpaid": floor.has_unpaid,
+        })
+        totals["apartments"] += floor.apartment_total
+        totals["occupied"] += floor.occupied_total
+        totals["expected_monthly"] += floor.expected_monthly
+        totals["collected_to_date"] += floor.collected_to_date
+    totals["vacancy_rate"] = _vacancy(totals["apartments"], totals["occupied"])
+    return rows, totals
+
+
+def _vacancy(apartments, occupied):
+    return round((apartments - occupied) / apartments, 4) if apartments else 0.0
+
+
+def _money(row):
+    return {k: round(float(v), 2) if isinstance(v, Decimal) else v for k, v in row.items()}
+
+
+@csrf_exempt
+@jwt_required
+def floor_summary_api(request):
+    rows, totals = floor_summary()
+    return JsonResponse({"year": date.today().year, "floors": [_money(r) for r in rows], "totals": _money(totals)})
+
+
+@csrf_exempt
+@jwt_required
+def floor_summary_page(request):
+    rows, totals = floor_summary()
+    return render(request, "process/floor_summary.html", {"floors": rows, "totals": totals, "year": date.today().year})
+
 # ---------------- ADD PAYMENT ----------------
 @csrf_exempt
 @jwt_required
@@ -224,64 +556,20 @@ def add_payment(request, renter_id):
             data = request.POST
         
         try:
-            amount = data.get("amount")
-            payment_type = data.get("payment_type") or 'monthly'
-
-            if payment_type == 'monthly':
-                year_month_covered = data.get("year_month_covered")
-                if not amount or not year_month_covered:
-                    return JsonResponse({"error": "Missing amount or month"}, status=400)
-                month_date = datetime.strptime(year_month_covered, "%Y-%m").date().replace(day=1)
-                payment = Payment.objects.create(
-                    renter=renter,
-                    amount=amount,
-                    month_covered=month_date,
-                    date_paid=timezone.now().date(),
-                    payment_type="monthly"
-                )
-            elif payment_type == 'yearly':
-                year_covered = data.get('year_covered')
-                # if amount not provided, try to compute from YearlyRent (monthly * 12)
-                if not year_covered:
-                    return JsonResponse({"error": "Missing year for yearly payment"}, status=400)
-                try:
-                    y = int(year_covered)
-                except Exception:
-                    return JsonResponse({"error": "Invalid year"}, status=400)
-                if not amount:
-                    try:
-                        yr = YearlyRent.objects.get(apartment=renter.apartment, year=y)
-                        amount = float(yr.price) * 12.0
-                    except YearlyRent.DoesNotExist:
-                        amount = 0.0
-                month_date = datetime(y, 1, 1).date()
-                payment = Payment.objects.create(
-                    renter=renter,
-                    amount=amount,
-                    month_covered=month_date,
-                    date_paid=timezone.now().date(),
-                    payment_type="yearly"
-                )
-            else:
-                return JsonResponse({"error": "Invalid payment_type"}, status=400)
-            # compute updated totals to send back to client
-            total_paid = float(renter.total_paid())
-            expected_total = float(renter.expected_payments())
-            # expected_unpaid: sum of monthly rents for missed months
-            missed = renter.missed_months()
-            expected_unpaid = 0.0
-            for ym in missed:
-                try:
-                    y = int(ym.split('-')[0])
-                except Exception:
-                    continue
-                try:
-                    yr = YearlyRent.objects.get(apartment=renter.apartment, year=y)
-                    monthly = float(yr.price)
-                except YearlyRent.DoesNotExist:
-                    monthly = 0.0
-                expected_unpaid += monthly
+            fields = clean_payment_data(data, renter.apartment_id)
+        except ValidationError as e:
+            return JsonResponse({"error": e.messages[0]}, status=400)
 
+        try:
+            # the insert and the renter's running totals (see signals.py) commit together
+            with transaction.atomic():
+                payment = Payment.objects.create(renter=renter, **fields)
+            renter.refresh_from_db(fields=["total_paid", "paid_through", "payment_count"])
+            # compute updated totals to send back to client (one ledger pass)
+            ledger = renter.ledger
+            total_paid = float(ledger.total_paid)
+            expected_total = float(ledger.expected)
+            expected_unpaid = float(ledger.expected_unpaid)
             balance = total_paid - expected_total
 
             # respond with canonical month covered and payment_type so client can update UI reliably
@@ -296,58 +584,387 @@ def add_payment(request, renter_id):
                 "expected_unpaid": round(expected_unpaid, 2),
                 "balance": round(balance, 2)
             })
-        except ValueError as e:
-            return JsonResponse({"error": f"Invalid date format: {str(e)}"}, status=400)
         except Exception as e:
             return JsonResponse({"error": f"Error creating payment: {str(e)}"}, status=400)
     
     return JsonResponse({"error": "Invalid request"}, status=400)
 
 
+# ---------------- PAYMENT IMPORT API ----------------
+@csrf_exempt
+@jwt_required
+def import_payments_api(request):
+    """
+    Bulk payment import: multipart POST with a CSV/JSONL `file`, optional
+    `format`, `batch_size` and `dry_run`. Returns the per-row error report,
+    or with `background=1` queues the import and answers 202 with the job.
+    """
+    if request.method != "POST":
+        return JsonResponse({"error": "POST required"}, status=400)
+    upload = request.FILES.get("file")
+    if not upload:
+        return JsonResponse({"error": "file required"}, status=400)
+    fmt = request.POST.get("format") or detect_format(upload.name)
+    if fmt not in ("csv", "jsonl"):
+        return JsonResponse({"error": "format must be csv or jsonl"}, status=400)
+    try:
+        batch_size = int(request.POST.get("batch_size") or DEFAULT_BATCH_SIZE)
+    except ValueError:
+        return JsonResponse({"error": "invalid batch_size"}, status=400)
+    if batch_size < 1:
+        return JsonResponse({"error": "invalid batch_size"}, status=400)
+    dry_run = request.POST.get("dry_run") in ("1", "true", "on")
+
+    if request.POST.get("background") in ("1", "true", "on"):
+        path = os.path.join(output_dir("uploads"), f"{uuid.uuid4().hex}.{fmt}")
+        with open(path, "wb") as f:
+            for chunk in upload.chunks():
+                f.write(chunk)
+        job = enqueue("import_payments", {"path": path, "fmt": fmt, "batch_size": batch_size, "dry_run": dry_run},
+                      user_id=request.user_id)
+        return _job_accepted(job)
+
+    stream = io.TextIOWrapper(upload.file, encoding="utf-8-sig", newline="")
+    report = import_payments(stream, fmt, batch_size, dry_run)
+    return JsonResponse(report.as_dict())
+
+
+# ---------------- LEDGER EXPORT ----------------
+@csrf_exempt
+@jwt_required
+def export_ledger_csv(request):
+    """
+    Stream the payment ledger as CSV with running balances per renter.
+    Optional filters: ?floor=<floor id>&renter=<id>&renter=<id>. With
+    ?background=1 the file is written by a worker instead (202 + job).
+    """
+    try:
+        floor = int(request.GET["floor"]) if request.GET.get("floor") else None
+        renters = [int(r) for r in request.GET.getlist("renter")]
+        chunk_size = int(request.GET.get("chunk_size") or DEFAULT_CHUNK_SIZE)
+    except ValueError:
+        return JsonResponse({"error": "invalid floor, renter or chunk_size"}, status=400)
+    if chunk_size < 1:
+        return JsonResponse({"error": "invalid chunk_size"}, status=400)
+
+    if request.GET.get("background") in ("1", "true", "on"):
+        return _job_accepted(enqueue("export_ledger", {"floor": floor, "renters": renters}, user_id=request.user_id))
+
+    response = StreamingHttpResponse(csv_chunks(ledger_rows(floor, renters, chunk_size)),
+                                     content_type="text/csv; charset=utf-8")
+    response["Content-Disposition"] = f'attachment; filename="payment-ledger-{date.today()}.csv"'
+    return response
+
+
+# ---------------- BACKGROUND JOBS API ----------------
+# Imports and exports queue themselves with background=1; statements and the
+# rent roll are queued here. `manage.py run_worker` does the work.
+def _parse_bool(value):
+    """JSON true/false, 0/1 or the usual strings; anything else is a ValueError."""
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, int) and value in (0, 1):
+        return bool(value)
+    if isinstance(value, str) and value.strip().lower() in ("1", "true", "on", "yes"):
+        return True
+    if isinstance(value, str) and value.strip().lower() in ("0", "false", "off", "no", ""):
+        return False
+    raise ValueError(f"not a boolean: {value!r}")
+
+
+QUEUEABLE_JOBS = {
+    "generate_statements": {"force": _parse_bool},
+    "build_rent_roll": {"full": _parse_bool},
+    "fill_renter_months": {},
+}
+
+
+def _job_accepted(job):
+    payload = describe_job(job)
+    payload["status_url"] = reverse("job_status_api", args=[job.pk])
+    return JsonResponse(payload, status=202)
+
+
+@csrf_exempt
+@jwt_required
+def jobs_api(request):
+    """GET: the 50 most recent jobs. POST {"kind": ..., "params": {...}}: queue a job."""
+    if request.method == "POST":
+        try:
+            data = json.loads(request.body.decode("utf-8") or "{}")
+            allowed = QUEUEABLE_JOBS[data.get("kind")]
+        except (ValueError, KeyError, TypeError, AttributeError):
+            return JsonResponse({"error": f"kind must be one of: {', '.join(QUEUEABLE_JOBS)}"}, status=400)
+        kind = data["kind"]
+        try:
+            params = {key: allowed[key](value) for key, value in (data.get("params") or {}).items() if key in allowed}
+        except (ValueError, AttributeError) as e:
+            return JsonResponse({"error": f"invalid params: {e}"}, status=400)
+        return _job_accepted(enqueue(kind, params, user_id=request.user_id))
+    return JsonResponse({"results": [describe_job(job) for job in Job.objects.order_by("-id")[:50]]})
+
+
+@csrf_exempt
+@jwt_required
+def job_status_api(request, pk):
+    return JsonResponse(describe_job(get_object_or_404(Job, pk=pk)))
+
+
+@csrf_exempt
+@jwt_required
+def job_download(request, pk):
+    """The file a finished export job wrote."""
+    job = get_object_or_404(Job, pk=pk, status=Job.SUCCEEDED)
+    path = (job.result or {}).get("file")
+    if not path or not os.path.exists(path):
+        raise Http404("This job has no file")
+    return FileResponse(open(path, "rb"), as_attachment=True, filename=os.path.basename(path))
+
+
 # ---------------- EXPECTED PAYMENTS API ----------------
+# Accepts one or several apartment/start_date pairs as repeated query params:
+#   /api/expected/?apartment=3&start_date=2024-05-01&apartment=7&start_date=2023-01-15
+# The ETag is built from the inputs and the rent-table versions in the rate
+# cache, so a repeated lookup is answered with 304 without touching the DB.
+
+def _expected_items(request):
+    apartments = request.GET.getlist('apartment')
+    starts = request.GET.getlist('start_date')
+    if not apartments or len(apartments) != len(starts):
+        return None
+    return list(zip(apartments, starts))
+
+
+def expected_etag(request):
+    """None unless the view will answer 200, so errors never get an ETag or a 304."""
+    items = _expected_items(request)
+    if not items:
+        return None
+    try:
+        apartment_ids = [int(apartment) for apartment, _ in items]
+    except ValueError:
+        return None
+    if len(items) == 1:
+        # a single pair's errors are the response status; several pairs report them inline
+        try:
+            start = datetime.strptime(items[0][1], '%Y-%m-%d').date()
+        except ValueError:
+            return None
+        if start > date.today() or not Apartment.objects.filter(pk=apartment_ids[0]).exists():
+            return None
+    versions = [rate_cache.version(apartment_id) for apartment_id in apartment_ids]
+    key = "|".join(f"{apartment}:{start}:{version}" for (apartment, start), version in zip(items, versions))
+    return hashlib.md5(f"{date.today()}|{key}".encode()).hexdigest()
+
+
+def _expected_item(apartment, start_date, existing, today):
+    """(payload, status) for one apartment/start_date pair."""
+    try:
+        start = datetime.strptime(start_date, '%Y-%m-%d').date()
+    except ValueError:
+        return {'error': 'bad date'}, 400
+    if int(apartment) not in existing:
+        return {'error': 'apartment not found'}, 404
+    if start > today:
+        return {'error': 'start in future'}, 400
+    months, total = expected_between(start, rates_for(int(apartment)), today)
+    return {'months_count': months, 'expected_total': round(float(total), 2), 'months': months}, 200
+
+
 @csrf_exempt
+@condition(etag_func=expected_etag)
 def expected_payments_api(request):
-    apartment = request.GET.get('apartment')
-    start_date = request.GET.get('start_date')
-    if not apartment or not start_date:
+    items = _expected_items(request)
+    if not items:
         return JsonResponse({'error': 'missing params'}, status=400)
     try:
-        start = datetime.datetime.strptime(start_date, '%Y-%m-%d').date()
-    except Exception:
-        return JsonResponse({'error': 'bad date'}, status=400)
+        apartment_ids = {int(apartment) for apartment, _ in items}
+    except ValueError:
+        return JsonResponse({'error': 'bad apartment'}, status=400)
+    existing = set(Apartment.objects.filter(pk__in=apartment_ids).values_list('pk', flat=True))
+    today = date.today()
+
+    if len(items) == 1:
+        payload, status = _expected_item(*items[0], existing, today)
+        response = JsonResponse(payload, status=status)
+    else:
+        results = []
+        for apartment, start_date in items:
+            payload, _ = _expected_item(apartment, start_date, existing, today)
+            results.append({'apartment': int(apartment), 'start_date': start_date, **payload})
+        response = JsonResponse({'results': results})
+    if response.status_code == 200:
+        patch_cache_control(response, private=True, max_age=300)
+    return response
+
+
+# ---------------- ARREARS REPORT API ----------------
+@csrf_exempt
+@jwt_required
+def arrears_api(request):
+    """
+    Balances for every renter in a constant number of queries.
+    Optional filters: ?floor=<floor id>&min_debt=<amount owed>.
+    """
+    renters = Renter.objects.all()
+    floor = request.GET.get('floor')
+    if floor:
+        try:
+            renters = renters.filter(floor_id=int(floor))
+        except ValueError:
+            return JsonResponse({'error': 'invalid floor'}, status=400)
+    min_debt = None
+    if request.GET.get('min_debt'):
+        try:
+            min_debt = Decimal(request.GET['min_debt'])
+        except InvalidOperation:
+            return JsonResponse({'error': 'invalid min_debt'}, status=400)
+
+    results = []
+    for renter, ledger in Ledger.for_renters(renters):
+        if min_debt is not None and -ledger.balance < min_debt:
+            continue
+        results.append({
+            'renter_id': renter.pk,
+            'name': renter.name,
+            'floor_id': renter.floor_id,
+            'apartment_id': renter.apartment_id,
+            'total_paid': round(float(ledger.total_paid), 2),
+            'expected': round(float(ledger.expected), 2),
+            'balance': round(float(ledger.balance), 2),
+            'missed_months': len(ledger.missed),
+        })
+    return JsonResponse({'count': len(results), 'results': results})
+
+
+# ---------------- DELINQUENCY API ----------------
+def _parse_month(value):
+    return datetime.strptime(value, '%Y-%m').date()
+
+
+@csrf_exempt
+@jwt_required
+def delinquency_api(request):
+    """
+    Renters missing rent, from the CoverageMask bitmasks:
+      ?month=YYYY-MM              unpaid in that month
+      ?consecutive=K[&current=1]  K or more consecutive unpaid months (current=1: ending this month)
+    Optional ?floor=<floor id>.
+    """
     try:
-        apt = Apartment.objects.get(pk=apartment)
-    except Apartment.DoesNotExist:
-        return JsonResponse({'error': 'apartment not found'}, status=404)
-    today = datetime.date.today()
-    if start > today:
-        return JsonResponse({'error': 'start in future'}, status=400)
-    # iterate months and sum expected monthly from YearlyRent
-    months = 0
-    expected_total = 0.0
-    cur = start
-    while cur <= today:
-        months += 1
-        year = cur.year
-        # find YearlyRent for this year
+        floor = int(request.GET['floor']) if request.GET.get('floor') else None
+    except ValueError:
+        return JsonResponse({'error': 'invalid floor'}, status=400)
+
+    if request.GET.get('month'):
         try:
-            yr = YearlyRent.objects.get(apartment=apt, year=year)
-            # price is monthly amount for that year
-            monthly = float(yr.price)
-        except YearlyRent.DoesNotExist:
-            monthly = 0.0
-        expected_total += monthly
-        # move to first day of next month
-        if cur.month == 12:
-            cur = datetime.date(cur.year + 1, 1, cur.day)
-        else:
-            next_month = cur.month + 1
-            # keep same day if possible else cap to 28 to avoid invalid date
-            try:
-                cur = datetime.date(cur.year, next_month, cur.day)
-            except Exception:
-                cur = datetime.date(cur.year, next_month, 28)
-    return JsonResponse({'months_count': months, 'expected_total': round(expected_total, 2), 'months': months})
+            month = _parse_month(request.GET['month'])
+        except ValueError:
+            return JsonResponse({'error': 'invalid month, expected YYYY-MM'}, status=400)
+        results = unpaid_in_month(month.year, month.month, floor)
+        return JsonResponse({'month': month.strftime('%Y-%m'), 'count': len(results), 'results': results})
+
+    if request.GET.get('consecutive'):
+        try:
+            k = int(request.GET['consecutive'])
+        except ValueError:
+            k = 0
+        if k < 1:
+            return JsonResponse({'error': 'consecutive must be a positive integer'}, status=400)
+        current = request.GET.get('current') in ('1', 'true', 'on')
+        results = consecutive_missed(k, current, floor)
+        return JsonResponse({'consecutive': k, 'current': current, 'count': len(results), 'results': results})
+
+    return JsonResponse({'error': 'month or consecutive required'}, status=400)
+
+
+# ---------------- RENT ROLL DASHBOARD API ----------------
+@csrf_exempt
+@jwt_required
+def rent_roll_api(request):
+    """
+    Building-wide monthly figures from the RentRollSnapshot table only
+    (refreshed by `manage.py build_rent_roll`). ?from=YYYY-MM&to=YYYY-MM,
+    defaulting to the last 12 months.
+    """
+    today = date.today().replace(day=1)
+    try:
+        end = _parse_month(request.GET['to']) if request.GET.get('to') else today
+        start = _parse_month(request.GET['from']) if request.GET.get('from') else date(end.year - 1, end.month, 1)
+    except ValueError:
+        return JsonResponse({'error': 'invalid month, expected YYYY-MM'}, status=400)
+
+    results = []
+    for snapshot in RentRollSnapshot.objects.filter(month__gte=start, month__lte=end).order_by('month'):
+        results.append({
+            'month': snapshot.month.strftime('%Y-%m'),
+            'expected': round(float(snapshot.expected), 2),
+            'collected': round(float(snapshot.collected), 2),
+            'collection_rate': round(float(snapshot.collected / snapshot.expected), 4) if snapshot.expected else None,
+            'occupied': snapshot.occupied,
+            'apartments': snapshot.apartments,
+            'occupancy': round(snapshot.occupancy, 4),
+            'delinquent': snapshot.delinquent,
+            'stale': snapshot.dirty,
+            'computed_at': snapshot.computed_at.isoformat() if snapshot.computed_at else None,
+        })
+    return JsonResponse({'from': start.strftime('%Y-%m'), 'to': end.strftime('%Y-%m'), 'results': results})
+
+
+# ---------------- BULK RENT CHANGE API ----------------
+@csrf_exempt
+@jwt_required
+def bulk_rent_change_api(request):
+    """
+    JSON POST: {"year": 2026, "monthly_price": "250.00" | "percent": 3.5,
+    "floors": [ids] | "apartments": [ids] | "all": true, "dry_run": false}
+    """
+    if request.method != "POST":
+        return JsonResponse({"error": "POST required"}, status=400)
+    try:
+        data = json.loads(request.body.decode("utf-8"))
+        year = int(data.get("year"))
+        price = data.get("monthly_price")
+        percent = data.get("percent")
+        price = Decimal(str(price)) if price not in (None, "") else None
+        percent = Decimal(str(percent)) if percent not in (None, "") else None
+        floors = [int(f) for f in data.get("floors") or []]
+        apartment_ids = [int(a) for a in data.get("apartments") or []]
+    except (ValueError, TypeError, AttributeError, InvalidOperation):
+        return JsonResponse({"error": "invalid year, price, percent or target ids"}, status=400)
+
+    try:
+        apartments = select_apartments(floors, apartment_ids, bool(data.get("all")))
+        plan, skipped = plan_rent_change(apartments, year, price, percent)
+    except ValueError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+
+    affected = len(plan) if data.get("dry_run") else apply_rent_change(year, plan)
+    return JsonResponse({
+        "success": True,
+        "year": year,
+        "affected": affected,
+        "skipped": skipped,
+        "dry_run": bool(data.get("dry_run")),
+        "prices": {str(apartment_id): round(float(p), 2) for apartment_id, p in plan.items()},
+    })
+
+
+# ---------------- QUERY TIMING STATS API ----------------
+@csrf_exempt
+@jwt_required
+def query_stats_api(request):
+    """Rolling per-URL-name latency and query-count percentiles; staff only."""
+    if not User.objects.filter(pk=request.user_id, is_staff=True).exists():
+        return JsonResponse({"error": "Forbidden"}, status=403)
+    if request.method == "DELETE":
+        request_stats.clear()
+        return JsonResponse({"success": True})
+    return JsonResponse({
+        "enabled": settings.QUERY_TIMING,
+        "window": request_stats.window,
+        "results": request_stats.summary(),
+    })
 
 
 @csrf_exempt
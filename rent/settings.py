@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 import os
+from datetime import timedelta
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -40,10 +41,12 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'rest_framework',
 ]
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'process.middleware.QueryTimingMiddleware',
      'whitenoise.middleware.WhiteNoiseMiddleware', 
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -83,6 +86,34 @@ DATABASES = {
     }
 }
 
+# Opt-in WAL / busy_timeout / IMMEDIATE-transaction mode for multi-worker
+# deployments on SQLite (see rent/sqlite.py)
+if os.environ.get("DJANGO_SQLITE_PERFORMANCE") == "1":
+    from rent.sqlite import performance_options
+    DATABASES['default']['OPTIONS'] = performance_options()
+
+
+# Rent-rate versions (process/rates.py) and the renter page fragments. A
+# file-based cache so every process on the host (web workers, run_worker)
+# sees the others' invalidations; point DJANGO_CACHE_DIR at a shared volume
+# when they run in separate containers. Sized for three page fragments per
+# renter plus the rate versions: past MAX_ENTRIES a set() culls 1/CULL_FREQUENCY
+# of the files at random
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ.get("DJANGO_CACHE_DIR", BASE_DIR / "cache"),
+        'OPTIONS': {
+            'MAX_ENTRIES': int(os.environ.get("DJANGO_CACHE_MAX_ENTRIES", 50000)),
+            'CULL_FREQUENCY': 10,
+        },
+    }
+}
+
+# Renter page fragments are versioned (see RenterDetailView); this only bounds
+# how long superseded versions linger
+RENTER_PAGE_CACHE_SECONDS = 24 * 60 * 60
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -126,5 +157,26 @@ STATIC_ROOT = BASE_DIR / "staticfiles"
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+# JWT lifetimes: short access tokens, renewed via /refresh-jwt/ without a password check
+JWT_ACCESS_LIFETIME = timedelta(minutes=15)
+JWT_REFRESH_LIFETIME = timedelta(days=7)
+JWT_VERIFIED_CACHE_SIZE = 1024
+
+# Read-only /api/v1/ endpoints (process/api.py) set their own JWT auth and
+# keyset pagination; only render JSON
+REST_FRAMEWORK = {
+    'DEFAULT_RENDERER_CLASSES': ['rest_framework.renderers.JSONRenderer'],
+}
+
+# Files written by background jobs (process/jobs.py, manage.py run_worker)
+JOB_OUTPUT_DIR = Path(os.environ.get("DJANGO_JOB_OUTPUT_DIR", BASE_DIR / "job_output"))
+
+# Per-request SQL timing, Server-Timing headers and /api/stats/queries/
+# (process/middleware.py); the middleware unloads itself when this is off
+QUERY_TIMING = os.environ.get("DJANGO_QUERY_TIMING") == "1"
+QUERY_TIMING_WINDOW = 500
+QUERY_TIMING_N_PLUS_ONE_THRESHOLD = 5
+
 # Serve static files in production with Whitenoise
 STATICFILES_STORAGE = "whitenoise.storage.CompressedManifestStaticFilesStorage"